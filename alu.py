@@ -1,49 +1,83 @@
 # alu.py
 # RV64I + M-extension ALU implementation
+#
+# Register values are held as unsigned 64-bit patterns; operations that need
+# signed semantics reinterpret their operands. Every operation is a plain
+# callable in ALU_OPS so the control unit can bind it once per mnemonic.
 
 MASK64 = (1 << 64) - 1
+SIGN64 = 1 << 63
 
 
-def alu(op1, op2, alu_op):
-    op1_u = op1 & MASK64
-    op2_u = op2 & MASK64
+def to_signed(value):
+    """Reinterpret a 64-bit pattern (or any Python int) as signed 64-bit."""
+    value &= MASK64
+    return value - (1 << 64) if value & SIGN64 else value
+
+
+def _div(op1, op2):
+    op1, op2 = to_signed(op1), to_signed(op2)
+    if op2 == 0:
+        return MASK64
+    if op1 == -SIGN64 and op2 == -1:
+        return op1 & MASK64  # overflow case
+    q = abs(op1) // abs(op2)  # RISC-V rounds towards zero
+    return (-q if (op1 < 0) != (op2 < 0) else q) & MASK64
+
 
-    if alu_op == 'add':   return (op1 + op2) & MASK64
-    if alu_op == 'sub':   return (op1 - op2) & MASK64
-    if alu_op == 'mul':   return (op1 * op2) & MASK64
-    if alu_op == 'mulh':  return ((op1 * op2) >> 64) & MASK64
-    if alu_op == 'mulhu': return ((op1_u * op2_u) >> 64) & MASK64
-    if alu_op == 'mulhsu': return ((op1 * op2_u) >> 64) & MASK64
+def _divu(op1, op2):
+    op2_u = op2 & MASK64
+    return (op1 & MASK64) // op2_u if op2_u != 0 else MASK64
 
-    if alu_op == 'div':
-        if op2 == 0:
-            return -1 & MASK64
-        if op1 == -2 ** 63 and op2 == -1:
-            return op1  # overflow case
-        return int(op1 // op2) & MASK64
 
-    if alu_op == 'divu':
-        return (op1_u // op2_u) & MASK64 if op2 != 0 else MASK64
+def _rem(op1, op2):
+    op1, op2 = to_signed(op1), to_signed(op2)
+    if op2 == 0:
+        return op1 & MASK64
+    if op1 == -SIGN64 and op2 == -1:
+        return 0
+    r = abs(op1) % abs(op2)  # sign follows the dividend
+    return (-r if op1 < 0 else r) & MASK64
 
-    if alu_op == 'rem':
-        if op2 == 0:
-            return op1 & MASK64
-        if op1 == -2 ** 63 and op2 == -1:
-            return 0
-        return (op1 % op2) & MASK64
 
-    if alu_op == 'remu':
-        return (op1_u % op2_u) & MASK64 if op2 != 0 else op1_u
+def _remu(op1, op2):
+    op2_u = op2 & MASK64
+    return (op1 & MASK64) % op2_u if op2_u != 0 else op1 & MASK64
 
-    if alu_op == 'and':   return (op1 & op2) & MASK64
-    if alu_op == 'or':    return (op1 | op2) & MASK64
-    if alu_op == 'xor':   return (op1 ^ op2) & MASK64
 
-    if alu_op == 'sll':   return (op1 << (op2 & 0x3F)) & MASK64
-    if alu_op == 'srl':   return (op1_u >> (op2 & 0x3F)) & MASK64
-    if alu_op == 'sra':   return (op1 >> (op2 & 0x3F)) & MASK64
+ALU_OPS = {
+    'add':    lambda op1, op2: (op1 + op2) & MASK64,
+    'sub':    lambda op1, op2: (op1 - op2) & MASK64,
+    'mul':    lambda op1, op2: (op1 * op2) & MASK64,
+    'mulh':   lambda op1, op2: ((to_signed(op1) * to_signed(op2)) >> 64) & MASK64,
+    'mulhu':  lambda op1, op2: (((op1 & MASK64) * (op2 & MASK64)) >> 64) & MASK64,
+    'mulhsu': lambda op1, op2: ((to_signed(op1) * (op2 & MASK64)) >> 64) & MASK64,
+    'div':    _div,
+    'divu':   _divu,
+    'rem':    _rem,
+    'remu':   _remu,
+    'and':    lambda op1, op2: (op1 & op2) & MASK64,
+    'or':     lambda op1, op2: (op1 | op2) & MASK64,
+    'xor':    lambda op1, op2: (op1 ^ op2) & MASK64,
+    'sll':    lambda op1, op2: (op1 << (op2 & 0x3F)) & MASK64,
+    'srl':    lambda op1, op2: (op1 & MASK64) >> (op2 & 0x3F),
+    'sra':    lambda op1, op2: (to_signed(op1) >> (op2 & 0x3F)) & MASK64,
+    # Signed compare: flipping the sign bit maps signed order onto unsigned order
+    'slt':    lambda op1, op2: int(((op1 ^ SIGN64) & MASK64) < ((op2 ^ SIGN64) & MASK64)),
+    'sltu':   lambda op1, op2: int((op1 & MASK64) < (op2 & MASK64)),
+    # Branch conditions (1 = taken)
+    'beq':    lambda op1, op2: int((op1 & MASK64) == (op2 & MASK64)),
+    'bne':    lambda op1, op2: int((op1 & MASK64) != (op2 & MASK64)),
+    'blt':    lambda op1, op2: int(((op1 ^ SIGN64) & MASK64) < ((op2 ^ SIGN64) & MASK64)),
+    'bge':    lambda op1, op2: int(((op1 ^ SIGN64) & MASK64) >= ((op2 ^ SIGN64) & MASK64)),
+    'bltu':   lambda op1, op2: int((op1 & MASK64) < (op2 & MASK64)),
+    'bgeu':   lambda op1, op2: int((op1 & MASK64) >= (op2 & MASK64)),
+}
 
-    if alu_op == 'slt':   return int(op1 < op2)
-    if alu_op == 'sltu':  return int(op1_u < op2_u)
 
+def alu_nop(op1, op2):
     return 0
+
+
+def alu(op1, op2, alu_op):
+    return ALU_OPS.get(alu_op, alu_nop)(op1, op2)
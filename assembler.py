@@ -0,0 +1,540 @@
+# assembler.py
+# Two-pass assembler for RV64IM + D source, encoding through the isa.py
+# tables (the same ones utils.decodeWord decodes with).
+#
+# Syntax is the usual GNU one, one statement per line:
+#
+#     loop:   ld    t0, 8(a0)        # comments start with '#' or '//'
+#             addi  a0, a0, -1
+#             bne   a0, zero, loop
+#     table:  .dword 1, 2, table + 8
+#
+# Registers take x/f numbers or ABI names. Immediates are integers
+# (0x.., 0b..) or 'symbol[+-offset]'; a branch or jal target given as a
+# number is the PC-relative offset itself. Pseudo-instructions: nop, mv,
+# j, ret and li. There is no lui in this ISA, so li builds a constant from
+# addi and slli by 12 bits; a constant known in the first pass gets the
+# shortest sequence, a symbol defined later always the five-instruction
+# one (any value below 2**35). Directives: .byte .half .word .dword
+# .double .ascii .string/.asciz .zero/.space .align (power of two)
+# .balign .org .equ/.set; .text, .data, .section and .globl are accepted
+# and ignored (one address space from 'base'). Execution starts at
+# '_start' when it is defined, else at 'base'.
+#
+# The first pass lays out the statements and collects the labels, the
+# second encodes them. The result carries the image, the symbols and the
+# predecoded instructions (utils.decodeWord records, PC -> DecodedInst).
+# assemble_file() caches its result on disk, keyed by a hash of the
+# source, so an unchanged program is loaded without being assembled again.
+
+import hashlib
+import json
+import os
+import re
+import struct
+from collections import namedtuple
+
+from control_unit import CONTROL_TABLE, CSR_OPS
+from csr import CSR_NAMES
+from fpu import RNE, RTZ, RDN, RUP, RMM, DYN
+from isa import OPCODES, FUNCT3, FUNCT7, RS2, FP_RM
+from loader import LoaderError, LoadedProgram
+from memory_unit import MemoryFault
+from utils import decodeWord
+
+# Bump when the same source would assemble differently: invalidates the disk cache
+VERSION = 1
+
+SOURCE_SUFFIXES = ('.s', '.S', '.asm')
+
+# Default directory of assemble_file()'s cache ($RVSIM_ASM_CACHE overrides it)
+DEFAULT_CACHE_DIR = os.environ.get('RVSIM_ASM_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'rvsim', 'asm'))
+
+# base: address of image[0]; symbols: label -> address; decoded: PC ->
+# DecodedInst of every instruction; lines: PC -> source line of every
+# instruction; entry: initial PC; cached: loaded from the disk cache
+Assembly = namedtuple("Assembly", ["base", "image", "entry", "symbols", "decoded", "lines", "cached"])
+
+XREGS = {'zero': 0, 'ra': 1, 'sp': 2, 'gp': 3, 'tp': 4, 't0': 5, 't1': 6, 't2': 7, 's0': 8, 'fp': 8, 's1': 9,
+         **{f"a{n}": 10 + n for n in range(8)}, **{f"s{n}": 16 + n for n in range(2, 12)},
+         **{f"t{n}": 25 + n for n in range(3, 7)}, **{f"x{n}": n for n in range(32)}}
+FREGS = {**{f"ft{n}": n for n in range(8)}, 'fs0': 8, 'fs1': 9, **{f"fa{n}": 10 + n for n in range(8)},
+         **{f"fs{n}": 16 + n for n in range(2, 12)}, **{f"ft{n}": 20 + n for n in range(8, 12)},
+         **{f"f{n}": n for n in range(32)}}
+ROUNDING_MODES = {'rne': RNE, 'rtz': RTZ, 'rdn': RDN, 'rup': RUP, 'rmm': RMM, 'dyn': DYN}
+CSRS = {name: number for number, name in CSR_NAMES.items()}
+
+# Mnemonic (lower case) -> its key in the isa.py tables
+INSTRUCTIONS = {name.lower(): name for name in OPCODES}
+
+PSEUDO = {'nop', 'mv', 'j', 'ret', 'li'}
+
+# Data directives: bytes per value and struct format
+DATA_SIZES = {'.byte': (1, '<B'), '.half': (2, '<H'), '.word': (4, '<I'), '.dword': (8, '<Q')}
+
+IGNORED_DIRECTIVES = {'.text', '.data', '.bss', '.section', '.globl', '.global', '.option', '.file', '.type', '.size'}
+
+LI_FIXED_WORDS = 5  # length of li for a value not known in the first pass
+
+_LABEL = re.compile(r"\s*([A-Za-z_.$][\w.$]*)\s*:")
+_SYMBOL = re.compile(r"([A-Za-z_.$][\w.$]*)\s*(?:([+-])\s*(\w+))?$")
+_MEMORY = re.compile(r"(.*)\(\s*(\w+)\s*\)$")
+
+
+class AssemblyError(LoaderError):
+    pass
+
+
+def _strip_comment(line):
+    """'line' without its comment ('#' or '//' outside a string literal)."""
+    quoted = False
+    for index, char in enumerate(line):
+        if char == '"' and (index == 0 or line[index - 1] != '\\'):
+            quoted = not quoted
+        elif not quoted and (char == '#' or line.startswith('//', index)):
+            return line[:index]
+    return line
+
+
+def _split_operands(text):
+    """Comma-separated operands, keeping string literals whole."""
+    operands, current, quoted = [], '', False
+    for index, char in enumerate(text):
+        if char == '"' and (index == 0 or text[index - 1] != '\\'):
+            quoted = not quoted
+        if char == ',' and not quoted:
+            operands.append(current.strip())
+            current = ''
+        else:
+            current += char
+    if current.strip() or operands:
+        operands.append(current.strip())
+    return operands
+
+
+def _sext12(value):
+    return ((value & 0xFFF) ^ 0x800) - 0x800
+
+
+def _signed64(value):
+    return ((value & (1 << 64) - 1) ^ (1 << 63)) - (1 << 63)
+
+
+def _li_sequence(rd, value):
+    """(mnemonic, rd, rs1, imm) steps loading 'value' (taken as a signed 64-bit integer) into rd."""
+    value = _signed64(value)
+    low = _sext12(value)
+    high = (value - low) >> 12
+    if high == 0:
+        return [('addi', rd, 0, low)]
+    steps = _li_sequence(rd, high) + [('slli', rd, rd, 12)]
+    if low:
+        steps.append(('addi', rd, rd, low))
+    return steps
+
+
+def _li_fixed(rd, value):
+    """The five-step li sequence of a value that was not known in the first pass."""
+    value = _signed64(value)
+    low = _sext12(value)
+    middle = _sext12((value - low) >> 12)
+    high = (value - low - (middle << 12)) >> 24
+    if not -2048 <= high < 2048:
+        raise ValueError(f"value {value:#x} is out of range for li of a symbol")
+    return [('addi', rd, 0, high), ('slli', rd, rd, 12), ('addi', rd, rd, middle), ('slli', rd, rd, 12),
+            ('addi', rd, rd, low)]
+
+
+class _Assembler:
+    def __init__(self, base, name):
+        self.base = base
+        self.name = name
+        self.symbols = {}    # label -> address
+        self.constants = {}  # .equ/.set name -> value
+        self.statements = []  # (line number, address, mnemonic or directive, operands, li value known in pass 1)
+        self.lineno = 0
+
+    def error(self, message):
+        return AssemblyError(f"{self.name}:{self.lineno}: {message}")
+
+    # --- Operands ---
+
+    def value(self, text, required=True):
+        """Integer or 'symbol[+-offset]'; None for an undefined symbol unless 'required'."""
+        text = text.strip()
+        try:
+            return int(text, 0)
+        except ValueError:
+            pass
+        if len(text) == 3 and text[0] == text[2] == "'":
+            return ord(text[1])
+        match = _SYMBOL.match(text)
+        if match is None:
+            raise self.error(f"bad value '{text}'")
+        name, sign, offset = match.groups()
+        value = self.symbols.get(name, self.constants.get(name))
+        if value is None:
+            if required:
+                raise self.error(f"undefined symbol '{name}'")
+            return None
+        if offset is not None:
+            try:
+                offset = int(offset, 0)
+            except ValueError:
+                raise self.error(f"bad offset '{offset}'")
+            value += offset if sign == '+' else -offset
+        return value
+
+    def register(self, text, kind='x'):
+        number = (FREGS if kind == 'f' else XREGS).get(text.strip().lower())
+        if number is None:
+            raise self.error(f"expected {'an f' if kind == 'f' else 'an x'} register, got '{text}'")
+        return number
+
+    def memory_operand(self, text):
+        """(offset, base register) of 'offset(reg)'."""
+        match = _MEMORY.match(text.strip())
+        if match is None:
+            raise self.error(f"expected offset(register), got '{text}'")
+        offset, base = match.groups()
+        return self.value(offset) if offset.strip() else 0, self.register(base)
+
+    def immediate(self, text, bits, signed=True):
+        value = self.value(text)
+        low, high = (-(1 << bits - 1), 1 << bits - 1) if signed else (0, 1 << bits)
+        if not low <= value < high:
+            raise self.error(f"immediate {value} does not fit in {bits} bits")
+        return value
+
+    def target(self, text, pc, bits):
+        """PC-relative offset of a branch or jal target (a symbol, or the offset itself)."""
+        text = text.strip()
+        try:
+            offset = int(text, 0)
+        except ValueError:
+            offset = self.value(text) - pc
+        if offset & 1 or not -(1 << bits - 1) <= offset < 1 << bits - 1:
+            raise self.error(f"target {text} out of range or misaligned (offset {offset})")
+        return offset
+
+    # --- First pass ---
+
+    def layout(self, source):
+        """Record every statement at its address and define the labels."""
+        address = self.base
+        for self.lineno, line in enumerate(source.splitlines(), 1):
+            line = _strip_comment(line)
+            while True:
+                match = _LABEL.match(line)
+                if match is None:
+                    break
+                label = match.group(1)
+                if label in self.symbols or label in self.constants:
+                    raise self.error(f"symbol '{label}' already defined")
+                self.symbols[label] = address
+                line = line[match.end():]
+            line = line.strip()
+            if not line:
+                continue
+            mnemonic, *rest = line.split(None, 1)
+            mnemonic = mnemonic.lower()
+            operands = _split_operands(rest[0]) if rest else []
+            if mnemonic.startswith('.'):
+                address = self.directive(mnemonic, operands, address)
+                continue
+            if address & 3:
+                raise self.error(f"instruction at unaligned address {address:#x}")
+            if mnemonic == 'li':
+                if len(operands) != 2:
+                    raise self.error("li takes rd, value")
+                known = self.value(operands[1], required=False)
+                length = len(_li_sequence(0, known)) if known is not None else LI_FIXED_WORDS
+            elif mnemonic in INSTRUCTIONS or mnemonic in PSEUDO:
+                known, length = None, 1
+            else:
+                raise self.error(f"unknown instruction '{mnemonic}'")
+            self.statements.append((self.lineno, address, mnemonic, operands, known))
+            address += 4 * length
+        return address
+
+    def directive(self, name, operands, address):
+        """Handle directive 'name' at 'address'; returns the address after it."""
+        if name in IGNORED_DIRECTIVES:
+            return address
+        if name in ('.equ', '.set'):
+            if len(operands) != 2:
+                raise self.error(f"{name} takes a name and a value")
+            if operands[0] in self.symbols:
+                raise self.error(f"symbol '{operands[0]}' already defined")
+            self.constants[operands[0]] = self.value(operands[1])
+            return address
+        if name == '.org':
+            target = self.value(operands[0])
+            if target < address:
+                raise self.error(f".org {target:#x} moves backwards from {address:#x}")
+            return target
+        if name in ('.align', '.balign', '.p2align'):
+            alignment = self.value(operands[0])
+            if name != '.balign':
+                alignment = 1 << alignment
+            if alignment & (alignment - 1):
+                raise self.error(f"alignment {alignment} is not a power of two")
+            return -(-address // alignment) * alignment
+        if name in ('.zero', '.space', '.skip'):
+            return address + self.value(operands[0])
+        if name in DATA_SIZES or name == '.double':
+            self.statements.append((self.lineno, address, name, operands, None))
+            return address + len(operands) * (8 if name == '.double' else DATA_SIZES[name][0])
+        if name in ('.ascii', '.string', '.asciz'):
+            terminator = b'' if name == '.ascii' else b'\0'
+            data = b''.join(self.string(operand) + terminator for operand in operands)
+            self.statements.append((self.lineno, address, name, data, None))
+            return address + len(data)
+        raise self.error(f"unknown directive '{name}'")
+
+    def string(self, text):
+        if len(text) < 2 or text[0] != '"' or text[-1] != '"':
+            raise self.error(f"expected a string literal, got '{text}'")
+        return text[1:-1].encode('latin-1').decode('unicode_escape').encode('latin-1')
+
+    # --- Second pass ---
+
+    def encode_all(self, end):
+        image = bytearray(end - self.base)
+        lines = {}
+        for self.lineno, address, mnemonic, operands, known in self.statements:
+            offset = address - self.base
+            if mnemonic.startswith('.'):
+                data = self.data(mnemonic, operands)
+                image[offset:offset + len(data)] = data
+                continue
+            for index, word in enumerate(self.instruction(mnemonic, operands, address, known)):
+                image[offset + 4 * index:offset + 4 * index + 4] = word.to_bytes(4, 'little')
+                lines[address + 4 * index] = self.lineno
+        return bytes(image), lines
+
+    def data(self, name, operands):
+        if name == '.double':
+            out = b''
+            for operand in operands:
+                try:
+                    out += struct.pack('<d', float(operand))
+                except ValueError:
+                    raise self.error(f"bad floating-point value '{operand}'")
+            return out
+        if name in ('.ascii', '.string', '.asciz'):
+            return operands
+        size, fmt = DATA_SIZES[name]
+        out = b''
+        for operand in operands:
+            value = self.value(operand)
+            if not -(1 << 8 * size - 1) <= value < 1 << 8 * size:
+                raise self.error(f"value {value} does not fit in {name}")
+            out += struct.pack(fmt, value & (1 << 8 * size) - 1)
+        return out
+
+    def expect(self, operands, count, form):
+        if len(operands) != count:
+            raise self.error(f"expected '{form}'")
+
+    def instruction(self, mnemonic, operands, pc, known):
+        """Machine words of one (pseudo-)instruction at 'pc'."""
+        if mnemonic == 'nop':
+            self.expect(operands, 0, 'nop')
+            return [self.encode('addi', 0, 0, 0, 0)]
+        if mnemonic == 'mv':
+            self.expect(operands, 2, 'mv rd, rs')
+            return [self.encode('addi', self.register(operands[0]), self.register(operands[1]), 0, 0)]
+        if mnemonic == 'j':
+            self.expect(operands, 1, 'j target')
+            return [self.encode('jal', 0, 0, 0, self.target(operands[0], pc, 21))]
+        if mnemonic == 'ret':
+            self.expect(operands, 0, 'ret')
+            return [self.encode('jalr', 0, 1, 0, 0)]
+        if mnemonic == 'li':
+            rd = self.register(operands[0])
+            if known is not None:
+                steps = _li_sequence(rd, known)
+            else:
+                try:
+                    steps = _li_fixed(rd, self.value(operands[1]))
+                except ValueError as e:
+                    raise self.error(str(e))
+            return [self.encode(name, d, s, 0, imm) for name, d, s, imm in steps]
+        return [self.real(mnemonic, operands, pc)]
+
+    def real(self, mnemonic, operands, pc):
+        key = INSTRUCTIONS[mnemonic]
+        opcode = OPCODES[key]
+        files = CONTROL_TABLE[mnemonic].regFiles
+        reg = self.register
+        if opcode == 0b0110011:  # R-type, M-extension
+            self.expect(operands, 3, f"{mnemonic} rd, rs1, rs2")
+            return self.encode(mnemonic, reg(operands[0]), reg(operands[1]), reg(operands[2]), 0)
+        if opcode == 0b0010011:  # ALU immediate, shifts
+            self.expect(operands, 3, f"{mnemonic} rd, rs1, imm")
+            if mnemonic in ('slli', 'srli', 'srai'):
+                imm = self.immediate(operands[2], 6, signed=False)
+            else:
+                imm = self.immediate(operands[2], 12)
+            return self.encode(mnemonic, reg(operands[0]), reg(operands[1]), 0, imm)
+        if opcode in (0b0000011, 0b0000111):  # loads
+            self.expect(operands, 2, f"{mnemonic} rd, offset(rs1)")
+            offset, base = self.memory_operand(operands[1])
+            return self.encode(mnemonic, reg(operands[0], files[0]), base, 0, self.check12(offset))
+        if opcode in (0b0100011, 0b0100111):  # stores
+            self.expect(operands, 2, f"{mnemonic} rs2, offset(rs1)")
+            offset, base = self.memory_operand(operands[1])
+            return self.encode(mnemonic, 0, base, reg(operands[0], files[2]), self.check12(offset))
+        if opcode == 0b1100011:  # branches
+            self.expect(operands, 3, f"{mnemonic} rs1, rs2, target")
+            return self.encode(mnemonic, 0, reg(operands[0]), reg(operands[1]), self.target(operands[2], pc, 13))
+        if mnemonic == 'jal':
+            if len(operands) == 1:
+                operands = ['ra'] + operands
+            self.expect(operands, 2, "jal [rd,] target")
+            return self.encode(mnemonic, reg(operands[0]), 0, 0, self.target(operands[1], pc, 21))
+        if mnemonic == 'jalr':
+            if len(operands) == 1:  # jalr rs1
+                return self.encode(mnemonic, 1, reg(operands[0]), 0, 0)
+            if len(operands) == 2 and '(' in operands[1]:
+                offset, base = self.memory_operand(operands[1])
+                return self.encode(mnemonic, reg(operands[0]), base, 0, self.check12(offset))
+            if len(operands) not in (2, 3):
+                raise self.error("expected 'jalr rd, offset(rs1)' or 'jalr rd, rs1, offset'")
+            imm = self.immediate(operands[2], 12) if len(operands) == 3 else 0
+            return self.encode(mnemonic, reg(operands[0]), reg(operands[1]), 0, imm)
+        if mnemonic in CSR_OPS:
+            self.expect(operands, 3, f"{mnemonic} rd, csr, {'uimm' if mnemonic.endswith('i') else 'rs1'}")
+            csr = CSRS.get(operands[1].strip().lower())
+            if csr is None:
+                csr = self.immediate(operands[1], 12, signed=False)
+            source = self.immediate(operands[2], 5, signed=False) if mnemonic.endswith('i') else reg(operands[2])
+            return self.encode(mnemonic, reg(operands[0]), source, 0, csr)
+        if opcode in (0b0001111, 0b1110011):  # fence, fence.i, ecall, ebreak
+            self.expect(operands, 0, mnemonic)
+            return self.encode(mnemonic, 0, 0, 0, 0x0FF if mnemonic == 'fence' else 0)
+        # OP-FP and R4-type: registers, then the rounding mode for FP_RM instructions
+        count = sum(kind is not None for kind in files)
+        if key in RS2:
+            count = 2
+        rm = DYN
+        if key in FP_RM and len(operands) == count + 1:
+            rm = ROUNDING_MODES.get(operands[-1].strip().lower())
+            if rm is None:
+                raise self.error(f"unknown rounding mode '{operands[-1]}'")
+            operands = operands[:-1]
+        self.expect(operands, count, f"{mnemonic} with {count} registers")
+        regs = [reg(operand, kind) for operand, kind in zip(operands, files)] + [0] * (4 - count)
+        return self.encode(mnemonic, regs[0], regs[1], regs[2], 0, rs3=regs[3], rm=rm)
+
+    def check12(self, offset):
+        if not -2048 <= offset < 2048:
+            raise self.error(f"offset {offset} does not fit in 12 bits")
+        return offset
+
+    def encode(self, mnemonic, rd, rs1, rs2, imm, rs3=0, rm=None):
+        """Word of 'mnemonic' with these fields; 'imm' is in the format its opcode selects."""
+        key = INSTRUCTIONS[mnemonic]
+        upper = key.upper()
+        opcode = OPCODES[key]
+        f3 = rm if upper in FP_RM and rm is not None else FUNCT3.get(upper, 0)
+        f7 = FUNCT7.get(upper, 0)
+        rs2 = RS2.get(upper, rs2)
+        if opcode in (0b0110011, 0b1010011):  # R-type, OP-FP
+            return (f7 << 25) | (rs2 << 20) | (rs1 << 15) | (f3 << 12) | (rd << 7) | opcode
+        if opcode in (0b1000011, 0b1000111, 0b1001011, 0b1001111):  # R4-type
+            return (rs3 << 27) | (f7 << 25) | (rs2 << 20) | (rs1 << 15) | (f3 << 12) | (rd << 7) | opcode
+        if opcode in (0b0100011, 0b0100111):  # S-type
+            imm &= 0xFFF
+            return ((imm >> 5) << 25) | (rs2 << 20) | (rs1 << 15) | (f3 << 12) | ((imm & 0x1F) << 7) | opcode
+        if opcode == 0b1100011:  # B-type
+            o = imm & 0x1FFF
+            return (((o >> 12) << 31) | (((o >> 5) & 0x3F) << 25) | (rs2 << 20) | (rs1 << 15) | (f3 << 12)
+                    | (((o >> 1) & 0xF) << 8) | (((o >> 11) & 1) << 7) | opcode)
+        if opcode == 0b1101111:  # J-type
+            o = imm & 0x1FFFFF
+            return (((o >> 20) << 31) | (((o >> 1) & 0x3FF) << 21) | (((o >> 11) & 1) << 20)
+                    | (((o >> 12) & 0xFF) << 12) | (rd << 7) | opcode)
+        # I-type; shifts carry funct7's upper bits above the shamt, ecall/ebreak their selector
+        if upper in ('SLLI', 'SRLI', 'SRAI'):
+            imm |= f7 << 5
+        elif upper in ('ECALL', 'EBREAK'):
+            imm = rs2
+        return ((imm & 0xFFF) << 20) | (rs1 << 15) | (f3 << 12) | (rd << 7) | opcode
+
+
+def assemble(source, base=0, name='<source>'):
+    """
+    Assemble 'source' (text) to be loaded at 'base'. Returns an Assembly;
+    raises AssemblyError ('name:line: message').
+    """
+    assembler = _Assembler(base, name)
+    end = assembler.layout(source)
+    image, lines = assembler.encode_all(end)
+    return _result(base, image, assembler.symbols, lines, False)
+
+
+def _result(base, image, symbols, lines, cached):
+    decoded = {pc: decodeWord(int.from_bytes(image[pc - base:pc - base + 4], 'little')) for pc in lines}
+    return Assembly(base, image, symbols.get('_start', base), symbols, decoded, lines, cached)
+
+
+def cache_key(source, base=0):
+    """Name of the cache entry of 'source' assembled at 'base'."""
+    digest = hashlib.sha256(f"{VERSION}:{base}:".encode() + source.encode())
+    return digest.hexdigest()
+
+
+def assemble_file(path, base=0, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    assemble() the file at 'path', through the disk cache in 'cache_dir'
+    (None: no cache). A cache entry that cannot be read is assembled again.
+    Raises OSError or AssemblyError.
+    """
+    with open(path, encoding='utf-8') as f:
+        try:
+            source = f.read()
+        except UnicodeDecodeError as e:
+            raise AssemblyError(f"{path}: not UTF-8 text ({e.reason} at byte {e.start})")
+    if cache_dir is None:
+        return assemble(source, base, path)
+    entry = os.path.join(cache_dir, cache_key(source, base) + '.json')
+    try:
+        with open(entry) as f:
+            saved = json.load(f)
+        return _result(base, bytes.fromhex(saved['image']), saved['symbols'],
+                       {int(pc): line for pc, line in saved['lines'].items()}, True)
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    result = assemble(source, base, path)
+    # Written aside and renamed, so a concurrent reader never sees half an entry
+    temporary = f"{entry}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(temporary, 'w') as f:
+            json.dump({'image': result.image.hex(), 'symbols': result.symbols,
+                       'lines': {str(pc): line for pc, line in result.lines.items()}}, f)
+        os.replace(temporary, entry)
+    except OSError:
+        # The cache is an optimisation only; leave no partial entry behind
+        try:
+            os.unlink(temporary)
+        except OSError:
+            pass
+    return result
+
+
+def load_source(path, memory, base=0, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Assemble the file at 'path' (see assemble_file()) into 'memory' at
+    'base'. Returns a loader.LoadedProgram whose symbols are the labels
+    (sizes unknown: 0), local '.L' labels excluded.
+    """
+    result = assemble_file(path, base, cache_dir)
+    try:
+        memory.load_image(base, result.image)
+    except MemoryFault as e:
+        raise AssemblyError(f"Program does not fit in memory: {e}")
+    labels = {name: (value, 0) for name, value in result.symbols.items() if not name.startswith('.L')}
+    return LoadedProgram(result.entry, [(base, len(result.image))], labels)
@@ -0,0 +1,324 @@
+# batch.py
+# Lockstep execution of many independent harts with NumPy (requires numpy).
+#
+# Every hart ("lane") runs the same program on its own registers and memory.
+# Architectural state is held as arrays: regs is N x 32 uint64 (the same
+# 64-bit patterns as RegisterFile.regs), fregs N x 32 uint64. Memory is
+# mem_size x N bytes (address-major), so an access every lane makes at the
+# same address - instruction fetch, most stack and global data - reads one
+# contiguous row instead of N scattered bytes. Each step picks the lowest PC among the running lanes
+# and executes that instruction for every lane sitting at it, so lanes that
+# diverge on a branch are masked off and pick up again when they reconverge.
+#
+# Results match FunctionalCore (per instruction, bit for bit): the vector
+# ALU ops below mirror alu.ALU_OPS, and any op without a vector form falls
+# back to the scalar callable lane by lane. A lane whose access would raise
+# MemoryFault in the scalar core stops there instead, with 'faulted' set.
+# CSRs follow FunctionalCore too: cycle/time/instret read the lane's retired
+# count, and each lane has its own fcsr. D-extension operations run the
+# scalar fpu.py op lane by lane.
+
+import numpy as np
+
+from alu import ALU_OPS, alu_nop
+from control_unit import CSR_OPS
+from csr import COUNTER_CSRS, FP_FIELDS, IMM_FORMS, csr_write_value
+from fpu import rounding_mode
+from register_file import FREG_BASE
+from utils import decodeWord
+
+U64 = np.uint64
+I64 = np.int64
+_M32 = U64(0xFFFFFFFF)
+_SHAMT = U64(0x3F)
+_ZERO = U64(0)
+_ONES = U64((1 << 64) - 1)
+
+
+def _mulhu(a, b):
+    """High 64 bits of the unsigned 128-bit product, from 32-bit partial products."""
+    a_lo, a_hi = a & _M32, a >> U64(32)
+    b_lo, b_hi = b & _M32, b >> U64(32)
+    lo_lo = a_lo * b_lo
+    lo_hi = a_lo * b_hi
+    hi_lo = a_hi * b_lo
+    cross = (lo_lo >> U64(32)) + (lo_hi & _M32) + (hi_lo & _M32)
+    return a_hi * b_hi + (lo_hi >> U64(32)) + (hi_lo >> U64(32)) + (cross >> U64(32))
+
+
+def _mulh(a, b):
+    # signed high = unsigned high - (a < 0 ? b : 0) - (b < 0 ? a : 0)  (mod 2^64)
+    return (_mulhu(a, b) - np.where(a.view(I64) < 0, b, _ZERO)
+            - np.where(b.view(I64) < 0, a, _ZERO))
+
+
+def _mulhsu(a, b):
+    return _mulhu(a, b) - np.where(a.view(I64) < 0, b, _ZERO)
+
+
+def _magnitude(x):
+    return np.where(x.view(I64) < 0, _ZERO - x, x)
+
+
+def _div(a, b):
+    # Divide magnitudes (exact in uint64, even for -2^63) and fix the sign:
+    # truncates towards zero, and -2^63 / -1 gives -2^63 as in alu._div
+    q = _magnitude(a) // np.where(b == 0, U64(1), _magnitude(b))
+    q = np.where((a.view(I64) < 0) != (b.view(I64) < 0), _ZERO - q, q)
+    return np.where(b == 0, _ONES, q)
+
+
+def _divu(a, b):
+    return np.where(b == 0, _ONES, a // np.where(b == 0, U64(1), b))
+
+
+def _rem(a, b):
+    r = _magnitude(a) % np.where(b == 0, U64(1), _magnitude(b))
+    r = np.where(a.view(I64) < 0, _ZERO - r, r)  # sign follows the dividend
+    return np.where(b == 0, a, r)
+
+
+def _remu(a, b):
+    return np.where(b == 0, a, a % np.where(b == 0, U64(1), b))
+
+
+def _bool(x):
+    return x.astype(U64)
+
+
+# Vector forms of alu.ALU_OPS over uint64 arrays (wrapping arithmetic is mod 2^64)
+VECTOR_OPS = {
+    'add':    lambda a, b: a + b,
+    'sub':    lambda a, b: a - b,
+    'mul':    lambda a, b: a * b,
+    'mulh':   _mulh,
+    'mulhu':  _mulhu,
+    'mulhsu': _mulhsu,
+    'div':    _div,
+    'divu':   _divu,
+    'rem':    _rem,
+    'remu':   _remu,
+    'and':    lambda a, b: a & b,
+    'or':     lambda a, b: a | b,
+    'xor':    lambda a, b: a ^ b,
+    'sll':    lambda a, b: a << (b & _SHAMT),
+    'srl':    lambda a, b: a >> (b & _SHAMT),
+    'sra':    lambda a, b: (a.view(I64) >> (b & _SHAMT).view(I64)).view(U64),
+    'slt':    lambda a, b: _bool(a.view(I64) < b.view(I64)),
+    'sltu':   lambda a, b: _bool(a < b),
+    'beq':    lambda a, b: _bool(a == b),
+    'bne':    lambda a, b: _bool(a != b),
+    'blt':    lambda a, b: _bool(a.view(I64) < b.view(I64)),
+    'bge':    lambda a, b: _bool(a.view(I64) >= b.view(I64)),
+    'bltu':   lambda a, b: _bool(a < b),
+    'bgeu':   lambda a, b: _bool(a >= b),
+}
+
+
+def _nop(a, b):
+    return np.zeros(len(a), dtype=U64)
+
+
+def _scalar_fallback(fn):
+    """Apply a scalar ALU callable lane by lane."""
+    def apply(a, b):
+        return np.fromiter((fn(int(x), int(y)) for x, y in zip(a, b)), dtype=U64, count=len(a))
+    return apply
+
+
+class BatchCore:
+    def __init__(self, n, mem_size=64 * 1024):
+        self.n = n
+        self.mem_size = mem_size
+        self.pc = np.zeros(n, dtype=U64)
+        self.regs = np.zeros((n, 32), dtype=U64)
+        self.fregs = np.zeros((n, 32), dtype=U64)
+        self.fcsr = np.zeros(n, dtype=U64)
+        self.memory = np.zeros((mem_size, n), dtype=np.uint8)  # memory[address, lane]
+        self.instructions_retired = np.zeros(n, dtype=I64)
+        self.faulted = np.zeros(n, dtype=bool)
+        self.steps = 0  # batched steps (one instruction for a group of lanes)
+        self._vector_fns = {}  # ControlSignals -> vector ALU callable
+
+    # --- State setup ---
+    def load_image(self, address, data, lanes=None):
+        """Copy bytes into memory at 'address' for 'lanes' (default: all lanes)."""
+        data = np.frombuffer(bytes(data), dtype=np.uint8)
+        if address < 0 or address + len(data) > self.mem_size:
+            raise ValueError(f"image of {len(data)} bytes at {address:#x} exceeds memory size {self.mem_size:#x}")
+        columns = slice(None) if lanes is None else lanes
+        self.memory[address:address + len(data), columns] = data[:, None]
+
+    def set_lane(self, lane, register_file=None, memory=None, pc=None):
+        """Initialise one lane from scalar state (RegisterFile / PagedMemory)."""
+        if register_file is not None:
+            self.regs[lane] = np.array(register_file.regs, dtype=U64)
+            self.fregs[lane] = np.array(register_file.fregs, dtype=U64)
+            self.fcsr[lane] = register_file.fcsr
+        if memory is not None:
+            self.memory[:, lane] = np.frombuffer(memory.read_range(0, self.mem_size), dtype=np.uint8)
+        if pc is not None:
+            self.pc[lane] = pc
+
+    def lane_memory(self, lane):
+        """One lane's memory image as bytes."""
+        return self.memory[:, lane].tobytes()
+
+    # --- Memory helpers (each lane in 'lanes' accesses its own column) ---
+    def _gather(self, lanes, address, width, signed=False):
+        value = np.zeros(len(lanes), dtype=U64)
+        index = address.astype(np.intp)
+        for j in range(width):
+            value |= self.memory[index + j, lanes].astype(U64) << U64(8 * j)
+        if signed and width < 8:
+            sign = (value >> U64(8 * width - 1)) & U64(1)
+            value |= np.where(sign == 1, _ONES << U64(8 * width), _ZERO)
+        return value
+
+    def _scatter(self, lanes, address, width, value):
+        index = address.astype(np.intp)
+        for j in range(width):
+            self.memory[index + j, lanes] = ((value >> U64(8 * j)) & U64(0xFF)).astype(np.uint8)
+
+    def _in_bounds(self, lanes, address, width):
+        """Mask of 'lanes' whose 'width'-byte access is in bounds; the rest are marked faulted."""
+        ok = address <= U64(self.mem_size - width)
+        if not ok.all():
+            self.faulted[lanes[~ok]] = True
+        return ok
+
+    def _vector_fn(self, ctrl):
+        fn = self._vector_fns.get(ctrl)
+        if fn is None:
+            if ctrl.aluFn is alu_nop:
+                fn = _nop
+            elif ctrl.aluOp in VECTOR_OPS and ctrl.aluFn is ALU_OPS.get(ctrl.aluOp):
+                fn = VECTOR_OPS[ctrl.aluOp]
+            else:
+                fn = _scalar_fallback(ctrl.aluFn)
+            self._vector_fns[ctrl] = fn
+        return fn
+
+    def _csr(self, sel, inst, rs1_val):
+        """Vector Zicsr instruction for the lanes in 'sel'; returns the old CSR values."""
+        csr = inst.imm & 0xFFF
+        if csr in COUNTER_CSRS:
+            old = self.instructions_retired[sel].astype(U64)
+        elif csr in FP_FIELDS:
+            shift, mask = (U64(v) for v in FP_FIELDS[csr])
+            old = (self.fcsr[sel] >> shift) & mask
+        else:
+            old = np.zeros(len(rs1_val), dtype=U64)
+        operand = np.full(len(rs1_val), inst.rs1, dtype=U64) if inst.mnemonic in IMM_FORMS else rs1_val
+        value = csr_write_value(inst.mnemonic, old, operand, inst.rs1)
+        if value is not None and csr in FP_FIELDS:
+            self.fcsr[sel] = (self.fcsr[sel] & ~(mask << shift)) | ((value & mask) << shift)
+        return old
+
+    def _operand(self, sel, key):
+        """Register 'key' (register_file keys) for the lanes in 'sel'."""
+        return self.regs[sel, key] if key < FREG_BASE else self.fregs[sel, key - FREG_BASE]
+
+    def _fp(self, sel, inst):
+        """D-extension operation for the lanes in 'sel' (scalar, lane by lane); accrues fflags."""
+        _, rs1, rs2, rs3 = inst.keys
+        a, b, c = self._operand(sel, rs1), self._operand(sel, rs2), self._operand(sel, rs3)
+        fcsr = self.fcsr[sel]
+        fn = inst.ctrl.fpuFn
+        result = np.empty(len(fcsr), dtype=U64)
+        fflags = np.empty(len(fcsr), dtype=U64)
+        for j in range(len(fcsr)):
+            result[j], fflags[j] = fn(int(a[j]), int(b[j]), int(c[j]), rounding_mode(inst.inst_word, int(fcsr[j])))
+        self.fcsr[sel] = fcsr | fflags
+        return result
+
+    # --- Execution ---
+    def step(self, running):
+        """
+        Execute one instruction for the group of running lanes at the lowest
+        PC. 'running' is a bool mask of lanes allowed to execute.
+        """
+        pcs = self.pc
+        pc = pcs[running].min()
+        lanes = np.flatnonzero(running & (pcs == pc))
+        self.steps += 1
+
+        if pc > U64(self.mem_size - 4):
+            self.faulted[lanes] = True
+            return
+        pc = int(pc)
+        # 'sel' indexes the group: a plain slice when every lane is in it
+        sel = slice(None) if len(lanes) == self.n else lanes
+        # Lanes may hold different code at this PC: run the first lane's word
+        # now and leave the others for a later step
+        code = self.memory[pc:pc + 4, sel]
+        same = (code == code[:, :1]).all(axis=0)
+        if not same.all():
+            lanes = lanes[same]
+            sel = lanes
+        word = int.from_bytes(code[:, 0].tobytes(), 'little')
+
+        inst = decodeWord(word)
+        ctrl = inst.ctrl
+        regs = self.regs
+        imm = U64(inst.imm & 0xFFFFFFFFFFFFFFFF)
+        op1 = regs[sel, inst.rs1]
+        op2 = np.full(len(lanes), imm, dtype=U64) if ctrl.aluSrc else regs[sel, inst.rs2]
+        result = self._vector_fn(ctrl)(op1, op2)
+        next_pc = np.full(len(lanes), (pc + 4) & 0xFFFFFFFFFFFFFFFF, dtype=U64)
+
+        if ctrl.branch:
+            next_pc[result != 0] = U64((pc + inst.imm) & 0xFFFFFFFFFFFFFFFF)
+        elif inst.mnemonic == 'jal':
+            next_pc[:] = U64((pc + inst.imm) & 0xFFFFFFFFFFFFFFFF)
+            result = np.full(len(lanes), pc + 4, dtype=U64)
+        elif inst.mnemonic == 'jalr':
+            next_pc = (op1 + imm) & ~U64(1)
+            result = np.full(len(lanes), pc + 4, dtype=U64)
+        elif inst.mnemonic in CSR_OPS:
+            result = self._csr(sel, inst, op1)
+        elif ctrl.fpuOp is not None:
+            result = self._fp(sel, inst)
+
+        if ctrl.memRead or ctrl.memWrite:
+            ok = self._in_bounds(lanes, result, ctrl.memWidth)
+            if not ok.all():
+                # Faulting lanes stop before the access, like MemoryFault in the scalar core
+                lanes, result, next_pc = lanes[ok], result[ok], next_pc[ok]
+                sel = lanes
+            if ctrl.memRead:
+                result = self._gather(lanes, result, ctrl.memWidth, ctrl.memSigned)
+            else:
+                self._scatter(lanes, result, ctrl.memWidth, self._operand(sel, inst.keys[2]))
+
+        if ctrl.regWrite:
+            rd = inst.keys[0]
+            if rd >= FREG_BASE:
+                self.fregs[sel, rd - FREG_BASE] = result
+            elif rd != 0:
+                regs[sel, rd] = result
+
+        pcs[sel] = next_pc
+        self.instructions_retired[sel] += 1
+
+    def run(self, max_instructions=None, until_pc=None):
+        """
+        Run every lane until it has retired 'max_instructions' more
+        instructions, its PC reaches 'until_pc', or it faults.
+        Returns the per-lane number of instructions retired by this call.
+        """
+        if max_instructions is None and until_pc is None:
+            raise ValueError("run() needs max_instructions and/or until_pc")
+        start = self.instructions_retired.copy()
+        limit = start + max_instructions if max_instructions is not None else None
+        step = self.step
+        while True:
+            running = ~self.faulted
+            if limit is not None:
+                running &= self.instructions_retired < limit
+            if until_pc is not None:
+                running &= self.pc != U64(until_pc)
+            if not running.any():
+                break
+            step(running)
+        return self.instructions_retired - start
@@ -0,0 +1,81 @@
+# benchmarks/batch_lanes.py
+# Throughput of batched lockstep harts (batch.py) against separate scalar runs.
+#
+# Every lane runs the same Collatz-style loop on its own input, so the
+# branch on the low bit diverges between lanes on most iterations. A sample
+# of lanes is checked against FunctionalCore runs register for register.
+# Run from the repository root:  python benchmarks/batch_lanes.py [lanes]
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch import BatchCore
+from functional import FunctionalCore
+from memory_unit import PagedMemory
+from register_file import RegisterFile
+
+# x10: input, x11: iterations, x12: sum of the sequence
+PROGRAM = [
+    0x00157293,  # 00: andi x5, x10, 1
+    0x00028A63,  # 04: beq x5, x0, +20 (-> 0x18)
+    0x00A50333,  # 08: add x6, x10, x10
+    0x00A30533,  # 0C: add x10, x6, x10
+    0x00150513,  # 10: addi x10, x10, 1
+    0x0080006F,  # 14: jal x0, +8 (-> 0x1C)
+    0x00155513,  # 18: srli x10, x10, 1
+    0x00A60633,  # 1C: add x12, x12, x10
+    0xFFF58593,  # 20: addi x11, x11, -1
+    0xFC059EE3,  # 24: bne x11, x0, -36 (-> 0x00)
+]
+END_PC = 4 * len(PROGRAM)
+ITERATIONS = 64
+MEM_SIZE = 4096
+IMAGE = b"".join(word.to_bytes(4, 'little') for word in PROGRAM)
+
+
+def scalar_lane(value):
+    memory = PagedMemory(MEM_SIZE)
+    memory.load_image(0, IMAGE)
+    register_file = RegisterFile()
+    register_file.regs[10] = value
+    register_file.regs[11] = ITERATIONS
+    core = FunctionalCore(memory, register_file, 0)
+    core.run(until_pc=END_PC)
+    return core
+
+
+def main(lanes=4096, scalar_lanes=64, seed=1):
+    rng = random.Random(seed)
+    inputs = [rng.randrange(1, 1 << 40) for _ in range(lanes)]
+
+    start = time.perf_counter()
+    cores = [scalar_lane(value) for value in inputs[:scalar_lanes]]
+    scalar_time = time.perf_counter() - start
+    scalar_insts = sum(core.instructions_retired for core in cores)
+
+    start = time.perf_counter()
+    batch = BatchCore(lanes, MEM_SIZE)
+    batch.load_image(0, IMAGE)
+    batch.regs[:, 10] = inputs
+    batch.regs[:, 11] = ITERATIONS
+    batch.run(until_pc=END_PC)
+    batch_time = time.perf_counter() - start
+    batch_insts = int(batch.instructions_retired.sum())
+
+    for lane, core in enumerate(cores):
+        assert core.register_file.regs == [int(v) for v in batch.regs[lane]], lane
+        assert core.pc == int(batch.pc[lane]), lane
+
+    print(f"Scalar: {scalar_lanes:6d} lanes {scalar_time:7.3f} s {scalar_lanes / scalar_time:10.0f} lanes/s "
+          f"{scalar_insts / scalar_time / 1e6:7.2f} M inst/s")
+    print(f"Batch:  {lanes:6d} lanes {batch_time:7.3f} s {lanes / batch_time:10.0f} lanes/s "
+          f"{batch_insts / batch_time / 1e6:7.2f} M inst/s ({batch.steps} batched steps)")
+    print(f"Speedup (lanes/s): {(lanes / batch_time) / (scalar_lanes / scalar_time):.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 4096)
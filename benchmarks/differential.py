@@ -0,0 +1,149 @@
+# benchmarks/differential.py
+# Differential check of the cycle-level cores against FunctionalCore.
+#
+# Each program runs on the functional core and on the pipeline at every
+# --width (in-order, with a small D-cache so misses freeze the pipeline
+# while the FPU and multiply/divide units keep running, and on the
+# out-of-order core); registers, data memory and retired counts must
+# match exactly. The programs are the regression cases below plus
+# straight-line random ones mixing integer, M-extension, FP and memory ops.
+# Run from the repository root:  python benchmarks/differential.py [--seeds N] [--width N ...]
+
+import argparse
+import os
+import random
+import struct
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kernels import Asm, MEM_SIZE, HALT, DATA
+
+BASE = 20  # x20 holds DATA in every program
+DCACHE = '2k:32:2:lru'
+MISS_PENALTY = 5
+
+
+def _double(value):
+    return struct.unpack('<q', struct.pack('<d', value))[0]
+
+
+def older_write_held_by_miss(asm):
+    """
+    The fmv.d.x is still in MEM/WB when the ld's miss freezes the pipeline;
+    the younger fadd.d must not write f4 before it (f4 = 3.0).
+    """
+    asm.li(5, _double(2.0))
+    asm.r('fmv.d.x', 2, 5, 0)
+    asm.li(5, _double(1.0))
+    asm.r('fmv.d.x', 3, 5, 0)
+    asm.r('fmv.d.x', 4, 0, 0)
+    asm.r('fadd.d', 4, 2, 3)
+    asm.i('ld', 3, BASE, 1790)  # straddles two lines
+
+
+def older_write_held_by_miss_mext(asm):
+    """As above for the divider: x14 ends as divu's quotient of a division by zero."""
+    asm.i('addi', 13, 0, 7)
+    asm.i('addi', 4, 0, 9)
+    asm.r('sub', 14, 15, 13)
+    asm.r('divu', 14, 4, 6)
+    asm.i('ld', 3, BASE, 1790)
+
+
+REGRESSIONS = [older_write_held_by_miss, older_write_held_by_miss_mext]
+
+INT_OPS = ('add', 'sub', 'xor', 'or', 'and', 'sll', 'srl', 'sra', 'slt', 'sltu',
+           'mul', 'mulh', 'mulhu', 'div', 'divu', 'rem', 'remu')
+FP_OPS = ('fadd.d', 'fsub.d', 'fmul.d', 'fdiv.d')
+
+
+def random_program(rng, length=40):
+    """Straight-line code over x1-x15 and f0-f7, loads and stores within 2 KiB of DATA."""
+    def build(asm):
+        for rd in range(1, 16):
+            asm.li(rd, rng.randrange(-(1 << 40), 1 << 40))
+        for fd in range(8):
+            asm.r('fmv.d.x', fd, rng.randrange(1, 16), 0)
+        for _ in range(length):
+            kind = rng.random()
+            rd, rs1, rs2 = rng.randrange(1, 16), rng.randrange(0, 16), rng.randrange(0, 16)
+            if kind < 0.4:
+                asm.r(rng.choice(INT_OPS), rd, rs1, rs2)
+            elif kind < 0.5:
+                asm.i('addi', rd, rs1, rng.randrange(-2048, 2048))
+            elif kind < 0.65:
+                asm.r(rng.choice(FP_OPS), rng.randrange(8), rng.randrange(8), rng.randrange(8))
+            elif kind < 0.7:
+                asm.r('fmv.d.x', rng.randrange(8), rs1, 0)
+            elif kind < 0.85:
+                asm.i(rng.choice(('ld', 'lw', 'lbu', 'fld')), rd if rng.random() < 0.8 else rng.randrange(8),
+                      BASE, rng.randrange(0, 2041))
+            else:
+                asm.s(rng.choice(('sd', 'sw', 'sb')), rs2, BASE, rng.randrange(0, 2041))
+    return build
+
+
+def _image(build):
+    asm = Asm()
+    asm.li(BASE, DATA)
+    build(asm)
+    asm.halt()
+    return asm.assemble()
+
+
+def _state(sim_or_core, retired):
+    rf = sim_or_core.register_file
+    return list(rf.regs), list(rf.fregs), sim_or_core.memory.read_range(DATA, 4096), retired
+
+
+def run_functional(image):
+    from functional import FunctionalCore
+    from memory_unit import PagedMemory
+    memory = PagedMemory(MEM_SIZE)
+    memory.load_image(0, image)
+    core = FunctionalCore(memory, None, 0, translate=False)
+    return _state(core, core.run(until_pc=HALT))
+
+
+def run_pipeline(image, width, core='inorder'):
+    from main import Simulator
+    sim = Simulator(MEM_SIZE, width=width, core=core, dcache=DCACHE, miss_penalty=MISS_PENALTY)
+    sim.memory.load_image(0, image)
+    return _state(sim, sim.run(1 << 24).retired)
+
+
+def check(build, widths):
+    """Names of the configurations whose final state differs from the functional core's."""
+    image = _image(build)
+    expected = run_functional(image)
+    failed = []
+    for width in widths:
+        for core in ('inorder', 'ooo'):
+            if run_pipeline(image, width, core) != expected:
+                failed.append(f"{core} width {width}")
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Differential check of the cycle-level cores against FunctionalCore")
+    parser.add_argument("--seeds", type=int, default=100, help="random programs to run (default: 100)")
+    parser.add_argument("--width", type=int, action="append", default=None, metavar="N",
+                        help="pipeline issue width (repeatable; default: 1 to 4)")
+    args = parser.parse_args(argv)
+    widths = args.width or (1, 2, 3, 4)
+
+    cases = [(build.__name__, build) for build in REGRESSIONS]
+    cases += [(f"seed {seed}", random_program(random.Random(seed))) for seed in range(args.seeds)]
+    failures = 0
+    for name, build in cases:
+        failed = check(build, widths)
+        if failed:
+            failures += 1
+            print(f"{name}: differs on {', '.join(failed)}")
+    print(f"{len(cases) - failures}/{len(cases)} programs match the functional core")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
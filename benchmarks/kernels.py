@@ -0,0 +1,327 @@
+# benchmarks/kernels.py
+# Benchmark kernels for benchmarks/suite.py, built with a small in-line
+# encoder (Asm) over the isa.py tables.
+#
+# Memory layout (MEM_SIZE bytes): code from 0, data from DATA, stack
+# growing down from the top. Every kernel ends by jumping to HALT (the end
+# of memory), where the pipeline drains and stops; the functional core runs
+# until_pc=HALT. Each kernel's check() compares memory against a Python
+# reference; None means it cannot be checked yet.
+
+import os
+import random
+import struct
+import sys
+import zlib
+from collections import namedtuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from isa import OPCODES, FUNCT3, FUNCT7, RS2
+
+MEM_SIZE = 64 * 1024
+HALT = MEM_SIZE
+DATA = 0x4000
+
+# ABI register numbers used below
+ZERO, RA, SP, T0, T1, T2 = 0, 1, 2, 5, 6, 7
+S0, S1, A0, A1, A2, A3, A4, A5, A6, A7 = 8, 9, 10, 11, 12, 13, 14, 15, 16, 17
+T3, T4, T5, T6 = 28, 29, 30, 31
+
+# name: benchmark label; image: code bytes at 0; data: [(address, bytes)];
+# check(memory) -> True/False, or None when there is nothing to verify
+Kernel = namedtuple("Kernel", ["name", "image", "data", "check"])
+
+
+class Asm:
+    """Just enough of an assembler for the kernels: one method per format, label fixups."""
+    def __init__(self):
+        self.words = []
+        self.labels = {}
+        self.fixups = []  # (word index, mnemonic, fields, label)
+
+    @staticmethod
+    def _fields(mnemonic):
+        key = mnemonic.upper()
+        opcode = OPCODES.get(mnemonic, OPCODES.get(key))
+        return opcode, FUNCT3.get(key, 0), FUNCT7.get(key, 0)
+
+    def label(self, name):
+        self.labels[name] = 4 * len(self.words)
+
+    def r(self, mnemonic, rd, rs1, rs2):
+        opcode, f3, f7 = self._fields(mnemonic)
+        rs2 = RS2.get(mnemonic.upper(), rs2)
+        self.words.append((f7 << 25) | (rs2 << 20) | (rs1 << 15) | (f3 << 12) | (rd << 7) | opcode)
+
+    def i(self, mnemonic, rd, rs1, imm):
+        """I-type: ALU immediates, shifts (imm = shamt), loads, jalr."""
+        opcode, f3, f7 = self._fields(mnemonic)
+        if mnemonic in ('slli', 'srli', 'srai'):
+            imm = (f7 << 5) | imm
+        assert -2048 <= imm < 4096, (mnemonic, imm)
+        self.words.append(((imm & 0xFFF) << 20) | (rs1 << 15) | (f3 << 12) | (rd << 7) | opcode)
+
+    def s(self, mnemonic, rs2, rs1, imm):
+        opcode, f3, _ = self._fields(mnemonic)
+        imm &= 0xFFF
+        self.words.append(((imm >> 5) << 25) | (rs2 << 20) | (rs1 << 15) | (f3 << 12) | ((imm & 0x1F) << 7) | opcode)
+
+    def b(self, mnemonic, rs1, rs2, label):
+        self.fixups.append((len(self.words), mnemonic, (rs1, rs2), label))
+        self.words.append(0)
+
+    def jal(self, rd, label):
+        self.fixups.append((len(self.words), 'jal', (rd,), label))
+        self.words.append(0)
+
+    def li(self, rd, value):
+        """Load a constant (addi, then slli/addi per further 12 bits; there is no lui)."""
+        low = ((value & 0xFFF) ^ 0x800) - 0x800
+        high = (value - low) >> 12
+        if high == 0:
+            self.i('addi', rd, ZERO, low)
+            return
+        self.li(rd, high)
+        self.i('slli', rd, rd, 12)
+        if low:
+            self.i('addi', rd, rd, low)
+
+    def halt(self):
+        self.li(T6, HALT)
+        self.i('jalr', ZERO, T6, 0)
+
+    def assemble(self):
+        for index, mnemonic, regs, label in self.fixups:
+            offset = self.labels[label] - 4 * index
+            opcode, f3, _ = self._fields(mnemonic)
+            if mnemonic == 'jal':
+                o = offset & 0x1FFFFF
+                self.words[index] = (((o >> 20) << 31) | (((o >> 1) & 0x3FF) << 21) | (((o >> 11) & 1) << 20)
+                                     | (((o >> 12) & 0xFF) << 12) | (regs[0] << 7) | opcode)
+            else:
+                o = offset & 0x1FFF
+                rs1, rs2 = regs
+                self.words[index] = (((o >> 12) << 31) | (((o >> 5) & 0x3F) << 25) | (rs2 << 20) | (rs1 << 15)
+                                     | (f3 << 12) | (((o >> 1) & 0xF) << 8) | (((o >> 11) & 1) << 7) | opcode)
+        return b"".join(word.to_bytes(4, 'little') for word in self.words)
+
+
+def _dwords(values):
+    return struct.pack(f"<{len(values)}q", *values)
+
+
+def _read_dwords(memory, address, count):
+    return list(struct.unpack(f"<{count}q", memory.read_range(address, 8 * count)))
+
+
+# --- Kernels ---
+
+def matmul(n=24, seed=1):
+    """C = A x B for n x n int64 matrices (row-major)."""
+    rng = random.Random(seed)
+    a = [rng.randrange(-1000, 1000) for _ in range(n * n)]
+    b = [rng.randrange(-1000, 1000) for _ in range(n * n)]
+    a_addr, b_addr, c_addr = DATA, DATA + 8 * n * n, DATA + 16 * n * n
+    asm = Asm()
+    asm.li(S0, a_addr)          # row pointer into A
+    asm.li(S1, c_addr)          # output pointer
+    asm.li(A6, n)
+    asm.li(A7, 8 * n)           # row stride
+    asm.i('addi', A0, ZERO, 0)  # i
+    asm.label('row')
+    asm.i('addi', A1, ZERO, 0)  # j
+    asm.label('col')
+    asm.i('addi', T0, S0, 0)    # &A[i][0]
+    asm.li(T1, b_addr)
+    asm.i('slli', T2, A1, 3)
+    asm.r('add', T1, T1, T2)    # &B[0][j]
+    asm.i('addi', A3, ZERO, 0)  # sum
+    asm.i('addi', A2, ZERO, 0)  # k
+    asm.label('dot')
+    asm.i('ld', T3, T0, 0)
+    asm.i('ld', T4, T1, 0)
+    asm.r('mul', T5, T3, T4)
+    asm.r('add', A3, A3, T5)
+    asm.i('addi', T0, T0, 8)
+    asm.r('add', T1, T1, A7)
+    asm.i('addi', A2, A2, 1)
+    asm.b('blt', A2, A6, 'dot')
+    asm.s('sd', A3, S1, 0)
+    asm.i('addi', S1, S1, 8)
+    asm.i('addi', A1, A1, 1)
+    asm.b('blt', A1, A6, 'col')
+    asm.r('add', S0, S0, A7)
+    asm.i('addi', A0, A0, 1)
+    asm.b('blt', A0, A6, 'row')
+    asm.halt()
+
+    expected = [sum(a[i * n + k] * b[k * n + j] for k in range(n)) for i in range(n) for j in range(n)]
+    return Kernel(f"matmul{n}", asm.assemble(), [(a_addr, _dwords(a)), (b_addr, _dwords(b))],
+                  lambda memory: _read_dwords(memory, c_addr, n * n) == expected)
+
+
+def memcpy_memset(size=16384, seed=2):
+    """memset(dst, 0x5A, size), then memcpy(dst, src, size), a doubleword at a time."""
+    rng = random.Random(seed)
+    src = bytes(rng.randrange(256) for _ in range(size))
+    src_addr, dst_addr = DATA, DATA + size
+    asm = Asm()
+    asm.li(A0, dst_addr)
+    asm.li(A2, dst_addr + size)
+    asm.li(T0, 0x5A5A5A5A5A5A5A5A)
+    asm.label('set')
+    asm.s('sd', T0, A0, 0)
+    asm.i('addi', A0, A0, 8)
+    asm.b('bltu', A0, A2, 'set')
+    asm.li(A0, dst_addr)
+    asm.li(A1, src_addr)
+    asm.label('copy')
+    asm.i('ld', T0, A1, 0)
+    asm.s('sd', T0, A0, 0)
+    asm.i('addi', A1, A1, 8)
+    asm.i('addi', A0, A0, 8)
+    asm.b('bltu', A0, A2, 'copy')
+    asm.halt()
+    return Kernel(f"memcpy{size}", asm.assemble(), [(src_addr, src)],
+                  lambda memory: memory.read_range(dst_addr, size) == src)
+
+
+def insertion_sort(n=160, seed=3):
+    """Sort n signed int64 values in place."""
+    rng = random.Random(seed)
+    values = [rng.randrange(-(1 << 40), 1 << 40) for _ in range(n)]
+    base = DATA
+    asm = Asm()
+    asm.li(S0, base)
+    asm.li(A6, 8 * n)
+    asm.i('addi', A0, ZERO, 8)  # byte offset of the element to insert
+    asm.label('outer')
+    asm.r('add', T0, S0, A0)
+    asm.i('ld', T1, T0, 0)      # key
+    asm.label('inner')
+    asm.b('beq', T0, S0, 'place')
+    asm.i('ld', T2, T0, -8)
+    asm.b('bge', T1, T2, 'place')
+    asm.s('sd', T2, T0, 0)
+    asm.i('addi', T0, T0, -8)
+    asm.jal(ZERO, 'inner')
+    asm.label('place')
+    asm.s('sd', T1, T0, 0)
+    asm.i('addi', A0, A0, 8)
+    asm.b('blt', A0, A6, 'outer')
+    asm.halt()
+    expected = sorted(values)
+    return Kernel(f"isort{n}", asm.assemble(), [(base, _dwords(values))],
+                  lambda memory: _read_dwords(memory, base, n) == expected)
+
+
+def crc32(size=1024, seed=4):
+    """Bitwise (table-free) reflected CRC-32 of a byte buffer; result stored after it."""
+    rng = random.Random(seed)
+    data = bytes(rng.randrange(256) for _ in range(size))
+    base, out = DATA, DATA + size
+    asm = Asm()
+    asm.li(A0, base)
+    asm.li(A1, base + size)
+    asm.li(A2, 0xEDB88320)
+    asm.li(A3, 0xFFFFFFFF)      # crc
+    asm.label('byte')
+    asm.i('lbu', T0, A0, 0)
+    asm.r('xor', A3, A3, T0)
+    asm.i('addi', T1, ZERO, 8)
+    asm.label('bit')
+    asm.i('andi', T2, A3, 1)
+    asm.r('sub', T2, ZERO, T2)  # all ones if the low bit is set
+    asm.r('and', T2, T2, A2)
+    asm.i('srli', A3, A3, 1)
+    asm.r('xor', A3, A3, T2)
+    asm.i('addi', T1, T1, -1)
+    asm.b('bne', T1, ZERO, 'bit')
+    asm.i('addi', A0, A0, 1)
+    asm.b('bltu', A0, A1, 'byte')
+    asm.i('xori', A3, A3, -1)
+    asm.i('slli', A3, A3, 32)
+    asm.i('srli', A3, A3, 32)
+    asm.li(T0, out)
+    asm.s('sd', A3, T0, 0)
+    asm.halt()
+    expected = zlib.crc32(data)
+    return Kernel(f"crc32_{size}", asm.assemble(), [(base, data)],
+                  lambda memory: memory.load(out, 8) == expected)
+
+
+def fib(n=18):
+    """Naive recursive Fibonacci through jal/jalr calls with a stack frame."""
+    out = DATA
+    asm = Asm()
+    asm.li(SP, MEM_SIZE)
+    asm.i('addi', A0, ZERO, n)
+    asm.jal(RA, 'fib')
+    asm.li(T0, out)
+    asm.s('sd', A0, T0, 0)
+    asm.halt()
+    asm.label('fib')            # a0 = fib(a0)
+    asm.i('addi', T0, ZERO, 2)
+    asm.b('blt', A0, T0, 'leaf')
+    asm.i('addi', SP, SP, -24)
+    asm.s('sd', RA, SP, 16)
+    asm.s('sd', A0, SP, 8)
+    asm.i('addi', A0, A0, -1)
+    asm.jal(RA, 'fib')
+    asm.s('sd', A0, SP, 0)      # fib(n - 1)
+    asm.i('ld', A0, SP, 8)
+    asm.i('addi', A0, A0, -2)
+    asm.jal(RA, 'fib')
+    asm.i('ld', T1, SP, 0)
+    asm.r('add', A0, A0, T1)
+    asm.i('ld', RA, SP, 16)
+    asm.i('addi', SP, SP, 24)
+    asm.label('leaf')
+    asm.i('jalr', ZERO, RA, 0)
+
+    a, b = 0, 1
+    for _ in range(n):
+        a, b = b, a + b
+    return Kernel(f"fib{n}", asm.assemble(), [], lambda memory: memory.load(out, 8) == a)
+
+
+def fp_dot(n=2048, seed=5):
+    """Double-precision dot product with fld/fmul.d/fadd.d; result stored with fsd."""
+    rng = random.Random(seed)
+    x = [rng.uniform(-1.0, 1.0) for _ in range(n)]
+    y = [rng.uniform(-1.0, 1.0) for _ in range(n)]
+    x_addr, y_addr, out = DATA, DATA + 8 * n, DATA + 16 * n
+    asm = Asm()
+    asm.li(A0, x_addr)
+    asm.li(A1, y_addr)
+    asm.li(A2, x_addr + 8 * n)
+    asm.r('fmv.d.x', 0, ZERO, 0)  # f0 = 0.0
+    asm.label('loop')
+    asm.i('fld', 1, A0, 0)
+    asm.i('fld', 2, A1, 0)
+    asm.r('fmul.d', 3, 1, 2)
+    asm.r('fadd.d', 0, 0, 3)
+    asm.i('addi', A0, A0, 8)
+    asm.i('addi', A1, A1, 8)
+    asm.b('bltu', A0, A2, 'loop')
+    asm.li(T0, out)
+    asm.s('fsd', 0, T0, 0)
+    asm.halt()
+    expected = 0.0
+    for a, b in zip(x, y):
+        expected += a * b  # same order and rounding as the kernel
+    return Kernel(f"fpdot{n}", asm.assemble(), [(x_addr, struct.pack(f"<{n}d", *x)),
+                                                (y_addr, struct.pack(f"<{n}d", *y))],
+                  lambda memory: memory.read_range(out, 8) == struct.pack("<d", expected))
+
+
+# Default suite, in report order
+KERNELS = {
+    'matmul': matmul,
+    'memcpy': memcpy_memset,
+    'isort': insertion_sort,
+    'crc32': crc32,
+    'fib': fib,
+    'fpdot': fp_dot,
+}
@@ -0,0 +1,183 @@
+# benchmarks/suite.py
+# Benchmark suite: host simulation speed and simulated CPI on real kernels.
+#
+# Every kernel in benchmarks/kernels.py runs on the cycle-level pipeline and
+# on the functional core (basic-block translation on), the pipeline once per
+# --width issue width (default 1). '--mode ooo' adds the out-of-order core
+# at the same widths, and its speedup over the in-order pipeline. Each measurement runs
+# in a fresh process, so the peak RSS it reports belongs to that run alone;
+# the wall time is the best of --repeat runs. Kernel results are checked
+# against a Python reference.
+#
+# --save writes the results to the baseline file; later runs print their
+# speedup over it (and flag any change in simulated cycles).
+# Run from the repository root:  python benchmarks/suite.py [KERNEL ...] [--width N ...] [--repeat N] [--save]
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kernels import KERNELS, MEM_SIZE, HALT
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+MODES = ('pipeline', 'functional', 'ooo')
+DEFAULT_MODES = ('pipeline', 'functional')
+# Modes simulating cycles, run once per --width
+TIMED_MODES = ('pipeline', 'ooo')
+
+
+def _peak_rss_kib():
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss  # bytes on macOS, KiB elsewhere
+
+
+def _run_once(kernel, mode, width=1):
+    """Simulate 'kernel' once from a fresh state; returns (seconds, retired, cycles, check)."""
+    from functional import FunctionalCore
+    from main import Simulator
+
+    sim = Simulator(MEM_SIZE, width=width, core='ooo' if mode == 'ooo' else 'inorder')
+    sim.memory.load_image(0, kernel.image)
+    for address, data in kernel.data:
+        sim.memory.load_image(address, data)
+    start = time.perf_counter()
+    if mode in TIMED_MODES:
+        result = sim.run(1 << 62)
+        cycles = result.cycles
+        retired = result.retired
+    else:
+        retired = FunctionalCore(sim.memory, sim.register_file, 0).run(until_pc=HALT)
+        cycles = None
+    seconds = time.perf_counter() - start
+    return seconds, retired, cycles, kernel.check(sim.memory)
+
+
+def measure(name, mode, repeat=1, width=1):
+    """Run one kernel in one mode (in the worker process). Returns the result record."""
+    kernel = KERNELS[name]()
+    runs = [_run_once(kernel, mode, width) for _ in range(repeat)]
+    seconds, retired, cycles, check = min(runs, key=lambda run: run[0])
+    return {
+        'kernel': kernel.name,
+        'mode': mode,
+        'width': width,
+        'retired': retired,
+        'cycles': cycles,
+        'cpi': cycles / retired if cycles is not None and retired else None,
+        'ipc': retired / cycles if cycles else None,
+        'seconds': seconds,
+        'kips': retired / seconds / 1e3 if seconds else 0.0,
+        'peak_rss_kib': _peak_rss_kib(),
+        'check': check,
+    }
+
+
+def run_suite(names, modes, repeat=1, widths=(1,)):
+    """Measure every (kernel, mode, pipeline width) combination, each in its own fresh process."""
+    records = []
+    context = multiprocessing.get_context('spawn')
+    for name in names:
+        for mode in modes:
+            for width in widths if mode in TIMED_MODES else (1,):
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    records.append(pool.submit(measure, name, mode, repeat, width).result())
+    return records
+
+
+def host_info():
+    return {'python': platform.python_version(), 'implementation': platform.python_implementation(),
+            'machine': platform.machine(), 'system': platform.system(), 'processor': platform.processor()}
+
+
+def load_baseline(path):
+    try:
+        with open(path) as f:
+            return {(r['kernel'], r['mode'], r.get('width', 1)): r for r in json.load(f)['results']}
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def save_baseline(path, records):
+    with open(path, 'w') as f:
+        json.dump({'host': host_info(), 'results': records}, f, indent=2)
+        f.write('\n')
+
+
+def print_table(records, baseline):
+    print(f"{'kernel':<14}{'mode':<12}{'width':>5}{'retired':>9}{'cycles':>9}{'CPI':>7}{'IPC':>7}{'wall s':>9}{'KIPS':>9}"
+          f"{'RSS MiB':>9}  {'check':<6}{'vs base':>8}")
+    for r in records:
+        cycles = f"{r['cycles']:>9}" if r['cycles'] is not None else f"{'-':>9}"
+        cpi = f"{r['cpi']:>7.3f}" if r['cpi'] is not None else f"{'-':>7}"
+        ipc = f"{r['ipc']:>7.3f}" if r['ipc'] is not None else f"{'-':>7}"
+        width = f"{r['width']:>5}" if r['mode'] in TIMED_MODES else f"{'-':>5}"
+        rss = f"{r['peak_rss_kib'] / 1024:>9.1f}" if r['peak_rss_kib'] is not None else f"{'-':>9}"
+        check = {True: 'ok', False: 'FAIL', None: '-'}[r['check']]
+        base = baseline.get((r['kernel'], r['mode'], r['width']))
+        if base is None:
+            versus = f"{'-':>8}"
+        else:
+            versus = f"{base['seconds'] / r['seconds']:>7.2f}x"
+            if base['cycles'] != r['cycles'] or base['retired'] != r['retired']:
+                versus += f"  (was {base['retired']} retired / {base['cycles']} cycles)"
+        print(f"{r['kernel']:<14}{r['mode']:<12}{width}{r['retired']:>9}{cycles}{cpi}{ipc}{r['seconds']:>9.3f}"
+              f"{r['kips']:>9.1f}{rss}  {check:<6}{versus}")
+
+
+def print_speedups(records):
+    """Out-of-order over in-order cycles, for every kernel and width run on both."""
+    inorder = {(r['kernel'], r['width']): r['cycles'] for r in records if r['mode'] == 'pipeline'}
+    lines = [f"  {r['kernel']:<14}width {r['width']}: {inorder[(r['kernel'], r['width'])] / r['cycles']:.2f}x"
+             for r in records if r['mode'] == 'ooo' and (r['kernel'], r['width']) in inorder]
+    if lines:
+        print("Out-of-order speedup over in-order (cycles):")
+        print("\n".join(lines))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulator benchmark suite: host speed and simulated CPI")
+    parser.add_argument("kernels", nargs="*", default=list(KERNELS),
+                        help=f"kernels to run (default: all of {', '.join(KERNELS)})")
+    parser.add_argument("--mode", choices=MODES, action="append", default=None,
+                        help="simulator to measure (repeatable; default: pipeline and functional)")
+    parser.add_argument("--width", type=int, action="append", default=None, metavar="N",
+                        help="pipeline issue width (repeatable; default: 1)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement; the fastest counts")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, metavar="FILE",
+                        help="baseline results to compare against")
+    parser.add_argument("--save", action="store_true", help="write these results to the baseline file")
+    parser.add_argument("--json", metavar="FILE", default=None, help="also write the results to FILE")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.kernels if name not in KERNELS]
+    if unknown:
+        parser.error(f"unknown kernel(s): {', '.join(unknown)}")
+
+    if any(width < 1 for width in args.width or ()):
+        parser.error("--width must be at least 1")
+
+    records = run_suite(args.kernels, args.mode or DEFAULT_MODES, args.repeat, args.width or (1,))
+    print_table(records, load_baseline(args.baseline))
+    print_speedups(records)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'host': host_info(), 'results': records}, f, indent=2)
+    if args.save:
+        save_baseline(args.baseline, records)
+        print(f"Baseline saved to {args.baseline}")
+    return 1 if any(r['check'] is False for r in records) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+# block_cache.py
+# Basic-block translation cache for the functional (architectural-only) path.
+#
+# A block is the straight-line run of instructions starting at a PC and
+# ending at the first control transfer (branch, jal, jalr), FENCE.I,
+# ECALL/EBREAK, or MAX_BLOCK_LENGTH instructions. Each block is translated
+# once into a Python function that updates the register list directly and
+# returns the next PC; FunctionalCore then executes whole blocks.
+# CSR instructions read instret, which only advances between blocks, and
+# D-extension instructions use the FP register file, which blocks do not
+# see; a block stops short of either and the instruction gets a
+# one-instruction block with no function (fn None): the core single-steps it.
+#
+# Translated blocks are dropped when a write lands inside them (code pages
+# are watched through PagedMemory.watched_pages, then the exact range is
+# checked), when FENCE.I executes, or when the cache is full (least
+# recently used first).
+#
+# Only a load or store can fault inside a block, before it takes effect;
+# the line of the block's function that raised it gives that instruction's
+# PC (fault_pc), so the core can stop exactly where single-stepping would.
+
+from collections import OrderedDict, namedtuple
+
+from alu import MASK64
+from control_unit import CSR_OPS
+from memory_unit import PAGE_BITS, MemoryFault
+
+MAX_BLOCK_LENGTH = 64
+
+# start/end: PC range [start, end); length: instructions; fn(regs) -> next PC (None: single-step it)
+# flush_after: the block ends with FENCE.I; pages: code page numbers it spans;
+# mem_pcs: line of fn's source -> PC of the load or store on it
+Block = namedtuple("Block", ["start", "end", "length", "fn", "flush_after", "pages", "mem_pcs"])
+
+# Inline expressions for common ALU ops (must match alu.ALU_OPS exactly)
+INLINE_OPS = {
+    'add': "({a} + {b}) & M",
+    'sub': "({a} - {b}) & M",
+    'mul': "({a} * {b}) & M",
+    'and': "({a} & {b}) & M",
+    'or':  "({a} | {b}) & M",
+    'xor': "({a} ^ {b}) & M",
+    'sll': "({a} << ({b} & 0x3F)) & M",
+    'srl': "({a} & M) >> ({b} & 0x3F)",
+}
+
+BLOCK_ENDERS = {'jal', 'jalr', 'fence.i', 'ecall', 'ebreak'}
+
+
+class BlockCache:
+    def __init__(self, memory, decode, max_blocks=4096):
+        self.memory = memory
+        self.decode = decode
+        self.max_blocks = max_blocks
+        self.blocks = OrderedDict()   # start PC -> Block, in LRU order
+        self.page_blocks = {}         # code page number -> set of start PCs
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def lookup(self, pc):
+        """Return the Block starting at 'pc', translating it on a miss."""
+        block = self.blocks.get(pc)
+        if block is not None:
+            self.hits += 1
+            self.blocks.move_to_end(pc)
+            return block
+        self.misses += 1
+        block = self.translate(pc)
+        if len(self.blocks) >= self.max_blocks:
+            self._remove(next(iter(self.blocks)))
+            self.evictions += 1
+        self.blocks[pc] = block
+        for number in block.pages:
+            if number not in self.page_blocks:
+                self.page_blocks[number] = set()
+                self.memory.watched_pages[number] = self.invalidate_range
+            self.page_blocks[number].add(pc)
+        return block
+
+    def _remove(self, start):
+        block = self.blocks.pop(start)
+        for number in block.pages:
+            starts = self.page_blocks.get(number)
+            if starts is None:
+                continue
+            starts.discard(start)
+            if not starts:
+                del self.page_blocks[number]
+                self.memory.watched_pages.pop(number, None)
+
+    def invalidate_range(self, address, length):
+        """Drop every block overlapping [address, address + length) (called on writes)."""
+        end = address + length
+        for start in list(self.page_blocks.get(address >> PAGE_BITS, ())):
+            block = self.blocks[start]
+            if block.start < end and address < block.end:
+                self._remove(start)
+                self.invalidations += 1
+
+    def flush(self):
+        """Drop all translations (FENCE.I)."""
+        for number in self.page_blocks:
+            self.memory.watched_pages.pop(number, None)
+        self.invalidations += len(self.blocks)
+        self.blocks.clear()
+        self.page_blocks.clear()
+
+    def translate(self, start):
+        """Generate and compile the Python function for the block at 'start'."""
+        lines = []
+        mem_pcs = {}
+        namespace = {'M': MASK64, 'load': self.memory.load, 'store': self.memory.store}
+        pc = start
+        length = 0
+        next_pc = None
+        flush_after = False
+
+        while next_pc is None:
+            try:
+                inst = self.decode(self.memory.load(pc, 4))
+            except MemoryFault:
+                if length == 0:
+                    raise
+                next_pc = pc  # end the block; the fault is raised if execution gets there
+                break
+            ctrl = inst.ctrl
+            mnemonic = inst.mnemonic
+            if mnemonic in CSR_OPS or ctrl.fpu:
+                if length == 0:
+                    return Block(start, start + 4, 1, None, False, (start >> PAGE_BITS,), {})
+                next_pc = pc
+                break
+            rd = inst.rd
+            a = f"r[{inst.rs1}]"
+            b = repr(inst.imm) if ctrl.aluSrc else f"r[{inst.rs2}]"
+            length += 1
+
+            if ctrl.branch:
+                fn = f"f{length}"
+                namespace[fn] = ctrl.aluFn
+                lines.append(f"if {fn}({a}, {b}): return {(pc + inst.imm) & MASK64}")
+                next_pc = pc + 4
+            elif mnemonic == 'jal':
+                if rd:
+                    lines.append(f"r[{rd}] = {pc + 4}")
+                next_pc = (pc + inst.imm) & MASK64
+            elif mnemonic == 'jalr':
+                # Target uses rs1 before the link write (rd may equal rs1)
+                lines.append(f"t = (({a} + {inst.imm}) & ~1) & M")
+                if rd:
+                    lines.append(f"r[{rd}] = {pc + 4}")
+                lines.append("return t")
+                next_pc = False
+            elif ctrl.memRead:
+                mem_pcs[len(lines) + 2] = pc  # line 1 is the def
+                load = f"load(({a} + {inst.imm}) & M, {ctrl.memWidth}, {ctrl.memSigned})"
+                lines.append(f"r[{rd}] = {load}" if rd else load)
+            elif ctrl.memWrite:
+                mem_pcs[len(lines) + 2] = pc
+                lines.append(f"store(({a} + {inst.imm}) & M, {ctrl.memWidth}, r[{inst.rs2}])")
+            elif ctrl.regWrite and rd:
+                template = INLINE_OPS.get(ctrl.aluOp)
+                if template is not None:
+                    lines.append(f"r[{rd}] = " + template.format(a=a, b=b))
+                else:
+                    fn = f"f{length}"
+                    namespace[fn] = ctrl.aluFn
+                    lines.append(f"r[{rd}] = {fn}({a}, {b})")
+            # anything else (nop, fence, unknown) has no effect here
+
+            if mnemonic == 'fence.i':
+                flush_after = True
+            pc += 4
+            if next_pc is None and (mnemonic in BLOCK_ENDERS or length >= MAX_BLOCK_LENGTH):
+                next_pc = pc
+
+        if next_pc is not False:
+            lines.append(f"return {next_pc & MASK64}")
+        source = "def block(r):\n" + "".join(f"    {line}\n" for line in lines)
+        exec(compile(source, f"<block {start:#x}>", "exec"), namespace)
+        pages = tuple(range(start >> PAGE_BITS, ((pc - 1) >> PAGE_BITS) + 1))
+        return Block(start, pc, length, namespace['block'], flush_after, pages, mem_pcs)
+
+    def fault_pc(self, block, traceback):
+        """PC of the load or store in 'block' that raised the MemoryFault with 'traceback'."""
+        code = block.fn.__code__
+        while traceback is not None:
+            if traceback.tb_frame.f_code is code:
+                return block.mem_pcs[traceback.tb_lineno]
+            traceback = traceback.tb_next
+        raise ValueError(f"fault not raised by the block at {block.start:#x}")
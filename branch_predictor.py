@@ -0,0 +1,213 @@
+# branch_predictor.py
+# Branch prediction for the fetch stage.
+#
+# BranchPredictor combines a direction predictor for conditional branches
+# (static, bimodal or gshare), an optional branch target buffer and an
+# optional return-address stack. fetch() asks it for the next PC; execute()
+# reports the resolved outcome, and a wrong guess takes the usual EX flush.
+#
+# Direct targets (branches, jal) come from the BTB when one is configured
+# (a BTB miss falls through to PC+4), otherwise from predecoding the fetched
+# word. jalr needs the RAS (returns) or the BTB; without either it is never
+# predicted. All tables are updated when the branch resolves in EX.
+
+from utils import decodeWord
+
+LINK_REGS = (1, 5)  # ra, t0: the RISC-V call/return hint registers
+
+
+# --- Direction predictors (conditional branches) ---
+
+class StaticPredictor:
+    """'not_taken', 'taken', or 'btfn' (backward taken, forward not taken)."""
+    POLICIES = ('not_taken', 'taken', 'btfn')
+
+    def __init__(self, policy='not_taken'):
+        if policy not in self.POLICIES:
+            raise ValueError(f"unknown static policy '{policy}' (expected one of {', '.join(self.POLICIES)})")
+        self.policy = policy
+
+    def predict(self, pc, inst):
+        if self.policy == 'btfn':
+            return inst.imm < 0
+        return self.policy == 'taken'
+
+    def update(self, pc, taken):
+        pass
+
+
+class BimodalPredictor:
+    """Table of 2-bit saturating counters indexed by PC."""
+    def __init__(self, entries=2048):
+        if entries & (entries - 1):
+            raise ValueError("predictor table size must be a power of two")
+        self.mask = entries - 1
+        self.counters = [1] * entries  # weakly not-taken
+
+    def _index(self, pc):
+        return (pc >> 2) & self.mask
+
+    def predict(self, pc, inst):
+        return self.counters[self._index(pc)] >= 2
+
+    def update(self, pc, taken):
+        index = self._index(pc)
+        counter = self.counters[index]
+        if taken:
+            if counter < 3:
+                self.counters[index] = counter + 1
+        elif counter > 0:
+            self.counters[index] = counter - 1
+
+
+class GsharePredictor(BimodalPredictor):
+    """2-bit counters indexed by PC XOR global branch history."""
+    def __init__(self, entries=4096, history_bits=12):
+        super().__init__(entries)
+        self.history_mask = (1 << history_bits) - 1
+        self.history = 0
+
+    def _index(self, pc):
+        return ((pc >> 2) ^ self.history) & self.mask
+
+    def update(self, pc, taken):
+        super().update(pc, taken)
+        self.history = ((self.history << 1) | taken) & self.history_mask
+
+
+# --- Target structures ---
+
+class BranchTargetBuffer:
+    """Direct-mapped, fully tagged PC -> target cache."""
+    def __init__(self, entries=512):
+        if entries & (entries - 1):
+            raise ValueError("BTB size must be a power of two")
+        self.mask = entries - 1
+        self.tags = [None] * entries
+        self.targets = [0] * entries
+
+    def lookup(self, pc):
+        index = (pc >> 2) & self.mask
+        return self.targets[index] if self.tags[index] == pc else None
+
+    def update(self, pc, target):
+        index = (pc >> 2) & self.mask
+        self.tags[index] = pc
+        self.targets[index] = target
+
+
+class ReturnAddressStack:
+    """Fixed-depth stack of return addresses; overflow drops the oldest entry."""
+    def __init__(self, depth=16):
+        self.depth = depth
+        self.stack = []
+
+    def push(self, address):
+        if len(self.stack) == self.depth:
+            del self.stack[0]
+        self.stack.append(address)
+
+    def peek(self):
+        return self.stack[-1] if self.stack else None
+
+    def pop(self):
+        return self.stack.pop() if self.stack else None
+
+
+# --- Front end ---
+
+class BranchPredictor:
+    def __init__(self, direction=None, btb=None, ras=None, name='none'):
+        # direction=None predicts nothing (fetch always continues at PC+4,
+        # the original behaviour); the BTB and RAS are not consulted then
+        self.direction = direction
+        self.btb = btb
+        self.ras = ras
+        self.name = name
+        # kind -> [resolved, mispredicted]
+        self.counts = {'branch': [0, 0], 'jal': [0, 0], 'jalr': [0, 0]}
+
+    def _direct_target(self, pc, inst):
+        if self.btb is not None:
+            return self.btb.lookup(pc)
+        return pc + inst.imm
+
+    def predict(self, pc, inst_word):
+        """Predicted address of the instruction after the one fetched at 'pc'."""
+        if self.direction is None:
+            return pc + 4
+        inst = decodeWord(inst_word)
+        ctrl = inst.ctrl
+        target = None
+        if ctrl.branch:
+            if self.direction.predict(pc, inst):
+                target = self._direct_target(pc, inst)
+        elif inst.mnemonic == 'jal':
+            target = self._direct_target(pc, inst)
+        elif inst.mnemonic == 'jalr':
+            if self.ras is not None and inst.rd == 0 and inst.rs1 in LINK_REGS:
+                target = self.ras.peek()
+            if target is None and self.btb is not None:
+                target = self.btb.lookup(pc)
+        return pc + 4 if target is None else target
+
+    def resolve(self, pc, inst, taken, next_pc, predicted_pc):
+        """
+        Train on a resolved control transfer. 'inst' is anything with
+        mnemonic/ctrl/rd/rs1 (a DecodedInst or the ID/EX latch).
+        Returns True if fetch had mispredicted it.
+        """
+        mnemonic = inst.mnemonic
+        kind = 'branch' if inst.ctrl.branch else mnemonic
+        counts = self.counts[kind]
+        counts[0] += 1
+        mispredicted = next_pc != predicted_pc
+        if mispredicted:
+            counts[1] += 1
+
+        if self.direction is not None and kind == 'branch':
+            self.direction.update(pc, taken)
+        if self.btb is not None and taken:
+            self.btb.update(pc, next_pc)
+        if self.ras is not None and kind != 'branch':
+            if kind == 'jalr' and inst.rd == 0 and inst.rs1 in LINK_REGS:
+                self.ras.pop()
+            elif inst.rd in LINK_REGS:
+                self.ras.push(pc + 4)
+        return mispredicted
+
+    def stats(self):
+        """{kind: (resolved, mispredicted, accuracy)} plus an 'all' total."""
+        out = {}
+        total = [0, 0]
+        for kind, (resolved, wrong) in self.counts.items():
+            out[kind] = (resolved, wrong, 1.0 - wrong / resolved if resolved else 1.0)
+            total[0] += resolved
+            total[1] += wrong
+        out['all'] = (total[0], total[1], 1.0 - total[1] / total[0] if total[0] else 1.0)
+        return out
+
+
+def make_predictor(spec='none', btb_entries=0, ras_depth=0):
+    """
+    Build a BranchPredictor from a spec string:
+      none | static[:not_taken|taken|btfn] | bimodal[:ENTRIES] | gshare[:ENTRIES[:HISTORY_BITS]]
+    'btb_entries' / 'ras_depth' add a BTB / return-address stack (0 = none).
+    """
+    kind, *params = spec.split(':')
+    try:
+        if kind == 'none':
+            direction = None
+        elif kind == 'static':
+            direction = StaticPredictor(*params)
+        elif kind == 'bimodal':
+            direction = BimodalPredictor(*(int(p, 0) for p in params))
+        elif kind == 'gshare':
+            direction = GsharePredictor(*(int(p, 0) for p in params))
+        else:
+            raise ValueError(f"unknown predictor '{kind}'")
+    except TypeError:
+        raise ValueError(f"too many parameters in predictor spec '{spec}'")
+    btb = BranchTargetBuffer(btb_entries) if btb_entries else None
+    ras = ReturnAddressStack(ras_depth) if ras_depth else None
+    return BranchPredictor(direction, btb, ras, spec)
@@ -0,0 +1,179 @@
+# cache.py
+# Set-associative cache timing model for the L1 instruction and data caches.
+#
+# Only tags are modelled: data always lives in PagedMemory, so a cache can
+# never change what the program computes, only how many cycles it takes.
+# access() returns the stall cycles the access costs (0 on a hit, the miss
+# penalty on a miss that fetches a line); the pipeline turns those into
+# stalls through the HazardUnit.
+#
+# Write policies:
+#   write_back    - write-allocate; dirty lines are counted as writebacks
+#                   when evicted (drained by a write buffer, no stall)
+#   write_through - no-write-allocate; every write goes to memory through a
+#                   write buffer (no stall), write misses do not fill a line
+
+import random
+
+POLICIES = ('lru', 'plru', 'random')
+WRITE_POLICIES = ('write_back', 'write_through')
+
+
+class Cache:
+    def __init__(self, name, size=32 * 1024, line_size=64, ways=4, policy='lru',
+                 write_policy='write_back', miss_penalty=10, seed=0):
+        for label, value in (('size', size), ('line size', line_size), ('ways', ways)):
+            if value <= 0 or value & (value - 1):
+                raise ValueError(f"{name}: {label} must be a power of two (got {value})")
+        if size < line_size * ways:
+            raise ValueError(f"{name}: {size} bytes cannot hold {ways} way(s) of {line_size}-byte lines")
+        if policy not in POLICIES:
+            raise ValueError(f"{name}: unknown replacement policy '{policy}' (expected one of {', '.join(POLICIES)})")
+        if write_policy not in WRITE_POLICIES:
+            raise ValueError(f"{name}: unknown write policy '{write_policy}' (expected one of {', '.join(WRITE_POLICIES)})")
+
+        self.name = name
+        self.size = size
+        self.line_size = line_size
+        self.ways = ways
+        self.policy = policy
+        self.write_back = write_policy == 'write_back'
+        self.miss_penalty = miss_penalty
+        self.num_sets = size // (line_size * ways)
+        self.line_bits = line_size.bit_length() - 1
+        self.set_mask = self.num_sets - 1
+
+        # Per set: tag (line number, None = invalid) and dirty bit of each way
+        self.tags = [[None] * ways for _ in range(self.num_sets)]
+        self.dirty = [[False] * ways for _ in range(self.num_sets)]
+        # Replacement state: LRU order (most recent last) or PLRU tree bits
+        self.order = [list(range(ways)) for _ in range(self.num_sets)]
+        self.tree = [[0] * (ways - 1) for _ in range(self.num_sets)]
+        self.levels = ways.bit_length() - 1
+        self.rng = random.Random(seed)
+
+        self.reads = 0
+        self.writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.writebacks = 0      # dirty lines written back on eviction
+        self.write_throughs = 0  # writes sent straight to memory
+
+    # --- Replacement ---
+    def _touch(self, index, way):
+        if self.policy == 'lru':
+            order = self.order[index]
+            order.remove(way)
+            order.append(way)
+        elif self.policy == 'plru':
+            # Point every node on the path away from the way just used
+            tree = self.tree[index]
+            node = 0
+            for level in range(self.levels - 1, -1, -1):
+                bit = (way >> level) & 1
+                tree[node] = bit ^ 1
+                node = 2 * node + 1 + bit
+
+    def _victim(self, index):
+        tags = self.tags[index]
+        if None in tags:
+            return tags.index(None)
+        if self.policy == 'lru':
+            return self.order[index][0]
+        if self.policy == 'plru':
+            tree = self.tree[index]
+            node = way = 0
+            for _ in range(self.levels):
+                bit = tree[node]
+                way = (way << 1) | bit
+                node = 2 * node + 1 + bit
+            return way
+        return self.rng.randrange(self.ways)
+
+    # --- Accesses ---
+    def access(self, address, width=1, write=False):
+        """Look up every line the access touches; returns the stall cycles."""
+        if write:
+            self.writes += 1
+        else:
+            self.reads += 1
+        first = address >> self.line_bits
+        last = (address + width - 1) >> self.line_bits
+        stall = self._access_line(first, write)
+        if last != first:  # unaligned access straddling two lines
+            stall += self._access_line(last, write)
+        return stall
+
+    def _access_line(self, line, write):
+        index = line & self.set_mask
+        tags = self.tags[index]
+        if line in tags:
+            self.hits += 1
+            way = tags.index(line)
+            self._touch(index, way)
+            if write:
+                if self.write_back:
+                    self.dirty[index][way] = True
+                else:
+                    self.write_throughs += 1
+            return 0
+
+        self.misses += 1
+        if write and not self.write_back:
+            self.write_throughs += 1  # no-write-allocate
+            return 0
+        way = self._victim(index)
+        if tags[way] is not None:
+            self.evictions += 1
+            if self.dirty[index][way]:
+                self.writebacks += 1
+        tags[way] = line
+        self.dirty[index][way] = write
+        self._touch(index, way)
+        return self.miss_penalty
+
+    def stats(self):
+        accesses = self.hits + self.misses
+        return {'reads': self.reads, 'writes': self.writes, 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'writebacks': self.writebacks,
+                'write_throughs': self.write_throughs,
+                'miss_rate': self.misses / accesses if accesses else 0.0}
+
+    def describe(self):
+        write_policy = 'write-back' if self.write_back else 'write-through'
+        return (f"{self.size} bytes, {self.line_size}-byte lines, {self.ways}-way, {self.policy}, {write_policy}, "
+                f"{self.miss_penalty}-cycle miss")
+
+
+def _parse_size(text):
+    text = text.strip().lower()
+    scale = 1
+    if text.endswith('k'):
+        text, scale = text[:-1], 1024
+    elif text.endswith('m'):
+        text, scale = text[:-1], 1024 * 1024
+    return int(text, 0) * scale
+
+
+def make_cache(name, spec, miss_penalty=10):
+    """
+    Build a Cache from 'SIZE[:LINE[:WAYS[:POLICY[:WRITE_POLICY]]]]', e.g.
+    '32k:64:4:plru:write_through'. Returns None for an empty spec or 'none'.
+    """
+    if not spec or spec == 'none':
+        return None
+    fields = spec.split(':')
+    if len(fields) > 5:
+        raise ValueError(f"too many fields in cache spec '{spec}'")
+    kwargs = {'miss_penalty': miss_penalty}
+    try:
+        for key, value in zip(('size', 'line_size', 'ways'), fields[:3]):
+            kwargs[key] = _parse_size(value)
+    except ValueError:
+        raise ValueError(f"bad number in cache spec '{spec}'")
+    if len(fields) > 3:
+        kwargs['policy'] = fields[3]
+    if len(fields) > 4:
+        kwargs['write_policy'] = fields[4]
+    return Cache(name, **kwargs)
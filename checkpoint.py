@@ -0,0 +1,216 @@
+# checkpoint.py
+# Binary checkpoints of the complete simulator state.
+#
+# A checkpoint holds the PC, the register file (regs, fregs, fcsr), every
+# touched memory page, the four current pipeline latches, the HazardUnit
+# signals, the FPU and multiply/divide ops in flight and the performance counters, so a restored Simulator continues
+# cycle for cycle where the saved one stopped. Branch predictor and cache
+# contents are not saved: they belong to the configuration of the run that
+# restores the checkpoint, and start cold.
+#
+# Layout: a fixed header (magic, version, memory size, PC) followed by one
+# zlib-compressed body. Latch fields that follow from the instruction word
+# (ctrl, mnemonic) are not stored but re-derived through decodeWord.
+#
+# To start many runs from one point, read() the file once and restore() the
+# Checkpoint into each fresh Simulator.
+
+import json
+import struct
+import zlib
+from collections import namedtuple
+
+from control_unit import NOP_SIGNALS
+from memory_unit import PAGE_BITS, PAGE_SIZE
+from pipeline import NOP_INSTRUCTION
+from utils import decodeWord
+
+MAGIC = b'RVSIMCK\x00'
+VERSION = 3  # 2: fregs as raw bit patterns, rs3 in ID/EX, FPU ops in flight; 3: multiply/divide ops in flight
+
+_HEADER = struct.Struct('<8sIQQ')  # magic, version, mem_size, pc
+_REGS = struct.Struct('<32Q32QI')  # regs, fregs, fcsr
+_IF_ID = struct.Struct('<QIQ')  # pc, inst_word, predicted_pc
+_ID_EX = struct.Struct('<QIQQQqBBBBQ')  # pc, inst_word, rs1_val, rs2_val, rs3_val, imm, rd, rs1, rs2, rs3, predicted_pc
+_EX_MEM = struct.Struct('<QIQQBQ??')  # pc, inst_word, alu_result, rs2_val, rd, branch_target, taken, mispredicted
+_MEM_WB = struct.Struct('<QIQQB')  # pc, inst_word, mem_data, alu_result, rd
+_HAZARD = struct.Struct('<?????BBQ?Q?')  # stall/flush flags, forwards, mem_busy/probed, fetch_busy/probed
+_COUNT = struct.Struct('<I')
+_PAGE = struct.Struct('<Q')
+
+MASK64 = (1 << 64) - 1
+
+# Field order of each latch in the body
+IF_ID_FIELDS = ('pc', 'inst_word', 'predicted_pc')
+ID_EX_FIELDS = ('pc', 'inst_word', 'rs1_val', 'rs2_val', 'rs3_val', 'imm', 'rd', 'rs1', 'rs2', 'rs3', 'predicted_pc')
+EX_MEM_FIELDS = ('pc', 'inst_word', 'alu_result', 'rs2_val', 'rd', 'branch_target', 'branch_taken', 'mispredicted')
+MEM_WB_FIELDS = ('pc', 'inst_word', 'mem_data', 'alu_result', 'rd')
+HAZARD_FIELDS = ('stall_if', 'stall_id', 'stall_ex', 'flush_if_id', 'flush_id_ex', 'forward_a_ex', 'forward_b_ex',
+                 'mem_busy', 'mem_probed', 'fetch_busy', 'fetch_probed')
+
+# Parsed checkpoint; latches/hazard are tuples in the *_FIELDS order, fpu and
+# muldiv list the ops in flight as scoreboard.UnitOp tuples, pages maps page
+# number -> bytes
+Checkpoint = namedtuple("Checkpoint", ["mem_size", "pc", "regs", "fregs", "fcsr", "if_id", "id_ex", "ex_mem",
+                                       "mem_wb", "hazard", "fpu", "muldiv", "counters", "pages"])
+
+
+class CheckpointError(Exception):
+    pass
+
+
+def _fields(obj, names):
+    # Addresses such as a branch target can be computed negative (pc + imm); store them as 64-bit patterns
+    return tuple(value & MASK64 if type(value) is int and name != 'imm' else value
+                 for name, value in ((name, getattr(obj, name)) for name in names))
+
+
+def capture(sim):
+    """Snapshot a Simulator's state as a Checkpoint (pages are copied)."""
+    register_file = sim.register_file
+    return Checkpoint(sim.memory.size, sim.pc & MASK64, tuple(register_file.regs), tuple(register_file.fregs),
+                      register_file.fcsr, _fields(sim.if_id_reg, IF_ID_FIELDS), _fields(sim.id_ex_reg, ID_EX_FIELDS),
+                      _fields(sim.ex_mem_reg, EX_MEM_FIELDS), _fields(sim.mem_wb_reg, MEM_WB_FIELDS),
+                      _fields(sim.hazard_unit, HAZARD_FIELDS), [tuple(op) for op in sim.fpu.in_flight],
+                      [tuple(op) for op in sim.muldiv.in_flight], sim.counters.snapshot(), {number: bytes(page) for number, page in sim.memory.pages.items()})
+
+
+def _restore_latch(latch, names, values):
+    for name, value in zip(names, values):
+        setattr(latch, name, value)
+    if hasattr(latch, 'ctrl'):
+        # A NOP word in a latch past IF/ID is always a bubble (decode never passes one on)
+        if latch.inst_word == NOP_INSTRUCTION:
+            latch.ctrl, latch.mnemonic = NOP_SIGNALS, 'nop'
+        else:
+            inst = decodeWord(latch.inst_word)
+            latch.ctrl, latch.mnemonic = inst.ctrl, inst.mnemonic
+
+
+def restore(sim, checkpoint):
+    """
+    Load a Checkpoint into 'sim' (whose memory must be the same size),
+    replacing its architectural and pipeline state. Raises CheckpointError.
+    """
+    memory = sim.memory
+    if checkpoint.mem_size != memory.size:
+        raise CheckpointError(f"checkpoint has {checkpoint.mem_size:#x} bytes of memory, simulator has {memory.size:#x}")
+    sim.pc = checkpoint.pc
+    register_file = sim.register_file
+    register_file.note_all()
+    register_file.regs[:] = checkpoint.regs
+    register_file.fregs[:] = checkpoint.fregs
+    register_file.fcsr = checkpoint.fcsr
+
+    replaced = set(memory.pages) | set(checkpoint.pages)
+    if memory.epochs:
+        for number in replaced:
+            memory.note_range(number << PAGE_BITS, min(PAGE_SIZE, memory.size - (number << PAGE_BITS)))
+    memory.pages = {number: bytearray(page) for number, page in checkpoint.pages.items()}
+    for number in replaced:
+        if number in memory.watched_pages:
+            memory.watched_pages[number](number << PAGE_BITS, PAGE_SIZE)
+
+    sim.reset_pipeline()
+    _restore_latch(sim.if_id_reg, IF_ID_FIELDS, checkpoint.if_id)
+    _restore_latch(sim.id_ex_reg, ID_EX_FIELDS, checkpoint.id_ex)
+    _restore_latch(sim.ex_mem_reg, EX_MEM_FIELDS, checkpoint.ex_mem)
+    _restore_latch(sim.mem_wb_reg, MEM_WB_FIELDS, checkpoint.mem_wb)
+    for name, value in zip(HAZARD_FIELDS, checkpoint.hazard):
+        setattr(sim.hazard_unit, name, value)
+    sim.fpu.reset(checkpoint.fpu)
+    sim.muldiv.reset(checkpoint.muldiv)
+
+    counters = sim.counters
+    for name, value in checkpoint.counters.items():
+        if isinstance(value, dict):
+            getattr(counters, name).update(value)
+        else:
+            setattr(counters, name, value)
+
+
+def dumps(checkpoint, level=1):
+    """Serialise a Checkpoint to bytes."""
+    counters = json.dumps(checkpoint.counters, separators=(',', ':')).encode()
+    fpu = json.dumps(checkpoint.fpu, separators=(',', ':')).encode()
+    muldiv = json.dumps(checkpoint.muldiv, separators=(',', ':')).encode()
+    parts = [
+        _REGS.pack(*checkpoint.regs, *checkpoint.fregs, checkpoint.fcsr),
+        _IF_ID.pack(*checkpoint.if_id),
+        _ID_EX.pack(*checkpoint.id_ex),
+        _EX_MEM.pack(*checkpoint.ex_mem),
+        _MEM_WB.pack(*checkpoint.mem_wb),
+        _HAZARD.pack(*checkpoint.hazard),
+        _COUNT.pack(len(fpu)), fpu,
+        _COUNT.pack(len(muldiv)), muldiv,
+        _COUNT.pack(len(counters)), counters,
+        _COUNT.pack(len(checkpoint.pages)),
+    ]
+    for number in sorted(checkpoint.pages):
+        parts.append(_PAGE.pack(number))
+        parts.append(checkpoint.pages[number])
+    header = _HEADER.pack(MAGIC, VERSION, checkpoint.mem_size, checkpoint.pc)
+    return header + zlib.compress(b"".join(parts), level)
+
+
+def loads(data):
+    """Parse bytes produced by dumps(). Raises CheckpointError."""
+    if len(data) < _HEADER.size:
+        raise CheckpointError("truncated checkpoint header")
+    magic, version, mem_size, pc = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise CheckpointError("not a simulator checkpoint")
+    if version != VERSION:
+        raise CheckpointError(f"unsupported checkpoint version {version} (expected {VERSION})")
+    try:
+        body = zlib.decompress(memoryview(data)[_HEADER.size:])
+        values = _REGS.unpack_from(body)
+        regs, fregs, fcsr = values[:32], values[32:64], values[64]
+        pos = _REGS.size
+        latches = []
+        for layout in (_IF_ID, _ID_EX, _EX_MEM, _MEM_WB, _HAZARD):
+            latches.append(layout.unpack_from(body, pos))
+            pos += layout.size
+        (length,) = _COUNT.unpack_from(body, pos)
+        pos += _COUNT.size
+        fpu = [tuple(op) for op in json.loads(body[pos:pos + length])]
+        pos += length
+        (length,) = _COUNT.unpack_from(body, pos)
+        pos += _COUNT.size
+        muldiv = [tuple(op) for op in json.loads(body[pos:pos + length])]
+        pos += length
+        (length,) = _COUNT.unpack_from(body, pos)
+        pos += _COUNT.size
+        counters = json.loads(body[pos:pos + length])
+        pos += length
+        (count,) = _COUNT.unpack_from(body, pos)
+        pos += _COUNT.size
+        pages = {}
+        for _ in range(count):
+            (number,) = _PAGE.unpack_from(body, pos)
+            pos += _PAGE.size
+            pages[number] = body[pos:pos + PAGE_SIZE]
+            pos += PAGE_SIZE
+    except (zlib.error, struct.error, ValueError) as e:
+        raise CheckpointError(f"corrupt checkpoint: {e}")
+    return Checkpoint(mem_size, pc, regs, fregs, fcsr, *latches, fpu, muldiv, counters, pages)
+
+
+def write(path, checkpoint):
+    with open(path, 'wb') as f:
+        f.write(dumps(checkpoint))
+
+
+def read(path):
+    """Read a checkpoint file. Raises OSError or CheckpointError."""
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+def is_checkpoint(path):
+    """True if the file at 'path' starts with the checkpoint magic."""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
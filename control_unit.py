@@ -1,51 +1,128 @@
-def get_control_signals(mnemonic):
+# control_unit.py
+# Control signals per mnemonic, precomputed once into frozen records
+
+from collections import namedtuple
+
+from isa import OPCODES
+from alu import ALU_OPS, alu_nop
+from fpu import FP_OPS, FP_UNITS
+from muldiv import MULDIV_UNITS
+
+# 'aluFn' is the ALU operation callable bound to 'aluOp', 'fpuFn' the FP one bound to 'fpuOp'
+# 'memWidth' is the access size in bytes, 'memSigned' selects sign extension on loads
+# 'regFiles' names the register file of (rd, rs1, rs2, rs3): 'x', 'f' or None if unused
+# 'fpUnit' is the FPU unit of a multi-cycle FP op (None: executes in EX), 'mulDivUnit'
+# the multiplier or divider of an M-extension op (see muldiv.py)
+ControlSignals = namedtuple("ControlSignals", ["regWrite", "aluSrc", "memRead", "memWrite", "memToReg",
+                                               "memWidth", "memSigned", "branch", "aluOp", "fpu", "fpuOp",
+                                               "regFiles", "fpUnit", "mulDivUnit", "aluFn", "fpuFn"])
+
+# Load/store access widths (bytes) and load sign extension
+LOAD_WIDTHS = {'lb': (1, 1), 'lh': (2, 1), 'lw': (4, 1), 'ld': (8, 0),
+               'lbu': (1, 0), 'lhu': (2, 0), 'lwu': (4, 0)}
+STORE_WIDTHS = {'sb': 1, 'sh': 2, 'sw': 4, 'sd': 8}
+
+# Zicsr: rd <- old CSR value (see csr.py); the 'i' forms take rs1 as a 5-bit immediate
+CSR_OPS = {'csrrw', 'csrrs', 'csrrc', 'csrrwi', 'csrrsi', 'csrrci'}
+
+# Operand register files (rd, rs1, rs2, rs3) by instruction format: the
+# fields a format does not use hold immediate bits (or zeros), not registers
+R_FILES = ('x', 'x', 'x', None)
+I_FILES = ('x', 'x', None, None)
+S_FILES = (None, 'x', 'x', None)  # stores and branches
+J_FILES = ('x', None, None, None) # jal, and CSR ops with a 5-bit immediate
+NO_FILES = (None, None, None, None)
+
+# D-extension operand register files
+FP_FILES = ('f', 'f', 'f', None)
+FP_REG_FILES = {
+    'fld': ('f', 'x', None, None), 'fsd': (None, 'x', 'f', None),
+    'fsqrt.d': ('f', 'f', None, None),
+    'fcvt.s.d': ('f', 'f', None, None), 'fcvt.d.s': ('f', 'f', None, None),
+    'fcvt.w.d': ('x', 'f', None, None), 'fcvt.wu.d': ('x', 'f', None, None),
+    'fmv.x.d': ('x', 'f', None, None), 'fclass.d': ('x', 'f', None, None),
+    'fcvt.d.w': ('f', 'x', None, None), 'fcvt.d.wu': ('f', 'x', None, None), 'fmv.d.x': ('f', 'x', None, None),
+    'fmadd.d': ('f', 'f', 'f', 'f'), 'fmsub.d': ('f', 'f', 'f', 'f'),
+    'fnmsub.d': ('f', 'f', 'f', 'f'), 'fnmadd.d': ('f', 'f', 'f', 'f'),
+}
+
+
+def build_control_signals(mnemonic):
     signals = {
         'regWrite': 0,
         'aluSrc': 0,
         'memRead': 0,
         'memWrite': 0,
         'memToReg': 0,
+        'memWidth': 0,
+        'memSigned': 0,
         'branch': 0,
         'aluOp': 'NOP',
         'fpu': 0,
-        'fpuOp': None
+        'fpuOp': None,
+        'regFiles': NO_FILES,
+        'fpUnit': None,
+        'mulDivUnit': None,
     }
 
     # RV64I - R-type
     if mnemonic in ['add', 'sub', 'sll', 'slt', 'sltu', 'xor', 'srl', 'sra', 'or', 'and']:
-        signals.update({'regWrite': 1, 'aluSrc': 0, 'aluOp': mnemonic})
+        signals.update({'regWrite': 1, 'aluSrc': 0, 'aluOp': mnemonic, 'regFiles': R_FILES})
 
     # RV64I - I-type
     elif mnemonic in ['addi', 'slti', 'sltiu', 'xori', 'ori', 'andi']:
-        signals.update({'regWrite': 1, 'aluSrc': 1, 'aluOp': mnemonic[:-1]})
+        signals.update({'regWrite': 1, 'aluSrc': 1, 'aluOp': mnemonic[:-1], 'regFiles': I_FILES})
     elif mnemonic in ['slli', 'srli', 'srai']:
-        signals.update({'regWrite': 1, 'aluSrc': 1, 'aluOp': mnemonic[:-1]})
+        signals.update({'regWrite': 1, 'aluSrc': 1, 'aluOp': mnemonic[:-1], 'regFiles': I_FILES})
 
     # Load / Store
-    elif mnemonic == 'lw':
-        signals.update({'regWrite': 1, 'memRead': 1, 'memToReg': 1, 'aluSrc': 1, 'aluOp': 'add'})
-    elif mnemonic == 'sw':
-        signals.update({'memWrite': 1, 'aluSrc': 1, 'aluOp': 'add'})
+    elif mnemonic in LOAD_WIDTHS:
+        width, signed = LOAD_WIDTHS[mnemonic]
+        signals.update({'regWrite': 1, 'memRead': 1, 'memToReg': 1, 'memWidth': width, 'memSigned': signed,
+                        'aluSrc': 1, 'aluOp': 'add', 'regFiles': I_FILES})
+    elif mnemonic in STORE_WIDTHS:
+        signals.update({'memWrite': 1, 'memWidth': STORE_WIDTHS[mnemonic], 'aluSrc': 1, 'aluOp': 'add',
+                        'regFiles': S_FILES})
 
     # Branch
     elif mnemonic in ['beq', 'bne', 'blt', 'bge', 'bltu', 'bgeu']:
-        signals.update({'branch': 1, 'aluOp': mnemonic})
+        signals.update({'branch': 1, 'aluOp': mnemonic, 'regFiles': S_FILES})
 
     # Jump
     elif mnemonic in ['jal', 'jalr']:
-        signals.update({'regWrite': 1, 'aluSrc': 1, 'aluOp': 'add'})
+        signals.update({'regWrite': 1, 'aluSrc': 1, 'aluOp': 'add',
+                        'regFiles': J_FILES if mnemonic == 'jal' else I_FILES})
+
+    # Zicsr (executed by the CSR file, not the ALU)
+    elif mnemonic in CSR_OPS:
+        signals.update({'regWrite': 1, 'aluSrc': 1, 'aluOp': 'csr',
+                        'regFiles': J_FILES if mnemonic.endswith('i') else I_FILES})
 
     # M-extension
     elif mnemonic in ['mul', 'div', 'divu', 'rem', 'remu', 'mulh', 'mulhu', 'mulhsu']:
-        signals.update({'regWrite': 1, 'aluSrc': 0, 'aluOp': mnemonic})
+        signals.update({'regWrite': 1, 'aluSrc': 0, 'aluOp': mnemonic, 'mulDivUnit': MULDIV_UNITS[mnemonic],
+                        'regFiles': R_FILES})
 
     # D-extension
     elif mnemonic == 'fld':
-        signals.update({'regWrite': 1, 'memRead': 1, 'memToReg': 1, 'aluSrc': 1, 'aluOp': 'add', 'fpu': 1})
+        signals.update({'regWrite': 1, 'memRead': 1, 'memToReg': 1, 'memWidth': 8, 'aluSrc': 1, 'aluOp': 'add', 'fpu': 1})
     elif mnemonic == 'fsd':
-        signals.update({'memWrite': 1, 'aluSrc': 1, 'aluOp': 'add', 'fpu': 1})
+        signals.update({'memWrite': 1, 'memWidth': 8, 'aluSrc': 1, 'aluOp': 'add', 'fpu': 1})
     elif mnemonic in ['fadd.d', 'fsub.d', 'fmul.d', 'fdiv.d', 'fsqrt.d', 'fmax.d', 'fmin.d', 'fsgnj.d', 'fsgnjn.d', 'fsgnjx.d', 'fclass.d',
-                      'fmv.x.d', 'fmv.d.x', 'fcvt.d.s', 'fcvt.s.d', 'fcvt.w.d', 'fcvt.d.w', 'fcvt.wu.d', 'fcvt.d.wu']:
-        signals.update({'regWrite': 1, 'fpu': 1, 'fpuOp': mnemonic})
+                      'fmv.x.d', 'fmv.d.x', 'fcvt.d.s', 'fcvt.s.d', 'fcvt.w.d', 'fcvt.d.w', 'fcvt.wu.d', 'fcvt.d.wu',
+                      'fmadd.d', 'fmsub.d', 'fnmsub.d', 'fnmadd.d']:
+        signals.update({'regWrite': 1, 'fpu': 1, 'fpuOp': mnemonic, 'fpUnit': FP_UNITS.get(mnemonic)})
+    if signals['fpu']:
+        signals['regFiles'] = FP_REG_FILES.get(mnemonic, FP_FILES)
+
+    return ControlSignals(aluFn=ALU_OPS.get(signals['aluOp'], alu_nop), fpuFn=FP_OPS.get(signals['fpuOp']), **signals)
 
-    return signals
\ No newline at end of file
+
+# One shared record per mnemonic; anything not listed decodes as a NOP
+CONTROL_TABLE = {name.lower(): build_control_signals(name.lower()) for name in OPCODES}
+NOP_SIGNALS = build_control_signals('nop')
+CONTROL_TABLE['nop'] = NOP_SIGNALS
+
+
+def get_control_signals(mnemonic):
+    return CONTROL_TABLE.get(mnemonic, NOP_SIGNALS)
@@ -0,0 +1,78 @@
+# csr.py
+# Control and status registers reachable through the Zicsr instructions.
+#
+# Implemented: the user-level counters cycle/time/instret (read-only; this
+# is how rdcycle, rdtime and rdinstret read them) and the FP CSRs
+# fflags/frm/fcsr, which are views of RegisterFile.fcsr. 'time' ticks once
+# per core cycle. There is no trap model, so writes to read-only or
+# unimplemented CSRs are ignored and reads of unimplemented CSRs return 0.
+#
+# The pipeline reads CSRs in EX, so instret there does not yet count the
+# older instructions still in MEM; the functional cores have no cycles and
+# report cycle = time = instret.
+
+CYCLE = 0xC00
+TIME = 0xC01
+INSTRET = 0xC02
+FFLAGS = 0x001
+FRM = 0x002
+FCSR = 0x003
+
+COUNTER_CSRS = (CYCLE, TIME, INSTRET)
+CSR_NAMES = {CYCLE: 'cycle', TIME: 'time', INSTRET: 'instret', FFLAGS: 'fflags', FRM: 'frm', FCSR: 'fcsr'}
+# FP CSR -> (shift, mask) of its field in fcsr
+FP_FIELDS = {FFLAGS: (0, 0x1F), FRM: (5, 0x7), FCSR: (0, 0xFF)}
+# Forms whose rs1 field is a 5-bit immediate
+IMM_FORMS = {'csrrwi', 'csrrsi', 'csrrci'}
+
+
+def csr_write_value(mnemonic, old, operand, rs1):
+    """
+    Value a Zicsr instruction writes back to its CSR, or None if it does not
+    write (csrrs/csrrc with rs1 = x0, or a zero immediate, only read).
+    Works on ints or NumPy arrays alike.
+    """
+    if mnemonic == 'csrrw' or mnemonic == 'csrrwi':
+        return operand
+    if rs1 == 0:
+        return None
+    if mnemonic == 'csrrs' or mnemonic == 'csrrsi':
+        return old | operand
+    return old & ~operand
+
+
+class CsrFile:
+    def __init__(self, register_file, cycle, instret):
+        # 'cycle' / 'instret' are callables returning the current counts
+        self.register_file = register_file
+        self.cycle = cycle
+        self.instret = instret
+
+    def read(self, csr):
+        if csr == CYCLE or csr == TIME:
+            return self.cycle()
+        if csr == INSTRET:
+            return self.instret()
+        if csr in FP_FIELDS:
+            shift, mask = FP_FIELDS[csr]
+            return (self.register_file.fcsr >> shift) & mask
+        return 0
+
+    def write(self, csr, value):
+        if csr in FP_FIELDS:
+            shift, mask = FP_FIELDS[csr]
+            register_file = self.register_file
+            register_file.set_fcsr((register_file.fcsr & ~(mask << shift)) | ((value & mask) << shift))
+
+    def execute(self, mnemonic, csr, rs1, rs1_val):
+        """
+        Run one Zicsr instruction on CSR 'csr' with source register 'rs1'
+        (holding 'rs1_val'; the 'i' forms use the rs1 field itself as the
+        operand). Returns the old value, which goes to rd.
+        """
+        old = self.read(csr)
+        operand = rs1 if mnemonic in IMM_FORMS else rs1_val
+        value = csr_write_value(mnemonic, old, operand, rs1)
+        if value is not None:
+            self.write(csr, value)
+        return old
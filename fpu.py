@@ -0,0 +1,312 @@
+# fpu.py
+# RV64D floating-point operations and the FPU timing model.
+#
+# FP registers hold raw 64-bit IEEE-754 patterns (ints), never Python
+# floats, so NaN payloads, signed zeros and NaN-boxed singles pass through
+# moves, loads and stores bit for bit. An operation unpacks its operands,
+# computes in host double precision and packs the result; NaN results
+# become the canonical NaN. Arithmetic rounds to nearest even; the rounding
+# mode (rm field, or frm for rm = DYN) is honoured by the conversions to
+# integer. Flags: NV, DZ and OF are exact, NX is raised by conversions and
+# on overflow, UF is not modelled.
+#
+# Every operation is a callable op(a, b, c, rm) -> (bits, fflags) in FP_OPS;
+# control_unit.py binds it into the control record like the ALU ops.
+# Operations listed in FP_UNITS run in a multi-cycle functional unit of the
+# FPU below, the rest take one cycle in EX.
+
+import math
+import struct
+from fractions import Fraction
+
+from scoreboard import Scoreboard, parse_units
+
+MASK64 = (1 << 64) - 1
+MASK32 = 0xFFFFFFFF
+SIGN64 = 1 << 63
+EXP64 = 0x7FF0000000000000
+FRAC64 = 0x000FFFFFFFFFFFFF
+QUIET64 = 1 << 51
+CANONICAL_NAN = 0x7FF8000000000000
+CANONICAL_NAN_S = 0x7FC00000
+NAN_BOX = 0xFFFFFFFF00000000  # upper half of a NaN-boxed single
+
+# fflags bits
+NX, UF, OF, DZ, NV = 1, 2, 4, 8, 16
+
+# Rounding modes (rm field / frm); 5 and 6 are reserved and round to nearest even here
+RNE, RTZ, RDN, RUP, RMM, DYN = 0, 1, 2, 3, 4, 7
+
+_D = struct.Struct('<d')
+_Q = struct.Struct('<Q')
+_F = struct.Struct('<f')
+_I = struct.Struct('<I')
+
+
+def rounding_mode(inst_word, fcsr):
+    """Rounding mode of an FP instruction: its rm field, or frm for DYN."""
+    rm = (inst_word >> 12) & 0x7
+    return (fcsr >> 5) & 0x7 if rm == DYN else rm
+
+
+def to_float(bits):
+    """Reinterpret a 64-bit pattern as a double."""
+    return _D.unpack(_Q.pack(bits & MASK64))[0]
+
+
+def from_float(value):
+    """Pattern of a double; any NaN becomes the canonical NaN."""
+    if value != value:
+        return CANONICAL_NAN
+    return _Q.unpack(_D.pack(value))[0]
+
+
+def is_nan(bits):
+    return (bits & EXP64) == EXP64 and (bits & FRAC64) != 0
+
+
+def is_snan(bits):
+    return is_nan(bits) and not bits & QUIET64
+
+
+def _finite(bits):
+    return (bits & EXP64) != EXP64
+
+
+def _result(value, fflags, *operands):
+    """
+    Pack an arithmetic result: NaN is canonical (and NV unless a NaN came
+    in), signalling NaN operands raise NV, infinity from finite operands
+    is an overflow.
+    """
+    for bits in operands:
+        if is_snan(bits):
+            fflags |= NV
+    if value != value:
+        if not any(is_nan(bits) for bits in operands):
+            fflags |= NV  # invalid operation: inf - inf, 0 * inf, sqrt(-x) ...
+        return CANONICAL_NAN, fflags
+    if math.isinf(value) and not fflags & DZ and all(_finite(bits) for bits in operands):
+        fflags |= OF | NX
+    return from_float(value), fflags
+
+
+def _fadd(a, b, c, rm):
+    return _result(to_float(a) + to_float(b), 0, a, b)
+
+
+def _fsub(a, b, c, rm):
+    return _result(to_float(a) - to_float(b), 0, a, b)
+
+
+def _fmul(a, b, c, rm):
+    return _result(to_float(a) * to_float(b), 0, a, b)
+
+
+def _fdiv(a, b, c, rm):
+    x, y = to_float(a), to_float(b)
+    if y != 0.0:
+        return _result(x / y, 0, a, b)
+    if x != x or x == 0.0:
+        return _result(math.nan, 0, a, b)  # NaN / 0, 0 / 0
+    inf = ((a ^ b) & SIGN64) | EXP64
+    return inf, 0 if math.isinf(x) else DZ
+
+
+def _fsqrt(a, b, c, rm):
+    x = to_float(a)
+    return _result(math.sqrt(x) if x >= 0.0 or x != x else math.nan, 0, a)
+
+
+def _fma(x, y, z):
+    """x * y + z with a single rounding."""
+    if not (math.isfinite(x) and math.isfinite(y)):
+        return x * y + z
+    if not math.isfinite(z):
+        return z
+    exact = Fraction(x) * Fraction(y) + Fraction(z)
+    if exact == 0:
+        # An exact zero sum of non-zero terms is +0; a zero product keeps IEEE's signed-zero addition
+        return x * y + z if x == 0.0 or y == 0.0 else 0.0
+    try:
+        return float(exact)  # integer true division: correctly rounded
+    except OverflowError:
+        return math.inf if exact > 0 else -math.inf
+
+
+def _fused(negate_product, negate_addend):
+    def op(a, b, c, rm):
+        x, y, z = to_float(a), to_float(b), to_float(c)
+        fflags = NV if (math.isinf(x) and y == 0.0) or (x == 0.0 and math.isinf(y)) else 0
+        return _result(_fma(-x if negate_product else x, y, -z if negate_addend else z), fflags, a, b, c)
+    return op
+
+
+def _fminmax(want_max):
+    def op(a, b, c, rm):
+        fflags = NV if is_snan(a) or is_snan(b) else 0
+        if is_nan(a):
+            return (CANONICAL_NAN if is_nan(b) else b), fflags
+        if is_nan(b):
+            return a, fflags
+        x, y = to_float(a), to_float(b)
+        if x == y:
+            # Equal values, or zeros of either sign: -0 is the smaller
+            return (a & b if want_max else a | b), fflags
+        return (a if (x > y) == want_max else b), fflags
+    return op
+
+
+def _round(x, rm):
+    """Round a finite double to an integer in rounding mode 'rm' (exact)."""
+    if rm == RTZ:
+        return math.trunc(x)
+    if rm == RDN:
+        return math.floor(x)
+    if rm == RUP:
+        return math.ceil(x)
+    n = math.floor(x)
+    fraction = x - n  # exact for doubles
+    if fraction > 0.5 or (fraction == 0.5 and (n >= 0 if rm == RMM else n & 1)):
+        n += 1
+    return n
+
+
+def _to_int(a, rm, low, high):
+    """Convert to an integer in [low, high], saturating with NV; returns (value, fflags)."""
+    if is_nan(a):
+        return high, NV
+    x = to_float(a)
+    if math.isinf(x):
+        return (high if x > 0 else low), NV
+    n = _round(x, rm)
+    if n < low:
+        return low, NV
+    if n > high:
+        return high, NV
+    return n, 0 if n == x else NX
+
+
+def _sext32(value):
+    # 32-bit results are sign-extended into the 64-bit register, unsigned ones too
+    value &= MASK32
+    return value | NAN_BOX if value & 0x80000000 else value
+
+
+def _fcvt_w_d(a, b, c, rm):
+    n, fflags = _to_int(a, rm, -(1 << 31), (1 << 31) - 1)
+    return _sext32(n), fflags
+
+
+def _fcvt_wu_d(a, b, c, rm):
+    n, fflags = _to_int(a, rm, 0, MASK32)
+    return _sext32(n), fflags
+
+
+def _fcvt_d_w(a, b, c, rm):
+    n = a & MASK32
+    return from_float(float(n - (1 << 32) if n & 0x80000000 else n)), 0
+
+
+def _fcvt_d_wu(a, b, c, rm):
+    return from_float(float(a & MASK32)), 0
+
+
+def _fcvt_s_d(a, b, c, rm):
+    # The single result is NaN-boxed: the upper 32 bits are all ones
+    if is_nan(a):
+        return NAN_BOX | CANONICAL_NAN_S, NV if is_snan(a) else 0
+    x = to_float(a)
+    try:
+        single = _F.pack(x)
+        fflags = 0 if _F.unpack(single)[0] == x else NX
+    except OverflowError:  # rounds past the largest single
+        single = _F.pack(math.copysign(math.inf, x))
+        fflags = OF | NX
+    return NAN_BOX | _I.unpack(single)[0], fflags
+
+
+def _fcvt_d_s(a, b, c, rm):
+    if (a & NAN_BOX) != NAN_BOX:
+        return CANONICAL_NAN, 0  # not a NaN-boxed single: reads as the canonical NaN
+    single = a & MASK32
+    if (single & 0x7F800000) == 0x7F800000 and single & 0x7FFFFF:
+        return CANONICAL_NAN, 0 if single & 0x400000 else NV
+    return from_float(_F.unpack(_I.pack(single))[0]), 0
+
+
+def _fclass_d(a, b, c, rm):
+    negative = bool(a & SIGN64)
+    exponent, fraction = a & EXP64, a & FRAC64
+    if exponent == EXP64:
+        if fraction:
+            return (1 << 9 if a & QUIET64 else 1 << 8), 0
+        return (1 << 0 if negative else 1 << 7), 0
+    if exponent == 0:
+        if fraction == 0:
+            return (1 << 3 if negative else 1 << 4), 0
+        return (1 << 2 if negative else 1 << 5), 0
+    return (1 << 1 if negative else 1 << 6), 0
+
+
+FP_OPS = {
+    'fadd.d':    _fadd,
+    'fsub.d':    _fsub,
+    'fmul.d':    _fmul,
+    'fdiv.d':    _fdiv,
+    'fsqrt.d':   _fsqrt,
+    'fmadd.d':   _fused(False, False),
+    'fmsub.d':   _fused(False, True),
+    'fnmsub.d':  _fused(True, False),
+    'fnmadd.d':  _fused(True, True),
+    'fmin.d':    _fminmax(False),
+    'fmax.d':    _fminmax(True),
+    # Sign injection and moves only rearrange bits
+    'fsgnj.d':   lambda a, b, c, rm: ((a & ~SIGN64) | (b & SIGN64), 0),
+    'fsgnjn.d':  lambda a, b, c, rm: ((a & ~SIGN64) | (~b & SIGN64), 0),
+    'fsgnjx.d':  lambda a, b, c, rm: (a ^ (b & SIGN64), 0),
+    'fmv.x.d':   lambda a, b, c, rm: (a, 0),
+    'fmv.d.x':   lambda a, b, c, rm: (a & MASK64, 0),
+    'fclass.d':  _fclass_d,
+    'fcvt.w.d':  _fcvt_w_d,
+    'fcvt.wu.d': _fcvt_wu_d,
+    'fcvt.d.w':  _fcvt_d_w,
+    'fcvt.d.wu': _fcvt_d_wu,
+    'fcvt.s.d':  _fcvt_s_d,
+    'fcvt.d.s':  _fcvt_d_s,
+}
+
+# Functional unit of each multi-cycle operation (all write an FP register);
+# the others, including every op with an integer result, execute in EX
+FP_UNITS = {
+    'fadd.d': 'add', 'fsub.d': 'add',
+    'fcvt.s.d': 'add', 'fcvt.d.s': 'add', 'fcvt.d.w': 'add', 'fcvt.d.wu': 'add',
+    'fmul.d': 'mul',
+    'fmadd.d': 'fma', 'fmsub.d': 'fma', 'fnmsub.d': 'fma', 'fnmadd.d': 'fma',
+    'fdiv.d': 'div',
+    'fsqrt.d': 'sqrt',
+}
+
+
+# --- Timing model ---
+# The units are tracked by a scoreboard (see scoreboard.py). Their results
+# share one write port into the FP register file (fld writes back through
+# the pipeline's own), and a dependent instruction executes 'latency'
+# cycles after the op, as an ALU op's dependant executes one cycle after.
+
+# unit -> (latency in cycles, pipelined)
+DEFAULT_UNITS = {'add': (3, True), 'mul': (4, True), 'fma': (5, True), 'div': (20, False), 'sqrt': (25, False)}
+
+
+class FPU(Scoreboard):
+    def __init__(self, units=None):
+        super().__init__('FPU', DEFAULT_UNITS, units)
+
+
+def make_fpu(spec=None):
+    """
+    Build an FPU from 'UNIT=LATENCY[:pipelined|unpipelined],...' overriding
+    DEFAULT_UNITS, e.g. 'div=12,sqrt=12:pipelined'. An empty spec keeps
+    the defaults.
+    """
+    return FPU(parse_units('FPU', spec, DEFAULT_UNITS))
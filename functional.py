@@ -0,0 +1,145 @@
+# functional.py
+# ISA-level (architectural-only) interpreter.
+# Retires one instruction per step with no pipeline latches or hazard
+# modelling, so it can race through code whose timing we don't care about
+# and then hand its state to the cycle-level pipeline in main.py.
+# With 'translate' on, straight-line code runs as cached basic blocks
+# (block_cache.py) instead of instruction by instruction.
+
+from alu import MASK64
+from block_cache import BlockCache
+from control_unit import CSR_OPS
+from csr import CsrFile
+from fpu import rounding_mode
+from memory_unit import PagedMemory, MemoryFault
+from register_file import RegisterFile, FREG_BASE
+from utils import decodeWord
+
+
+class FunctionalCore:
+    def __init__(self, memory=None, register_file=None, pc=0, translate=True, max_blocks=4096):
+        # Shares (does not copy) the memory and register file it is given
+        self.memory = memory if memory is not None else PagedMemory()
+        self.register_file = register_file if register_file is not None else RegisterFile()
+        self.pc = pc
+        self.instructions_retired = 0
+        # No cycle model here: cycle and time read as instret
+        self.csr_file = CsrFile(self.register_file, self._retired, self._retired)
+        self.block_cache = BlockCache(self.memory, decodeWord, max_blocks) if translate else None
+
+    def _retired(self):
+        return self.instructions_retired
+
+    def step(self):
+        """Execute and retire the instruction at self.pc."""
+        pc = self.pc
+        memory = self.memory
+        regs = self.register_file.regs
+        inst = decodeWord(memory.load(pc, 4))
+        ctrl = inst.ctrl
+        if ctrl.fpu:
+            self._step_fp(inst)
+            return
+        next_pc = pc + 4
+
+        op1 = regs[inst.rs1]
+        op2 = inst.imm if ctrl.aluSrc else regs[inst.rs2]
+        result = ctrl.aluFn(op1, op2)
+
+        if ctrl.branch:
+            if result:
+                next_pc = pc + inst.imm
+        elif inst.mnemonic == 'jal':
+            next_pc = pc + inst.imm
+            result = pc + 4
+        elif inst.mnemonic == 'jalr':
+            next_pc = (op1 + inst.imm) & ~1
+            result = pc + 4
+        elif inst.mnemonic in CSR_OPS:
+            result = self.csr_file.execute(inst.mnemonic, inst.imm & 0xFFF, inst.rs1, op1)
+
+        if ctrl.memRead:
+            result = memory.load(result, ctrl.memWidth, ctrl.memSigned)
+        elif ctrl.memWrite:
+            memory.store(result, ctrl.memWidth, regs[inst.rs2])
+
+        if ctrl.regWrite and inst.rd != 0:
+            regs[inst.rd] = result
+
+        if inst.mnemonic == 'fence.i' and self.block_cache is not None:
+            self.block_cache.flush()
+
+        self.pc = next_pc & MASK64
+        self.instructions_retired += 1
+
+    def _step_fp(self, inst):
+        """Execute and retire a D-extension instruction (operands by register key)."""
+        register_file = self.register_file
+        value = register_file.value
+        ctrl = inst.ctrl
+        rd, rs1, rs2, rs3 = inst.keys
+        result = None
+        if ctrl.memRead:
+            result = self.memory.load((value(rs1) + inst.imm) & MASK64, 8)
+        elif ctrl.memWrite:
+            self.memory.store((value(rs1) + inst.imm) & MASK64, 8, value(rs2))
+        else:
+            result, fflags = ctrl.fpuFn(value(rs1), value(rs2), value(rs3),
+                                        rounding_mode(inst.inst_word, register_file.fcsr))
+            register_file.fcsr |= fflags
+        if result is not None:
+            if rd >= FREG_BASE:
+                register_file.fregs[rd - FREG_BASE] = result
+            elif rd != 0:
+                register_file.regs[rd] = result
+        self.pc = (self.pc + 4) & MASK64
+        self.instructions_retired += 1
+
+    def run(self, max_instructions=None, until_pc=None):
+        """
+        Retire instructions until 'max_instructions' have been executed or
+        the PC reaches 'until_pc' (whichever comes first).
+        Returns the number of instructions retired by this call.
+        """
+        if max_instructions is None and until_pc is None:
+            raise ValueError("run() needs max_instructions and/or until_pc")
+        # Registers are assigned directly below, bypassing change tracking
+        self.register_file.note_all()
+        start = self.instructions_retired
+        limit = start + max_instructions if max_instructions is not None else None
+        try:
+            if self.block_cache is None:
+                step = self.step
+                while self.pc != until_pc and (limit is None or self.instructions_retired < limit):
+                    step()
+            else:
+                self._run_blocks(limit, until_pc)
+        except MemoryFault as e:
+            e.pc = self.pc  # left at the faulting instruction
+            raise
+        return self.instructions_retired - start
+
+    def _run_blocks(self, limit, until_pc):
+        regs = self.register_file.regs
+        lookup = self.block_cache.lookup
+        pc = self.pc
+        retired = self.instructions_retired
+        while pc != until_pc and (limit is None or retired < limit):
+            block = lookup(pc)
+            if block.fn is None or (limit is not None and retired + block.length > limit) or (until_pc is not None and block.start < until_pc < block.end):
+                # Untranslated instruction, or the stopping point is inside this block: single-step
+                self.pc, self.instructions_retired = pc, retired
+                self.step()
+                pc, retired = self.pc, self.instructions_retired
+                continue
+            try:
+                pc = block.fn(regs)
+            except MemoryFault as e:
+                # The instructions before the faulting load/store have taken effect
+                self.pc = self.block_cache.fault_pc(block, e.__traceback__)
+                self.instructions_retired = retired + (self.pc - block.start) // 4
+                raise
+            retired += block.length
+            self.pc, self.instructions_retired = pc, retired
+            if block.flush_after:
+                self.block_cache.flush()
@@ -0,0 +1,269 @@
+# guest_profile.py
+# Hotspot profiling of the simulated program.
+#
+# A GuestProfiler attached to a Simulator (Simulator.enable_guest_profile())
+# counts, per PC, the instructions retired there and the stall and flush
+# cycles the instruction at that PC caused; every taken control transfer
+# as a (source, target) edge; and the cycles and instructions spent under
+# each call stack. Everything is a dict of counters bumped in place, so a
+# multi-million-instruction run costs a few dict updates per instruction
+# and the profile's size follows the program's code, not the run's length.
+# Basic blocks and per-function totals are derived from the counters when
+# a report is made.
+#
+# Lost cycles are charged to the instruction that caused them: a load-use
+# stall to the load, a decode stall to the FPU or multiply/divide op whose
+# result is awaited, a structural stall to the instruction that cannot
+# issue, a D-cache miss to the access, an I-cache miss to the PC being
+# fetched, a control flush to the mispredicted branch or jump, and the
+# out-of-order core's dispatch stalls to the oldest instruction holding
+# the full ROB, station or LSQ.
+#
+# Calls and returns follow the RISC-V link-register convention (x1/ra or
+# x5/t0): jal/jalr writing a link register is a call, jalr x0 through a
+# link register a return. They are seen when the jump resolves (EX in the
+# pipeline, commit in the out-of-order core), so the stack boundaries are
+# off by the few instructions still in flight. Instructions run by
+# fast_forward() are not profiled.
+
+import bisect
+import sys
+from collections import defaultdict
+
+from utils import decodeWord
+
+LINK_REGISTERS = (1, 5)  # ra, t0
+
+# Frames kept on the shadow call stack; deeper calls are counted in their caller
+MAX_DEPTH = 256
+
+# Rows of each table printed by report()
+REPORT_ROWS = 20
+
+
+class GuestProfiler:
+    def __init__(self, sim, flush_penalty):
+        self.sim = sim
+        self.flush_penalty = flush_penalty  # cycles charged per control flush
+        self.reset()
+
+    def reset(self):
+        """Forget everything; the stack restarts at the simulator's PC."""
+        self.retired = defaultdict(int)      # pc -> instructions retired
+        self.stalls = defaultdict(int)       # (pc, cause) -> cycles lost
+        self.edges = defaultdict(int)        # (pc, target) -> taken transfers
+        self.calls = defaultdict(int)        # (caller entry, callee entry) -> calls
+        self.stack_cycles = defaultdict(int) # call stack (tuple of entry PCs) -> cycles spent at its top
+        self.stack_instret = defaultdict(int)
+        self.stack = (self.sim.pc,)
+        self.overflow = 0                    # calls beyond MAX_DEPTH not pushed
+        counters = self.sim.counters
+        self._instret = counters.instret
+        self._cycles = counters.cycles
+
+    # --- Collection (called from the simulator loops) ---
+
+    def charge(self, pc, cause, cycles=1):
+        """Charge 'cycles' lost to 'cause' (a PerfCounters.stalls key or 'flush') to the instruction at 'pc'."""
+        self.stalls[(pc, cause)] += cycles
+
+    def flush(self, pc):
+        """A control flush caused by the branch or jump at 'pc'."""
+        self.stalls[(pc, 'flush')] += self.flush_penalty
+
+    def transfer(self, pc, target, inst):
+        """The control instruction 'inst' (a DecodedInst) at 'pc' went to 'target'."""
+        self.edges[(pc, target)] += 1
+        mnemonic = inst.mnemonic
+        if mnemonic != 'jal' and mnemonic != 'jalr':
+            return
+        if inst.rd in LINK_REGISTERS:
+            self._settle()
+            self.calls[(self.stack[-1], target)] += 1
+            if len(self.stack) < MAX_DEPTH:
+                self.stack += (target,)
+            else:
+                self.overflow += 1
+        elif mnemonic == 'jalr' and inst.rd == 0 and inst.rs1 in LINK_REGISTERS:
+            self._settle()
+            if self.overflow:
+                self.overflow -= 1
+            elif len(self.stack) > 1:
+                self.stack = self.stack[:-1]
+            else:
+                # Returned from where profiling started: continue in the caller
+                self.stack = (target,)
+
+    def _settle(self):
+        """Charge the cycles and instructions since the last stack change to the current stack."""
+        counters = self.sim.counters
+        stack = self.stack
+        self.stack_cycles[stack] += counters.cycles - self._cycles
+        self.stack_instret[stack] += counters.instret - self._instret
+        self._cycles = counters.cycles
+        self._instret = counters.instret
+
+    # --- Analysis ---
+
+    def _locator(self):
+        """
+        Function lookup for PCs: (sorted start addresses, names). Uses the
+        symbol table when there is one, else the call targets seen.
+        """
+        starts = {}
+        for name, (value, _) in self.sim.symbols.items():
+            starts.setdefault(value, name)
+        if not starts:
+            for _, callee in self.calls:
+                starts[callee] = f"{callee:#x}"
+            for frame in self.stack[:1]:
+                starts.setdefault(frame, f"{frame:#x}")
+        ordered = sorted(starts)
+        return ordered, [starts[start] for start in ordered]
+
+    def function_of(self, pc, locator=None):
+        """Name of the function containing 'pc' (its hex address when unknown)."""
+        ordered, names = locator or self._locator()
+        index = bisect.bisect_right(ordered, pc) - 1
+        return names[index] if index >= 0 else f"{pc:#x}"
+
+    def location(self, pc, locator=None):
+        """'function+offset' of 'pc'."""
+        ordered, names = locator or self._locator()
+        index = bisect.bisect_right(ordered, pc) - 1
+        if index < 0:
+            return f"{pc:#x}"
+        offset = pc - ordered[index]
+        return f"{names[index]}+{offset:#x}" if offset else names[index]
+
+    def _inst(self, pc):
+        return decodeWord(self.sim.memory.load(pc, 4))
+
+    def basic_blocks(self):
+        """
+        [(start pc, end pc (exclusive), executions), ...] by address: maximal
+        runs of retired instructions entered only at the top and left only
+        at the bottom. A block's executions are its first instruction's.
+        """
+        retired = self.retired
+        leaders = {target for _, target in self.edges}
+        ends = set()
+        for pc in retired:
+            if pc - 4 not in retired:
+                leaders.add(pc)
+            inst = self._inst(pc)
+            if inst.ctrl.branch or inst.mnemonic == 'jal' or inst.mnemonic == 'jalr':
+                ends.add(pc)
+        blocks = []
+        start = None
+        for pc in sorted(retired):
+            if start is not None and (pc in leaders or pc != end):
+                blocks.append((start, end, retired[start]))
+                start = None
+            if start is None:
+                start = pc
+            end = pc + 4
+            if pc in ends:
+                blocks.append((start, end, retired[start]))
+                start = None
+        if start is not None:
+            blocks.append((start, end, retired[start]))
+        return blocks
+
+    def functions(self, locator=None):
+        """
+        Function name -> {'retired', 'stall_cycles', 'flush_cycles' (of its
+        instructions), 'calls' (into it), 'self_cycles', 'total_cycles'}.
+        """
+        self._settle()
+        locator = locator or self._locator()
+        out = defaultdict(lambda: {'retired': 0, 'stall_cycles': 0, 'flush_cycles': 0, 'calls': 0,
+                                   'self_cycles': 0, 'total_cycles': 0})
+        for pc, n in self.retired.items():
+            out[self.function_of(pc, locator)]['retired'] += n
+        for (pc, cause), n in self.stalls.items():
+            out[self.function_of(pc, locator)]['flush_cycles' if cause == 'flush' else 'stall_cycles'] += n
+        for (_, callee), n in self.calls.items():
+            out[self.function_of(callee, locator)]['calls'] += n
+        for stack, cycles in self.stack_cycles.items():
+            names = [self.function_of(frame, locator) for frame in stack]
+            out[names[-1]]['self_cycles'] += cycles
+            for name in set(names):
+                out[name]['total_cycles'] += cycles
+        return dict(out)
+
+    def collapsed(self, weight='cycles'):
+        """
+        Call stacks in the collapsed format of flamegraph tools: one
+        'outer;...;inner COUNT' line each, COUNT being the cycles (or, with
+        weight='instret', the instructions retired) at the top of that stack.
+        """
+        if weight not in ('cycles', 'instret'):
+            raise ValueError(f"unknown weight '{weight}' (expected cycles or instret)")
+        self._settle()
+        locator = self._locator()
+        totals = defaultdict(int)
+        source = self.stack_cycles if weight == 'cycles' else self.stack_instret
+        for stack, n in source.items():
+            if n:
+                totals[';'.join(self.function_of(frame, locator) for frame in stack)] += n
+        return ''.join(f"{stack} {n}\n" for stack, n in sorted(totals.items()))
+
+    def stats(self):
+        """Everything collected as a JSON-serialisable dict (PCs as hex strings)."""
+        locator = self._locator()
+        pcs = {}
+        for pc, n in self.retired.items():
+            pcs[f"{pc:#x}"] = {'retired': n, 'stalls': {}}
+        for (pc, cause), n in self.stalls.items():
+            pcs.setdefault(f"{pc:#x}", {'retired': 0, 'stalls': {}})['stalls'][cause] = n
+        return {
+            'pcs': pcs,
+            'blocks': [{'start': f"{start:#x}", 'end': f"{end:#x}", 'count': n}
+                       for start, end, n in self.basic_blocks()],
+            'calls': [{'caller': self.function_of(caller, locator), 'callee': self.function_of(callee, locator),
+                       'count': n} for (caller, callee), n in self.calls.items()],
+            'functions': self.functions(locator),
+        }
+
+    def report(self, stream=None, rows=REPORT_ROWS):
+        """Print the flat profile: functions, hottest instructions and blocks, and the call graph."""
+        stream = stream if stream is not None else sys.stdout
+        locator = self._locator()
+        functions = self.functions(locator)
+        total_retired = sum(self.retired.values()) or 1
+        total_cycles = sum(self.stack_cycles.values()) or 1
+        lost = defaultdict(int)
+        for (pc, _), n in self.stalls.items():
+            lost[pc] += n
+
+        stream.write(f"\nGuest profile: {sum(self.retired.values())} instructions, "
+                     f"{sum(self.stack_cycles.values())} cycles\n")
+        stream.write(f"  {'function':<24} {'calls':>8} {'retired':>11} {'% ret':>6} {'self cyc':>11} {'% cyc':>6}"
+                     f" {'total cyc':>11} {'stall':>9} {'flush':>9}\n")
+        ranked = sorted(functions.items(), key=lambda item: item[1]['self_cycles'], reverse=True)
+        for name, f in ranked[:rows]:
+            stream.write(f"  {name:<24} {f['calls']:>8} {f['retired']:>11} {f['retired'] / total_retired:>6.1%}"
+                         f" {f['self_cycles']:>11} {f['self_cycles'] / total_cycles:>6.1%} {f['total_cycles']:>11}"
+                         f" {f['stall_cycles']:>9} {f['flush_cycles']:>9}\n")
+
+        stream.write(f"\n  {'pc':>10} {'location':<24} {'instruction':<8} {'retired':>11} {'lost cyc':>9}  causes\n")
+        hot = sorted(set(self.retired) | set(lost), key=lambda pc: self.retired.get(pc, 0) + lost.get(pc, 0),
+                     reverse=True)
+        for pc in hot[:rows]:
+            causes = ", ".join(f"{cause} {n}" for (where, cause), n in sorted(self.stalls.items()) if where == pc)
+            line = (f"  {pc:>#10x} {self.location(pc, locator):<24} {self._inst(pc).mnemonic:<8}"
+                    f" {self.retired.get(pc, 0):>11} {lost.get(pc, 0):>9}  {causes}")
+            stream.write(line.rstrip() + "\n")
+
+        blocks = sorted(self.basic_blocks(), key=lambda block: block[2] * (block[1] - block[0]), reverse=True)
+        stream.write(f"\n  Basic blocks: {len(blocks)}\n  {'start':>10} {'end':>10} {'location':<24}"
+                     f" {'insts':>5} {'executions':>11}\n")
+        for start, end, n in blocks[:rows]:
+            stream.write(f"  {start:>#10x} {end:>#10x} {self.location(start, locator):<24} {(end - start) // 4:>5}"
+                         f" {n:>11}\n")
+
+        if self.calls:
+            stream.write("\n  Call graph (caller -> callee: calls)\n")
+            for (caller, callee), n in sorted(self.calls.items(), key=lambda item: item[1], reverse=True)[:rows]:
+                stream.write(f"  {self.function_of(caller, locator)} -> {self.function_of(callee, locator)}: {n}\n")
@@ -0,0 +1,145 @@
+# host_profile.py
+# Host-time profiling of the simulator's own hot paths.
+#
+# enable() replaces each profiled function with a wrapper that counts its
+# calls and times every 'sample'-th one with perf_counter_ns; disable()
+# puts the originals back, so a disabled profiler costs nothing and it can
+# be switched on and off between run() calls (or between run_stream()
+# snapshots). Unlike cProfile only the listed functions pay for it, so
+# the per-stage split stays close to an unprofiled run. Times are
+# inclusive (execute contains the ALU ops it calls), and the cost of the
+# clock reads is calibrated out.
+#
+# Points are (owner, attribute) pairs: methods are wrapped on the class
+# and module functions in their module, so the profiler is process-wide
+# like the tracer. ALU ops are reached through the aluFn bound in each
+# control record (see control_unit.py) rather than alu.alu, so they are
+# wrapped there, and the decode memo is cleared to pick the records up.
+
+import sys
+from time import perf_counter_ns
+
+import control_unit
+import utils
+
+ALU = 'alu'  # label of the ALU ops bound into the control records
+
+
+class HostProfiler:
+    def __init__(self):
+        self.enabled = False
+        self.sample = 1
+        self.records = {}   # label -> [calls, timed calls, ns in timed calls]
+        self.wall_ns = 0    # host time while enabled, up to the last disable()
+        self._started = 0
+        self._saved = []    # (owner, attribute, original)
+        self._saved_table = None
+        self._overhead = 0  # ns one clock read pair adds to a timed call
+
+    def enable(self, points, sample=1, alu=True):
+        """
+        Start timing 'points' ((owner, attribute) pairs) and, with 'alu',
+        the ALU ops. 'sample' = N times every Nth call (all are counted).
+        """
+        if self.enabled:
+            raise ValueError("the host profiler is already enabled")
+        if sample < 1:
+            raise ValueError(f"sample must be at least 1, got {sample}")
+        self.sample = sample
+        self._overhead = _calibrate()
+        for owner, attribute in points:
+            original = getattr(owner, attribute)
+            self._saved.append((owner, attribute, original))
+            setattr(owner, attribute, self._timed(f"{owner.__name__}.{attribute}", original))
+        if alu:
+            table = control_unit.CONTROL_TABLE
+            self._saved_table = dict(table)
+            for name, ctrl in table.items():
+                if ctrl.aluFn is not control_unit.alu_nop:
+                    table[name] = ctrl._replace(aluFn=self._timed(ALU, ctrl.aluFn))
+            utils.decodeWord.cache_clear()
+        self.enabled = True
+        self._started = perf_counter_ns()
+
+    def disable(self):
+        """Put the original functions back; the records are kept for report()."""
+        if not self.enabled:
+            return
+        self.wall_ns += perf_counter_ns() - self._started
+        for owner, attribute, original in reversed(self._saved):
+            setattr(owner, attribute, original)
+        self._saved = []
+        if self._saved_table is not None:
+            control_unit.CONTROL_TABLE.update(self._saved_table)
+            self._saved_table = None
+            utils.decodeWord.cache_clear()
+        self.enabled = False
+
+    def reset(self):
+        """Forget what has been measured (the profiler stays enabled or disabled)."""
+        for record in self.records.values():
+            record[:] = [0, 0, 0]
+        self.wall_ns = 0
+        self._started = perf_counter_ns()
+
+    def _timed(self, label, fn):
+        record = self.records.setdefault(label, [0, 0, 0])
+        sample = self.sample
+        overhead = self._overhead
+        clock = perf_counter_ns
+
+        def timed(*args):
+            record[0] += 1
+            if record[0] % sample:
+                return fn(*args)
+            start = clock()
+            result = fn(*args)
+            record[2] += clock() - start - overhead
+            record[1] += 1
+            return result
+        timed.__wrapped__ = fn
+        return timed
+
+    def stats(self):
+        """
+        label -> {'calls', 'timed', 'ns_per_call', 'total_s'} (total_s scaled
+        from the timed calls to all of them), plus 'wall_s' for the host
+        time spent enabled.
+        """
+        out = {}
+        for label, (calls, timed, ns) in self.records.items():
+            per_call = max(ns, 0) / timed if timed else 0.0
+            out[label] = {'calls': calls, 'timed': timed, 'ns_per_call': per_call, 'total_s': per_call * calls / 1e9}
+        wall = self.wall_ns + (perf_counter_ns() - self._started if self.enabled else 0)
+        return {'wall_s': wall / 1e9, 'functions': out}
+
+    def report(self, stream=None):
+        """Print the functions ranked by estimated total host time."""
+        stream = stream if stream is not None else sys.stdout
+        stats = self.stats()
+        wall = stats['wall_s']
+        ranked = sorted(stats['functions'].items(), key=lambda item: item[1]['total_s'], reverse=True)
+        stream.write(f"\nHost profile: {wall:.3f} s profiled, timing 1 in {self.sample} calls"
+                     " (times include nested calls)\n")
+        stream.write(f"  {'function':<34} {'calls':>11} {'ns/call':>9} {'total s':>9} {'% time':>7}\n")
+        for label, s in ranked:
+            if not s['calls']:
+                continue
+            share = s['total_s'] / wall if wall else 0.0
+            stream.write(f"  {label:<34} {s['calls']:>11} {s['ns_per_call']:>9.0f} {s['total_s']:>9.3f} {share:>7.1%}\n")
+
+
+def _calibrate(rounds=2000):
+    """Smallest gap between two clock reads: what timing a call adds by itself."""
+    clock = perf_counter_ns
+    best = None
+    for _ in range(rounds):
+        start = clock()
+        gap = clock() - start
+        if best is None or gap < best:
+            best = gap
+    return best
+
+
+# Process-wide profiler
+host_profiler = HostProfiler()
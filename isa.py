@@ -16,9 +16,18 @@ OPCODES = {
     'bltu':   0b1100011,
     'bgeu':   0b1100011,
     # Load (I-type)
+    'lb':     0b0000011,
+    'lh':     0b0000011,
     'lw':     0b0000011,
+    'ld':     0b0000011,
+    'lbu':    0b0000011,
+    'lhu':    0b0000011,
+    'lwu':    0b0000011,
     # Store (S-type)
+    'sb':     0b0100011,
+    'sh':     0b0100011,
     'sw':     0b0100011,
+    'sd':     0b0100011,
     # Immediate ALU (I-type)
     'addi':   0b0010011,
     'slti':   0b0010011,
@@ -54,6 +63,13 @@ OPCODES = {
     'FENCE.I':  0b0001111,
     'ECALL':    0b1110011,
     'EBREAK':   0b1110011,
+    # Zicsr (SYSTEM opcode)
+    'CSRRW':    0b1110011,
+    'CSRRS':    0b1110011,
+    'CSRRC':    0b1110011,
+    'CSRRWI':   0b1110011,
+    'CSRRSI':   0b1110011,
+    'CSRRCI':   0b1110011,
     # F-extension D loads/stores
     'FLD':    0b0000111,
     'FSD':    0b0100111,
@@ -79,9 +95,9 @@ OPCODES = {
     'FCLASS.D':0b1010011,
     # FMA-extension (R4-type)
     'FMADD.D': 0b1000011,
-    'FMSUB.D': 0b1000011,
-    'FNMADD.D':0b1000011,
-    'FNMSUB.D':0b1000011,
+    'FMSUB.D': 0b1000111,
+    'FNMSUB.D':0b1001011,
+    'FNMADD.D':0b1001111,
 }
 
 # ----------------------------------------------------------------------------
@@ -112,19 +128,22 @@ FUNCT3 = {
     # Fence/System
     'FENCE':   0b000, 'FENCE.I':0b001,
     'ECALL':   0b000, 'EBREAK':0b000,
+    # Zicsr
+    'CSRRW':  0b001, 'CSRRS':  0b010, 'CSRRC':  0b011,
+    'CSRRWI': 0b101, 'CSRRSI': 0b110, 'CSRRCI': 0b111,
     # FP loads/stores
     'FLD': 0b011, 'FSD': 0b011,
     # FP arithmetic/logical (rm = rounding mode bits)
     'FADD.D': 0b000, 'FSUB.D': 0b000,
     'FMUL.D': 0b000, 'FDIV.D': 0b000,
     'FSQRT.D':0b000,
-    'FSGNJ.D':0b000,'FSGNJN.D':0b000,'FSGNJX.D':0b000,
-    'FMIN.D':0b000,'FMAX.D':0b000,
+    'FSGNJ.D':0b000,'FSGNJN.D':0b001,'FSGNJX.D':0b010,
+    'FMIN.D':0b000,'FMAX.D':0b001,
     'FCVT.S.D':0b000,'FCVT.D.S':0b000,
     'FCVT.W.D':0b000,'FCVT.WU.D':0b000,
     'FCVT.D.W':0b000,'FCVT.D.WU':0b000,
     'FMV.X.D':0b000,'FMV.D.X':0b000,
-    'FCLASS.D':0b000,
+    'FCLASS.D':0b001,
     # FMA-extension (rm bits also in funct3)
     'FMADD.D':0b000,'FMSUB.D':0b000,'FNMADD.D':0b000,'FNMSUB.D':0b000,
 }
@@ -146,19 +165,43 @@ FUNCT7 = {
     'MULHSU': 0b0000001,'MULHU':  0b0000001,
     'DIV':    0b0000001, 'DIVU':   0b0000001,
     'REM':    0b0000001, 'REMU':   0b0000001,
-    # F-extension D (OP-FP fmt=001 << 5 = 0x20 + funct5)
-    'FADD.D':  0b00100000, 'FSUB.D':  0b00100001,
-    'FMUL.D':  0b00100010, 'FDIV.D':  0b00100011,
-    'FSQRT.D': 0b00101011,
-    'FSGNJ.D': 0b00100100, 'FSGNJN.D':0b00100101, 'FSGNJX.D':0b00100110,
-    'FMIN.D':  0b00100111, 'FMAX.D':  0b00101000,
-    'FCVT.S.D':0b00110000, 'FCVT.D.S':0b00110001,
-    'FCVT.W.D':0b00111000, 'FCVT.WU.D':0b00111001,
-    'FCVT.D.W':0b00111010, 'FCVT.D.WU':0b00111011,
-    'FMV.X.D': 0b00111100, 'FMV.D.X': 0b00111101,
-    'FCLASS.D':0b00111110,
+    # D-extension (OP-FP: funct5 << 2 | fmt, fmt=01 for double)
+    'FADD.D':  0b0000001, 'FSUB.D':  0b0000101,
+    'FMUL.D':  0b0001001, 'FDIV.D':  0b0001101,
+    'FSQRT.D': 0b0101101,
+    'FSGNJ.D': 0b0010001, 'FSGNJN.D':0b0010001, 'FSGNJX.D':0b0010001,
+    'FMIN.D':  0b0010101, 'FMAX.D':  0b0010101,
+    'FCVT.S.D':0b0100000, 'FCVT.D.S':0b0100001,
+    'FCVT.W.D':0b1100001, 'FCVT.WU.D':0b1100001,
+    'FCVT.D.W':0b1101001, 'FCVT.D.WU':0b1101001,
+    'FMV.X.D': 0b1110001, 'FMV.D.X': 0b1111001,
+    'FCLASS.D':0b1110001,
     # FMA-extension
-    # fmt=001 <<5 =0x20, plus funct5 codes:
-    'FMADD.D': 0b00100000, 'FMSUB.D': 0b00100001,
-    'FNMADD.D':0b00100011, 'FNMSUB.D':0b00100010,
+    # bits [31:27] hold rs3, only the fmt bits [26:25] select the instruction
+    'FMADD.D': 0b01, 'FMSUB.D': 0b01,
+    'FNMADD.D':0b01, 'FNMSUB.D':0b01,
+}
+
+# ----------------------------------------------------------------------------
+# RS2: instructions whose rs2 field (bits [24:20]) is a fixed selector
+# ----------------------------------------------------------------------------
+RS2 = {
+    # Fence/System (imm[4:0])
+    'ECALL':   0b00000, 'EBREAK':  0b00001,
+    # OP-FP unary forms
+    'FSQRT.D': 0b00000,
+    'FCVT.S.D':0b00001, 'FCVT.D.S':0b00000,
+    'FCVT.W.D':0b00000, 'FCVT.WU.D':0b00001,
+    'FCVT.D.W':0b00000, 'FCVT.D.WU':0b00001,
+    'FMV.X.D': 0b00000, 'FMV.D.X': 0b00000,
+    'FCLASS.D':0b00000,
+}
+
+# ----------------------------------------------------------------------------
+# FP_RM: instructions whose funct3 field is the rounding mode, not a selector
+# ----------------------------------------------------------------------------
+FP_RM = {
+    'FADD.D', 'FSUB.D', 'FMUL.D', 'FDIV.D', 'FSQRT.D',
+    'FCVT.S.D', 'FCVT.D.S', 'FCVT.W.D', 'FCVT.WU.D', 'FCVT.D.W', 'FCVT.D.WU',
+    'FMADD.D', 'FMSUB.D', 'FNMADD.D', 'FNMSUB.D',
 }
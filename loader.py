@@ -0,0 +1,128 @@
+# loader.py
+# Program loader for RV64 ELF executables and raw flat binaries.
+#
+# The file is memory-mapped and each PT_LOAD segment (or the whole flat
+# image) is copied into PagedMemory with a single load_image call, so no
+# per-word parsing happens at startup.
+
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+from memory_unit import MemoryFault
+
+# Result of loading a program
+# entry: initial PC, segments: [(vaddr, memsz)], symbols: name -> (value, size)
+LoadedProgram = namedtuple("LoadedProgram", ["entry", "segments", "symbols"])
+
+ELF_MAGIC = b'\x7fELF'
+ELFCLASS64 = 2
+ELFDATA2LSB = 1
+EM_RISCV = 243
+PT_LOAD = 1
+SHT_SYMTAB = 2
+
+# Elf64_Ehdr fields after e_ident
+_EHDR = struct.Struct('<HHIQQQIHHHHHH')
+# Elf64_Phdr
+_PHDR = struct.Struct('<IIQQQQQQ')
+# Elf64_Shdr
+_SHDR = struct.Struct('<IIQQQQIIQQ')
+# Elf64_Sym
+_SYM = struct.Struct('<IBBHQQ')
+
+STACK_ALIGN = 16
+
+
+class LoaderError(Exception):
+    pass
+
+
+def _cstring(data, offset):
+    end = data.find(b'\x00', offset)
+    return bytes(data[offset:end]).decode('ascii', 'replace')
+
+
+def _read_symbols(data, shoff, shentsize, shnum):
+    """Collect named symbols from the first SHT_SYMTAB section."""
+    symbols = {}
+    if shoff == 0:
+        return symbols
+    sections = [_SHDR.unpack_from(data, shoff + i * shentsize) for i in range(shnum)]
+    for sh_name, sh_type, _, _, sh_offset, sh_size, sh_link, _, _, sh_entsize in sections:
+        if sh_type != SHT_SYMTAB:
+            continue
+        strtab_offset = sections[sh_link][4]
+        for pos in range(sh_offset, sh_offset + sh_size, sh_entsize or _SYM.size):
+            st_name, _, _, _, st_value, st_size = _SYM.unpack_from(data, pos)
+            if st_name:
+                symbols[_cstring(data, strtab_offset + st_name)] = (st_value, st_size)
+        break
+    return symbols
+
+
+def load_elf(data, memory):
+    """Place the PT_LOAD segments of an ELF64 RISC-V image into 'memory'."""
+    if bytes(data[:4]) != ELF_MAGIC:
+        raise LoaderError("Not an ELF file")
+    if data[4] != ELFCLASS64 or data[5] != ELFDATA2LSB:
+        raise LoaderError("Only little-endian ELF64 images are supported")
+    (_, e_machine, _, e_entry, e_phoff, e_shoff, _, _,
+     e_phentsize, e_phnum, e_shentsize, e_shnum, _) = _EHDR.unpack_from(data, 16)
+    if e_machine != EM_RISCV:
+        raise LoaderError(f"Not a RISC-V executable (e_machine={e_machine})")
+
+    view = memoryview(data)
+    segments = []
+    try:
+        for i in range(e_phnum):
+            p_type, _, p_offset, p_vaddr, _, p_filesz, p_memsz, _ = _PHDR.unpack_from(data, e_phoff + i * e_phentsize)
+            if p_type != PT_LOAD:
+                continue
+            with view[p_offset:p_offset + p_filesz] as segment:
+                memory.load_image(p_vaddr, segment)
+            if p_memsz > p_filesz:
+                memory.clear_range(p_vaddr + p_filesz, p_memsz - p_filesz)  # .bss
+            segments.append((p_vaddr, p_memsz))
+    finally:
+        view.release()
+
+    return LoadedProgram(e_entry, segments, _read_symbols(data, e_shoff, e_shentsize, e_shnum))
+
+
+def load_flat(data, memory, base=0):
+    """Copy a raw binary image to 'base'; execution starts at 'base'."""
+    memory.load_image(base, data)
+    return LoadedProgram(base, [(base, len(data))], {})
+
+
+def load_file(path, memory, base=0):
+    """
+    Memory-map 'path' and load it: ELF images by their program headers,
+    anything else as a flat binary at 'base'.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise LoaderError("Empty file")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            try:
+                if data[:4] == ELF_MAGIC:
+                    return load_elf(data, memory)
+                return load_flat(data, memory, base)
+            except MemoryFault as e:
+                raise LoaderError(f"Program does not fit in memory: {e}")
+
+
+def init_registers(register_file, program, memory, stack_top=None):
+    """
+    Set up the ABI registers: sp at the top of memory (16-byte aligned)
+    unless 'stack_top' is given, and gp from __global_pointer$ when the
+    image defines it.
+    """
+    if stack_top is None:
+        stack_top = memory.size
+    register_file.write(2, stack_top & ~(STACK_ALIGN - 1))  # sp
+    gp = program.symbols.get('__global_pointer$')
+    if gp is not None:
+        register_file.write(3, gp[0])  # gp
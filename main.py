@@ -1,48 +1,72 @@
 # main.py
+import argparse
+import json
 import sys
-from collections import namedtuple
+from collections import deque, namedtuple
 
 # Assuming your files are in the same directory or accessible via PYTHONPATH
-from register_file import RegisterFile #
-from utils import decodeInstruction, fieldsGen, imm_i, imm_s, imm_b, imm_u, imm_j #
-from alu import alu #
-from control_unit import get_control_signals #
-# Note: pipeline.py provided mem_stage and wb_stage, but we need distinct
-# functions for each pipeline stage's logic within the main loop.
-# We'll adapt the logic from pipeline.py and execute_stage.py here.
+from register_file import RegisterFile, FREG_BASE #
+from utils import decodeWord #
+from control_unit import CSR_OPS
+from functional import FunctionalCore
+from pipeline import IF_ID, ID_EX, EX_MEM, MEM_WB, NOP_INSTRUCTION
+from memory_unit import PagedMemory, MemoryFault
+from branch_predictor import make_predictor
+from cache import make_cache
+from csr import CsrFile, FP_FIELDS
+from fpu import make_fpu, rounding_mode
+from muldiv import make_muldiv
+from superscalar import IssueGroup, make_ports, held_write
+from ooo import OutOfOrderCore
+from perf_counters import PerfCounters, INST_CLASS
+import loader
+import assembler
+import checkpoint
+import stream
+import utils
+from host_profile import host_profiler
+from guest_profile import GuestProfiler
+from tracing import tracer, parse_categories, JsonLinesSink, ConsoleSink, HAZARD, FORWARD, BRANCH, MEM, WB, PIPE, DECODE, STATE, INFO, DEBUG
 
 # --- Constants ---
-MEM_SIZE = 1024 * 1024  # Example memory size (1MB)
-NOP_INSTRUCTION = 0x00000013 # Represents `addi x0, x0, 0` (a NOP)
+MEM_SIZE = 1024 * 1024  # Default memory size (1MB), enforced by PagedMemory
 
-# --- Data Structures ---
-Instruction = namedtuple("Instruction", ["inst_word", "mnemonic", "fields"])
-
-# Pipeline Registers (dictionaries to hold state between stages)
-if_id_reg = {'pc': 0, 'inst_word': NOP_INSTRUCTION}
-id_ex_reg = {'pc': 0, 'inst_word': NOP_INSTRUCTION, 'ctrl': {}, 'rs1_val': 0, 'rs2_val': 0, 'imm': 0, 'rd': 0, 'rs1': 0, 'rs2': 0, 'mnemonic': 'nop'}
-ex_mem_reg = {'pc': 0, 'inst_word': NOP_INSTRUCTION, 'ctrl': {}, 'alu_result': 0, 'rs2_val': 0, 'rd': 0, 'branch_target': 0, 'branch_taken': False, 'mnemonic': 'nop'}
-mem_wb_reg = {'pc': 0, 'inst_word': NOP_INSTRUCTION, 'ctrl': {}, 'mem_data': 0, 'alu_result': 0, 'rd': 0, 'mnemonic': 'nop'}
-
-# --- Components ---
-pc = 0
-register_file = RegisterFile() #
-# Simple dictionary-based memory for instructions and data
-memory = {} # Start empty, load program later
+# HazardUnit.forward_group entry of a slot that forwards nothing
+NO_FORWARD = (None, None, None)
 
 # --- Hazard Detection Unit ---
 class HazardUnit:
     def __init__(self):
-        self.stall_if = False
-        self.stall_id = False
-        self.stall_ex = False
+        self.stall_if = False     # hold PC and IF/ID
+        self.stall_id = False     # hold ID/EX
+        self.stall_ex = False     # EX/MEM receives a bubble
         self.flush_if_id = False
         self.flush_id_ex = False
         self.forward_a_ex = 0 # 0: no forward, 1: from EX/MEM.alu_result, 2: from MEM/WB.result
         self.forward_b_ex = 0 # 0: no forward, 1: from EX/MEM.alu_result, 2: from MEM/WB.result
-
-    def detect_and_resolve(self, id_ex, ex_mem, mem_wb):
-        """Detects hazards and sets stall/flush/forward signals."""
+        self.forward_c_ex = 0 # same, for the FMA addend (rs3)
+        # Superscalar: per ID/EX slot, the (A, B, C) operand sources, each None
+        # or (1 or 2 as above, producer slot in that latch group)
+        self.forward_group = []
+        self.stall_cause = None # counter the EX stall is charged to (PerfCounters.stalls)
+        self.stall_pc = 0       # and the instruction that caused it (the load of a load-use stall)
+        self.stall_lasting = False # the EX stall holds until a later cycle's FPU or multiply/divide write-back
+        # Cache miss stalls (cycles remaining); these span cycles, so
+        # detect_and_resolve() leaves them alone
+        self.mem_busy = 0         # D-cache miss: the whole pipeline is frozen
+        self.mem_probed = False   # EX/MEM's access has already been looked up
+        self.fetch_busy = 0       # I-cache miss: fetch inserts bubbles
+        self.fetch_probed = False # the PC being fetched has already been looked up
+
+    def detect_and_resolve(self, id_ex, ex_mem, mem_wb, fpu, muldiv, now):
+        """
+        Detects data hazards for the instruction about to execute (in ID/EX)
+        against the two older instructions in EX/MEM and MEM/WB, and
+        structural hazards on the FPU and multiply/divide units (cycle
+        'now'), and sets the stall/forward signals. Called at the start of
+        the cycle's EX stage.
+        Register numbers are keys, so both register files are covered.
+        """
         self.stall_if = False
         self.stall_id = False
         self.stall_ex = False
@@ -50,443 +74,1571 @@ class HazardUnit:
         self.flush_id_ex = False
         self.forward_a_ex = 0
         self.forward_b_ex = 0
+        self.forward_c_ex = 0
 
-        id_rs1 = id_ex.get('rs1', 0)
-        id_rs2 = id_ex.get('rs2', 0)
-        ex_rd = ex_mem.get('rd', 0)
-        ex_ctrl = ex_mem.get('ctrl', {})
+        id_rs1 = id_ex.rs1
+        id_rs2 = id_ex.rs2
+        id_rs3 = id_ex.rs3
+        ex_rd = ex_mem.rd
+        ex_ctrl = ex_mem.ctrl
 
         # --- 1. EX Hazard (Load-Use Hazard) ---
-        if ex_ctrl.get('memRead', 0) and ex_rd != 0 and (ex_rd == id_rs1 or ex_rd == id_rs2):
-            print(f"Hazard: Load-Use detected! Stalling IF/ID/EX. (EX.rd={ex_rd}, ID.rs1={id_rs1}, ID.rs2={id_rs2})")
-            self.stall_if = True
-            self.stall_id = True
-            self.stall_ex = True
-            self.flush_id_ex = True # Insert NOP into EX
+        # The load is in MEM this cycle, so its data can't reach EX in time
+        if ex_ctrl.memRead and ex_rd != 0 and (ex_rd == id_rs1 or ex_rd == id_rs2 or ex_rd == id_rs3):
+            if tracer.mask & HAZARD:
+                tracer.emit(HAZARD, 'load_use', rd=ex_rd, rs1=id_rs1, rs2=id_rs2)
+            self.stall_ex_stage('load_use', ex_mem.pc)
             return # Stall overrides forwarding for load-use
 
-        # --- 2. Data Forwarding ---
-        mem_rd = mem_wb.get('rd', 0)
-        mem_ctrl = mem_wb.get('ctrl', {})
-        wb_reg_write = mem_ctrl.get('regWrite', 0)
-
-        ex_reg_write = ex_ctrl.get('regWrite', 0)
+        # --- 2. FPU hazards ---
+        unit = id_ex.ctrl.fpUnit
+        if unit is not None:
+            # The unit is busy (unpipelined) or the result write slot is taken
+            reason = fpu.blocked(unit, now)
+            if reason is not None:
+                if tracer.mask & HAZARD:
+                    tracer.emit(HAZARD, 'fpu_' + reason, unit=unit, mnemonic=id_ex.mnemonic)
+                self.stall_ex_stage('structural', id_ex.pc, reason == 'busy' and fpu.in_flight[0].done > now)
+                return
+        elif fpu.in_flight and id_ex.ctrl.aluOp == 'csr' and (id_ex.imm & 0xFFF) in FP_FIELDS:
+            # fflags/frm/fcsr accesses wait for the FP ops in flight to accrue their flags
+            if tracer.mask & HAZARD:
+                tracer.emit(HAZARD, 'fpu_drain', mnemonic=id_ex.mnemonic)
+            self.stall_ex_stage('fpu', id_ex.pc, fpu.in_flight[0].done > now)
+            return
+
+        # The multiplier or divider (or its write port) is busy
+        unit = id_ex.ctrl.mulDivUnit
+        if unit is not None:
+            reason = muldiv.blocked(unit, now)
+            if reason is not None:
+                if tracer.mask & HAZARD:
+                    tracer.emit(HAZARD, 'muldiv_' + reason, unit=unit, mnemonic=id_ex.mnemonic)
+                self.stall_ex_stage('structural', id_ex.pc, reason == 'busy' and muldiv.in_flight[0].done > now)
+                return
+
+        # --- 3. Data Forwarding ---
+        mem_rd = mem_wb.rd
+        wb_reg_write = mem_wb.ctrl.regWrite
+
+        ex_reg_write = ex_ctrl.regWrite
 
         # Forward from EX/MEM stage
         if ex_reg_write and ex_rd != 0:
             if ex_rd == id_rs1:
                 self.forward_a_ex = 1
-                print(f"Hazard: Forwarding A from EX/MEM (EX.rd={ex_rd} == ID.rs1)")
+                if tracer.mask & FORWARD:
+                    tracer.emit(FORWARD, 'select', operand='A', source='EX/MEM', rd=ex_rd)
             if ex_rd == id_rs2:
                 self.forward_b_ex = 1
-                print(f"Hazard: Forwarding B from EX/MEM (EX.rd={ex_rd} == ID.rs2)")
-
-        # Forward from MEM/WB stage (overrides EX/MEM if needed for same register)
+                if tracer.mask & FORWARD:
+                    tracer.emit(FORWARD, 'select', operand='B', source='EX/MEM', rd=ex_rd)
+            if ex_rd == id_rs3:
+                self.forward_c_ex = 1
+                if tracer.mask & FORWARD:
+                    tracer.emit(FORWARD, 'select', operand='C', source='EX/MEM', rd=ex_rd)
+
+        # Forward from MEM/WB stage (EX/MEM is younger and wins for the same register)
         if wb_reg_write and mem_rd != 0:
             # Check if EX stage didn't already forward for this register
             if not (ex_reg_write and ex_rd != 0 and ex_rd == id_rs1):
                  if mem_rd == id_rs1:
                     self.forward_a_ex = 2
-                    print(f"Hazard: Forwarding A from MEM/WB (MEM.rd={mem_rd} == ID.rs1)")
+                    if tracer.mask & FORWARD:
+                        tracer.emit(FORWARD, 'select', operand='A', source='MEM/WB', rd=mem_rd)
             if not (ex_reg_write and ex_rd != 0 and ex_rd == id_rs2):
                 if mem_rd == id_rs2:
                     self.forward_b_ex = 2
-                    print(f"Hazard: Forwarding B from MEM/WB (MEM.rd={mem_rd} == ID.rs2)")
+                    if tracer.mask & FORWARD:
+                        tracer.emit(FORWARD, 'select', operand='B', source='MEM/WB', rd=mem_rd)
+            if not (ex_reg_write and ex_rd != 0 and ex_rd == id_rs3):
+                if mem_rd == id_rs3:
+                    self.forward_c_ex = 2
+                    if tracer.mask & FORWARD:
+                        tracer.emit(FORWARD, 'select', operand='C', source='MEM/WB', rd=mem_rd)
+
+    def detect_and_resolve_group(self, id_ex, ex_mem, mem_wb, fpu, muldiv, now):
+        """
+        detect_and_resolve() for an N-wide pipeline: the issue group in
+        'id_ex' (a list of ID/EX latches, oldest first) against every
+        producer in the EX/MEM and MEM/WB groups. A hazard on any slot
+        stalls the whole group. Forwarding picks the youngest producer of
+        each register, and sets forward_group instead of forward_*_ex.
+        """
+        self.stall_if = False
+        self.stall_id = False
+        self.stall_ex = False
+        self.flush_if_id = False
+        self.flush_id_ex = False
 
-        # --- 3. Control Hazards (Branches/Jumps in EX stage) ---
-        # Simple approach: Assume branch not taken, flush if wrong.
-        if ex_mem.get('branch_taken'):
-            print(f"Hazard: Branch/Jump Taken in EX stage. Flushing IF/ID and ID/EX.")
+        # --- 1. EX Hazard (Load-Use Hazard) ---
+        for producer in ex_mem:
+            ex_rd = producer.rd
+            if producer.ctrl.memRead and ex_rd != 0:
+                for consumer in id_ex:
+                    if ex_rd == consumer.rs1 or ex_rd == consumer.rs2 or ex_rd == consumer.rs3:
+                        if tracer.mask & HAZARD:
+                            tracer.emit(HAZARD, 'load_use', rd=ex_rd, rs1=consumer.rs1, rs2=consumer.rs2)
+                        self.stall_ex_stage('load_use', producer.pc)
+                        return
+
+        # --- 2. FPU and multiply/divide hazards (the group holds at most one op for each) ---
+        # A stall lasts until a later write-back (see stall_ex_stage()) only if
+        # no older op of the group could be blocked instead (by a write port
+        # conflict) meanwhile
+        unit_op = False
+        for consumer in id_ex:
+            unit = consumer.ctrl.mulDivUnit
+            if unit is not None:
+                reason = muldiv.blocked(unit, now)
+                if reason is not None:
+                    if tracer.mask & HAZARD:
+                        tracer.emit(HAZARD, 'muldiv_' + reason, unit=unit, mnemonic=consumer.mnemonic)
+                    self.stall_ex_stage('structural', consumer.pc,
+                                        reason == 'busy' and not unit_op and muldiv.in_flight[0].done > now)
+                    return
+                unit_op = True
+                continue
+            unit = consumer.ctrl.fpUnit
+            if unit is not None:
+                reason = fpu.blocked(unit, now)
+                if reason is not None:
+                    if tracer.mask & HAZARD:
+                        tracer.emit(HAZARD, 'fpu_' + reason, unit=unit, mnemonic=consumer.mnemonic)
+                    self.stall_ex_stage('structural', consumer.pc,
+                                        reason == 'busy' and not unit_op and fpu.in_flight[0].done > now)
+                    return
+                unit_op = True
+            elif fpu.in_flight and consumer.ctrl.aluOp == 'csr' and (consumer.imm & 0xFFF) in FP_FIELDS:
+                if tracer.mask & HAZARD:
+                    tracer.emit(HAZARD, 'fpu_drain', mnemonic=consumer.mnemonic)
+                self.stall_ex_stage('fpu', consumer.pc, not unit_op and fpu.in_flight[0].done > now)
+                return
+
+        # --- 3. Data Forwarding ---
+        # Register key -> youngest producer; EX/MEM is younger than MEM/WB, and
+        # within a group a later slot is younger
+        producers = {}
+        for slot, producer in enumerate(mem_wb):
+            if producer.ctrl.regWrite and producer.rd != 0:
+                producers[producer.rd] = (2, slot)
+        for slot, producer in enumerate(ex_mem):
+            if producer.ctrl.regWrite and producer.rd != 0:
+                producers[producer.rd] = (1, slot)
+        forward_group = self.forward_group
+        forward_group.clear()
+        for consumer in id_ex:
+            if not producers or consumer.mnemonic == 'nop':
+                forward_group.append(NO_FORWARD)
+                continue
+            sources = (producers.get(consumer.rs1), producers.get(consumer.rs2), producers.get(consumer.rs3))
+            forward_group.append(sources)
+            if tracer.mask & FORWARD:
+                for operand, key, source in zip('ABC', (consumer.rs1, consumer.rs2, consumer.rs3), sources):
+                    if source is not None:
+                        tracer.emit(FORWARD, 'select', operand=operand, source='EX/MEM' if source[0] == 1 else 'MEM/WB',
+                                    rd=key, slot=source[1])
+
+    def stall_ex_stage(self, cause, pc, lasting=False):
+        """
+        Hold ID/EX and IF/ID and send a bubble into EX/MEM this cycle, because
+        of the instruction at 'pc'. 'lasting': nothing but an FPU or
+        multiply/divide write-back can end the stall, and there is none this
+        cycle (write-backs follow hazard detection).
+        """
+        self.stall_if = True
+        self.stall_id = True
+        self.stall_ex = True # Insert NOP into EX/MEM
+        self.stall_cause = cause
+        self.stall_pc = pc
+        self.stall_lasting = lasting
+
+    def resolve_control(self, ex_mem):
+        """
+        Control hazards: branches and jumps resolve in EX, while fetch follows
+        the branch predictor. When the instruction just executed was
+        mispredicted, the two younger instructions (in IF/ID and being
+        fetched) are flushed.
+        """
+        if ex_mem.mispredicted:
+            if tracer.mask & HAZARD:
+                tracer.emit(HAZARD, 'control_flush')
             self.flush_if_id = True
             self.flush_id_ex = True
 
-hazard_unit = HazardUnit()
-
-# --- Pipeline Stages ---
-
-def fetch(current_pc):
-    """Fetch instruction from memory based on PC."""
-    if current_pc not in memory:
-        # print(f"Warning: PC {current_pc:#x} not in instruction memory. Fetching NOP.")
-        inst_word = NOP_INSTRUCTION
-    else:
-        inst_word = memory[current_pc]
-    return {'pc': current_pc, 'inst_word': inst_word}
-
-def decode(if_id_data):
-    """Decode instruction, read registers."""
-    inst_word = if_id_data['inst_word']
-    pc = if_id_data['pc']
 
-    if inst_word == NOP_INSTRUCTION:
-         return {'pc': pc, 'inst_word': inst_word, 'ctrl': get_control_signals('nop'), 'rs1_val': 0, 'rs2_val': 0, 'imm': 0, 'rd': 0, 'rs1': 0, 'rs2': 0, 'mnemonic': 'nop'} #
+# --- Simulator ---
+# All simulator state lives on a Simulator instance, so several can run in
+# one process (or be fanned out across processes, see sweep.py).
+
+# Outcome of Simulator.run(); 'halted' is False when max_cycles cut the run short
+SimResult = namedtuple("SimResult", ["cycles", "retired", "cpi", "load_use_stalls", "control_flushes",
+                                     "flush_cycles", "predictor_accuracy", "icache_misses", "dcache_misses",
+                                     "cache_stall_cycles", "halted"])
+
+# Cycles lost per misprediction: the two younger instructions are squashed
+FLUSH_PENALTY = 2
+
+# Changed doublewords listed by report() at most
+REPORT_MEMORY_LINES = 64
+
+# Core models: the in-order pipeline (single-issue or N-wide) or ooo.OutOfOrderCore
+CORES = ('inorder', 'ooo')
+
+
+class Simulator:
+    def __init__(self, mem_size=MEM_SIZE, predictor='none', btb_entries=0, ras_depth=0,
+                 icache=None, dcache=None, miss_penalty=10, fpu=None, width=1, ports=None, core='inorder',
+                 ooo=None, muldiv=None):
+        # --- Pipeline Registers ---
+        # Two of each latch: stages read the '_reg' one and fill the '_next' one in
+        # place; the pair is swapped at the end of the cycle (see pipeline.py).
+        self.if_id_reg, self.if_id_next = IF_ID(), IF_ID()
+        self.id_ex_reg, self.id_ex_next = ID_EX(), ID_EX()
+        self.ex_mem_reg, self.ex_mem_next = EX_MEM(), EX_MEM()
+        self.mem_wb_reg, self.mem_wb_next = MEM_WB(), MEM_WB()
+        # Issue width; above 1, run() clocks the N-wide pipeline (see superscalar.py)
+        # on latch groups: lists of 'width' latches, oldest instruction first,
+        # fed by a fetch buffer of up to 'width' IF/ID entries
+        self.width = width
+        self.ports = make_ports(ports, width)
+        self.fetch_buffer = deque()
+        self.id_ex_group, self.id_ex_group_next = self.new_group(ID_EX), self.new_group(ID_EX)
+        self.ex_mem_group, self.ex_mem_group_next = self.new_group(EX_MEM), self.new_group(EX_MEM)
+        self.mem_wb_group, self.mem_wb_group_next = self.new_group(MEM_WB), self.new_group(MEM_WB)
+
+        # --- Components ---
+        self.pc = 0
+        self.register_file = RegisterFile() #
+        # Byte-addressable paged memory for instructions and data
+        self.memory = PagedMemory(mem_size) # Start empty, load program later
+        # Symbol table of the loaded executable (name -> (value, size)), for reporting
+        self.symbols = {}
+        self.hazard_unit = HazardUnit()
+        # Fetch-stage branch prediction ('none' always fetches PC+4)
+        self.predictor = make_predictor(predictor, btb_entries, ras_depth)
+        # L1 caches (timing only, see cache.py); None = every access hits in one cycle
+        self.icache = make_cache('icache', icache, miss_penalty)
+        self.dcache = make_cache('dcache', dcache, miss_penalty)
+        # Multi-cycle FP functional units (see fpu.py); 'fpu' is a spec overriding the default latencies
+        self.fpu = make_fpu(fpu)
+        # Multiplier and divider (see muldiv.py); 'muldiv' is a spec overriding the default latencies
+        self.muldiv = make_muldiv(muldiv)
+
+        # --- Statistics (accumulate across run() calls, see perf_counters.py) ---
+        self.counters = PerfCounters()
+        # cycle/time/instret CSRs read the live counters
+        self.csr_file = CsrFile(self.register_file, lambda: self.counters.cycles, lambda: self.counters.instret)
+        # Change-tracking epochs since the program was loaded, for the end-of-run dump
+        self.reg_epoch = None
+        self.mem_epoch = None
+        # core='ooo' runs the out-of-order core instead of the pipeline (see
+        # ooo.py); 'ooo' is its spec, and it fetches, dispatches and commits 'width' per cycle
+        if core not in CORES:
+            raise ValueError(f"unknown core '{core}' (expected one of {', '.join(CORES)})")
+        self.core = core
+        self.ooo = OutOfOrderCore(self, ooo) if core == 'ooo' else None
+        # Guest-program profiler (see guest_profile.py), None unless enable_guest_profile() attached one
+        self.profile = None
+        # PC of the unit op the last decode stall waits for, to charge the stall to
+        self.wait_pc = 0
+        # Count the cycles in which the pipeline only waits (for a cache fill
+        # or a unit write-back) in one step instead of clocking them one by
+        # one (see quiet_cycles()); the counters come out the same. Off while
+        # tracing, which sees every cycle.
+        self.skip_idle = True
+
+    def new_group(self, latch_class):
+        return [latch_class() for _ in range(self.width)] if self.width > 1 else []
+
+    @property
+    def cycles(self):
+        return self.counters.cycles
+
+    @property
+    def instructions_retired(self):
+        return self.counters.instret
+
+    # --- Pipeline Stages ---
+    # Each stage reads its input latch and overwrites its output latch in place.
+
+    def fetch(self, current_pc, out):
+        """Fetch instruction from memory based on PC."""
+        memory = self.memory
+        out.pc = current_pc
+        # Running off the end of memory fetches NOPs
+        out.inst_word = memory.load(current_pc, 4) if current_pc + 4 <= memory.size else NOP_INSTRUCTION
+        out.predicted_pc = self.predictor.predict(current_pc, out.inst_word)
+
+    def decode(self, if_id, out):
+        """
+        Decode instruction, read registers. Returns None, or the stall
+        cause ('fpu' or 'mext', and a bubble) when the instruction must wait
+        in IF/ID for the result of a multi-cycle unit.
+        """
+        inst_word = if_id.inst_word
+
+        if inst_word == NOP_INSTRUCTION:
+            out.bubble()
+            return None
+
+        inst = decodeWord(inst_word) # memoized, shared record
+
+        if inst.mnemonic == 'UNKNOWN':
+            if tracer.mask & DECODE:
+                tracer.emit(DECODE, 'unknown', pc=if_id.pc, inst_word=inst_word)
+            out.bubble()
+            return None
+
+        ctrl = inst.ctrl
+        rd, rs1, rs2, rs3 = inst.keys
+        # A multiply/divide in flight still has to write a source (RAW) or rd (WAW)
+        pending = self.muldiv.pending
+        if pending:
+            op = pending.get(rs1) or pending.get(rs2) or pending.get(rd)
+            if op:
+                if tracer.mask & HAZARD:
+                    tracer.emit(HAZARD, 'mext_pending', pc=if_id.pc, mnemonic=inst.mnemonic)
+                self.wait_pc = op.pc
+                out.bubble()
+                return 'mext'
+        if ctrl.fpu:
+            # An FPU op in flight still has to write a source (RAW) or rd
+            # (WAW: writes stay in order); its result is not forwarded
+            pending = self.fpu.pending
+            if pending and (rs1 in pending or rs2 in pending or rs3 in pending or rd in pending):
+                if tracer.mask & HAZARD:
+                    tracer.emit(HAZARD, 'fpu_pending', pc=if_id.pc, mnemonic=inst.mnemonic)
+                self.wait_pc = (pending.get(rs1) or pending.get(rs2) or pending.get(rs3) or pending[rd]).pc
+                out.bubble()
+                return 'fpu'
+            value = self.register_file.value
+            out.rs1_val = value(rs1)
+            out.rs2_val = value(rs2)
+            out.rs3_val = value(rs3)
+        else:
+            regs = self.register_file.regs
+            out.rs1_val = regs[rs1]
+            out.rs2_val = regs[rs2]
+        out.pc = if_id.pc
+        out.inst_word = inst_word
+        out.ctrl = ctrl
+        out.imm = inst.imm
+        out.rd = rd
+        out.rs1 = rs1
+        out.rs2 = rs2
+        out.rs3 = rs3
+        out.mnemonic = inst.mnemonic
+        out.predicted_pc = if_id.predicted_pc
+        return None
+
+    def execute(self, id_ex, forward_a, forward_b, forward_c, ex_mem_fwd, mem_wb_fwd, out):
+        """
+        Execute instruction: ALU operation, branch target calculation, or
+        an FP operation (issued to its FPU unit if multi-cycle); multiplies
+        and divides are issued to their unit.
+        'ex_mem_fwd' / 'mem_wb_fwd' are the values available for forwarding from
+        the EX/MEM ALU result and the MEM/WB writeback result.
+        """
+        mnemonic = id_ex.mnemonic
+
+        if mnemonic == 'nop':
+            out.bubble()
+            return
+
+        ctrl = id_ex.ctrl
+        pc = id_ex.pc
+        imm = id_ex.imm
+
+        # --- Apply Forwarding ---
+        op1 = id_ex.rs1_val
+        op2_reg = id_ex.rs2_val
+
+        if forward_a == 1: # Forward from EX/MEM ALU result
+            op1 = ex_mem_fwd
+            if tracer.debug & FORWARD:
+                tracer.emit(FORWARD, 'value', operand='A', source='EX/MEM', value=op1)
+        elif forward_a == 2: # Forward from MEM/WB result
+            op1 = mem_wb_fwd
+            if tracer.debug & FORWARD:
+                tracer.emit(FORWARD, 'value', operand='A', source='MEM/WB', value=op1)
+
+        if forward_b == 1: # Forward from EX/MEM ALU result
+            op2_reg = ex_mem_fwd
+            if tracer.debug & FORWARD:
+                tracer.emit(FORWARD, 'value', operand='B', source='EX/MEM', value=op2_reg)
+        elif forward_b == 2: # Forward from MEM/WB result
+            op2_reg = mem_wb_fwd
+            if tracer.debug & FORWARD:
+                tracer.emit(FORWARD, 'value', operand='B', source='MEM/WB', value=op2_reg)
+
+        alu_op2 = imm if ctrl.aluSrc else op2_reg #
+
+        alu_result = ctrl.aluFn(op1, alu_op2) # single dispatch through the control record
+
+        # Branch logic: for branches the ALU op evaluates the condition (1 = taken)
+        branch_taken = False
+        branch_target = 0
+        mispredicted = False
+        if ctrl.branch: #
+            branch_taken = alu_result == 1
+            if branch_taken:
+                branch_target = pc + imm
+                if tracer.mask & BRANCH:
+                    tracer.emit(BRANCH, 'taken', pc=pc, mnemonic=mnemonic, target=branch_target)
+            else:
+                 if tracer.mask & BRANCH:
+                     tracer.emit(BRANCH, 'not_taken', pc=pc, mnemonic=mnemonic)
 
-    try:
-        fields = fieldsGen(inst_word) #
-        mnemonic = decodeInstruction(inst_word) #
-    except Exception as e:
-        print(f"Decode Error: Failed on word {inst_word:#010x}. {e}")
-        mnemonic = "unknown"
-        fields = {}
-
-    if mnemonic == 'UNKNOWN':
-        print(f"Warning: Unknown instruction {inst_word:#010x} at PC {pc:#x}. Treating as NOP.")
-        mnemonic = 'nop'
-        ctrl = get_control_signals('nop') #
-        rs1, rs2, rd = 0, 0, 0
-        imm = 0
-    else:
-        ctrl = get_control_signals(mnemonic) #
-        rs1 = fields.get('rs1', 0)
-        rs2 = fields.get('rs2', 0)
-        rd = fields.get('rd', 0)
-
-        opc = fields.get('opcode', 0)
-        imm = 0
-        if ctrl['aluSrc'] == 1:
-             # Determine immediate type based on mnemonic/opcode
-             if mnemonic.endswith('i') or mnemonic in ['lw', 'ld', 'jalr', 'fld']: # I-type loads, ALU imm, jalr, fp loads
-                  imm = imm_i(inst_word) #
-             elif mnemonic in ['sw', 'sd', 'fsd']: # S-type stores
-                  imm = imm_s(inst_word) #
-             elif mnemonic.startswith('b'): # B-type branches
-                  imm = imm_b(inst_word) #
-             elif mnemonic in ['lui', 'auipc']: # U-type
-                  imm = imm_u(inst_word) #
-             elif mnemonic == 'jal': # J-type
-                  imm = imm_j(inst_word) #
-
-    rs1_val, rs2_val = register_file.read(rs1, rs2) #
-
-    return {'pc': pc, 'inst_word': inst_word, 'ctrl': ctrl, 'rs1_val': rs1_val, 'rs2_val': rs2_val, 'imm': imm, 'rd': rd, 'rs1': rs1, 'rs2': rs2, 'mnemonic': mnemonic}
-
-
-def execute(id_ex_data, forward_a, forward_b, ex_mem_fwd, mem_wb_fwd):
-    """Execute instruction: ALU operation, branch target calculation."""
-    ctrl = id_ex_data['ctrl']
-    pc = id_ex_data['pc']
-    inst_word = id_ex_data['inst_word']
-    rd = id_ex_data['rd']
-    imm = id_ex_data['imm']
-    rs1_val_orig = id_ex_data['rs1_val']
-    rs2_val_orig = id_ex_data['rs2_val']
-    mnemonic = id_ex_data['mnemonic']
-
-    if mnemonic == 'nop':
-         return {'pc': pc, 'inst_word': inst_word, 'ctrl': ctrl, 'alu_result': 0, 'rs2_val': 0, 'rd': 0, 'branch_target': 0, 'branch_taken': False, 'mnemonic': 'nop'}
-
-    # --- Apply Forwarding ---
-    op1 = rs1_val_orig
-    op2_reg = rs2_val_orig
-
-    if forward_a == 1: # Forward from EX/MEM ALU result
-        op1 = ex_mem_fwd['alu_result']
-        print(f"EX: Forwarded A from EX/MEM result: {op1:#x}")
-    elif forward_a == 2: # Forward from MEM/WB result
-        op1 = mem_wb_fwd['result'] # 'result' holds writeback data from WB stage
-        print(f"EX: Forwarded A from MEM/WB result: {op1:#x}")
-
-    if forward_b == 1: # Forward from EX/MEM ALU result
-        op2_reg = ex_mem_fwd['alu_result']
-        print(f"EX: Forwarded B from EX/MEM result: {op2_reg:#x}")
-    elif forward_b == 2: # Forward from MEM/WB result
-        op2_reg = mem_wb_fwd['result'] # 'result' holds writeback data from WB stage
-        print(f"EX: Forwarded B from MEM/WB result: {op2_reg:#x}")
-
-    alu_op2 = imm if ctrl['aluSrc'] else op2_reg #
-
-    alu_result = alu(op1, alu_op2, ctrl['aluOp']) #
-
-    # Branch logic
-    branch_taken = False
-    branch_target = 0
-    if ctrl['branch']: #
-        alu_op = ctrl['aluOp'] #
-        # Use forwarded operands for comparison
-        op1_comp = op1
-        op2_comp = op2_reg
-
-        # RISC-V branch comparisons
-        zero = (op1_comp == op2_comp)
-        less_than = (op1_comp < op2_comp) # Signed comparison
-        # Need proper 64-bit unsigned comparison
-        mask64 = (1 << 64) - 1
-        less_than_u = ((op1_comp & mask64) < (op2_comp & mask64)) # Unsigned comparison
-
-        if alu_op == 'beq' and zero: branch_taken = True
-        elif alu_op == 'bne' and not zero: branch_taken = True
-        elif alu_op == 'blt' and less_than: branch_taken = True
-        elif alu_op == 'bge' and not less_than: branch_taken = True
-        elif alu_op == 'bltu' and less_than_u: branch_taken = True
-        elif alu_op == 'bgeu' and not less_than_u: branch_taken = True
-
-        if branch_taken:
+        # Handle Jumps
+        elif mnemonic == 'jal': #
+            branch_taken = True # Treat JAL as taken branch for PC update
             branch_target = pc + imm
-            print(f"EX: Branch {mnemonic} Taken. Target: {branch_target:#x}")
-        else:
-             print(f"EX: Branch {mnemonic} Not Taken.")
-
-    # Handle Jumps
-    is_jump = False
-    if mnemonic == 'jal': #
-        branch_taken = True # Treat JAL as taken branch for PC update
-        branch_target = pc + imm
-        alu_result = pc + 4 # JAL saves PC+4 to rd
-        ctrl['regWrite'] = 1 # Ensure writeback
-        print(f"EX: JAL jump. Target: {branch_target:#x}, Save Addr: {alu_result:#x}")
-        is_jump = True
-    elif mnemonic == 'jalr': #
-        branch_taken = True
-        branch_target = (op1 + imm) & ~1 # Target = (rs1+imm) & ~1
-        alu_result = pc + 4 # JALR saves PC+4 to rd
-        ctrl['regWrite'] = 1 # Ensure writeback
-        print(f"EX: JALR jump via x{id_ex_data['rs1']}. Target: {branch_target:#x}, Save Addr: {alu_result:#x}")
-        is_jump = True
-
-    return {'pc': pc, 'inst_word': inst_word, 'ctrl': ctrl, 'alu_result': alu_result, 'rs2_val': op2_reg, 'rd': rd, 'branch_target': branch_target, 'branch_taken': branch_taken or is_jump, 'mnemonic': mnemonic}
-
-
-def memory_access(ex_mem_data, data_memory):
-    """Memory access stage: Load or Store data."""
-    ctrl = ex_mem_data['ctrl']
-    alu_result = ex_mem_data['alu_result'] # Address for load/store
-    rs2_val = ex_mem_data['rs2_val'] # Data to store
-    rd = ex_mem_data['rd']
-    pc = ex_mem_data['pc']
-    inst_word = ex_mem_data['inst_word']
-    mnemonic = ex_mem_data['mnemonic']
-
-    if mnemonic == 'nop':
-         return {'pc': pc, 'inst_word': inst_word, 'ctrl': ctrl, 'mem_data': 0, 'alu_result': 0, 'rd': 0, 'mnemonic': 'nop'}
-
-    mem_data = 0
-
-    if ctrl['memRead']: #
-        # Assuming LD for 64-bit (or LW based on your control unit)
-        address = alu_result
-        if address in data_memory:
-            mem_data = data_memory[address]
-            print(f"MEM: Load {mnemonic} from Addr {address:#x}. Data: {mem_data:#x}")
-        else:
-            mem_data = 0
-            print(f"MEM: Warning - Load {mnemonic} from uninitialized Addr {address:#x}. Data: 0x0")
-
-    elif ctrl['memWrite']: #
-        # Assuming SD for 64-bit (or SW based on control unit)
-        address = alu_result
-        data_memory[address] = rs2_val
-        print(f"MEM: Store {mnemonic} to Addr {address:#x}. Data: {rs2_val:#x}")
-
-    # Pass necessary data to WB stage
-    return {'pc': pc, 'inst_word': inst_word, 'ctrl': ctrl, 'mem_data': mem_data, 'alu_result': alu_result, 'rd': rd, 'mnemonic': mnemonic}
-
-def write_back(mem_wb_data, reg_file):
-    """Write back result to register file."""
-    ctrl = mem_wb_data['ctrl']
-    rd = mem_wb_data['rd']
-    mem_data = mem_wb_data['mem_data']
-    alu_result = mem_wb_data['alu_result']
-    mnemonic = mem_wb_data['mnemonic']
-
-    if mnemonic == 'nop':
-        return # NOP does nothing
-
-    result = 0
-    if ctrl['regWrite']: #
+            alu_result = pc + 4 # JAL saves PC+4 to rd (control unit sets regWrite)
+            if tracer.mask & BRANCH:
+                tracer.emit(BRANCH, 'jal', pc=pc, target=branch_target, link=alu_result)
+        elif mnemonic == 'jalr': #
+            branch_taken = True
+            branch_target = (op1 + imm) & ~1 # Target = (rs1+imm) & ~1
+            alu_result = pc + 4 # JALR saves PC+4 to rd (control unit sets regWrite)
+            if tracer.mask & BRANCH:
+                tracer.emit(BRANCH, 'jalr', pc=pc, rs1=id_ex.rs1, target=branch_target, link=alu_result)
+
+        # Zicsr: read-modify-write of the CSR happens here; rd gets the old value
+        elif mnemonic in CSR_OPS:
+            # The 'i' forms take the rs1 field itself, which is no register key
+            alu_result = self.csr_file.execute(mnemonic, imm & 0xFFF, (id_ex.inst_word >> 15) & 0x1F, op1)
+
+        # M-extension: like a multi-cycle FP op, the result leaves the pipeline
+        # for the multiplier or divider, see muldiv_write_back()
+        elif ctrl.mulDivUnit is not None:
+            muldiv = self.muldiv
+            unit = ctrl.mulDivUnit
+            op = muldiv.issue(unit, self.counters.cycles, id_ex.rd, alu_result, 0, pc, mnemonic,
+                              muldiv.latency(unit, mnemonic, op1, op2_reg))
+            if tracer.debug & PIPE:
+                tracer.emit(PIPE, 'muldiv_issue', pc=pc, mnemonic=mnemonic, unit=unit, done=op.done)
+            out.bubble()
+            return
+
+        # D-extension arithmetic, moves and conversions (fld/fsd use the ALU for the address)
+        elif ctrl.fpuOp is not None:
+            op3 = id_ex.rs3_val
+            if forward_c == 1:
+                op3 = ex_mem_fwd
+            elif forward_c == 2:
+                op3 = mem_wb_fwd
+            register_file = self.register_file
+            alu_result, fflags = ctrl.fpuFn(op1, op2_reg, op3, rounding_mode(id_ex.inst_word, register_file.fcsr))
+            if ctrl.fpUnit is not None:
+                # Multi-cycle: the op leaves the pipeline for its unit and
+                # writes back (and retires) from there, see fpu_write_back()
+                self.fpu.issue(ctrl.fpUnit, self.counters.cycles, id_ex.rd, alu_result, fflags, pc, mnemonic)
+                if tracer.debug & PIPE:
+                    tracer.emit(PIPE, 'fpu_issue', pc=pc, mnemonic=mnemonic, unit=ctrl.fpUnit)
+                out.bubble()
+                return
+            if fflags:
+                register_file.set_fcsr(register_file.fcsr | fflags)
+
+        # Check fetch's guess; on a miss, branch_target becomes the correct next PC
+        if ctrl.branch or mnemonic == 'jal' or mnemonic == 'jalr':
+            next_pc = branch_target if branch_taken else pc + 4
+            mispredicted = self.predictor.resolve(pc, id_ex, branch_taken, next_pc, id_ex.predicted_pc)
+            if mispredicted:
+                branch_target = next_pc
+                if tracer.mask & BRANCH:
+                    tracer.emit(BRANCH, 'mispredict', pc=pc, predicted=id_ex.predicted_pc, target=next_pc)
+
+        out.pc = pc
+        out.inst_word = id_ex.inst_word
+        out.ctrl = ctrl
+        out.alu_result = alu_result
+        out.rs2_val = op2_reg
+        out.rd = id_ex.rd
+        out.branch_target = branch_target
+        out.branch_taken = branch_taken
+        out.mispredicted = mispredicted
+        out.mnemonic = mnemonic
+
+    def memory_access(self, ex_mem, out):
+        """Memory access stage: Load or Store data."""
+        mnemonic = ex_mem.mnemonic
+
+        if mnemonic == 'nop':
+            out.bubble()
+            return
+
+        ctrl = ex_mem.ctrl
+        pc = ex_mem.pc
+        address = ex_mem.alu_result # Address for load/store
+        mem_data = 0
+
+        if ctrl.memRead: #
+            # Width and sign extension come from the control record (lb .. ld, fld)
+            try:
+                mem_data = self.memory.load(address, ctrl.memWidth, ctrl.memSigned)
+            except MemoryFault as e:
+                e.pc = pc
+                raise
+            if tracer.mask & MEM:
+                tracer.emit(MEM, 'load', pc=pc, mnemonic=mnemonic, addr=address, data=mem_data)
+
+        elif ctrl.memWrite: #
+            rs2_val = ex_mem.rs2_val # Data to store
+            try:
+                self.memory.store(address, ctrl.memWidth, rs2_val)
+            except MemoryFault as e:
+                e.pc = pc
+                raise
+            if tracer.mask & MEM:
+                tracer.emit(MEM, 'store', pc=pc, mnemonic=mnemonic, addr=address, data=rs2_val)
+
+        # Pass necessary data to WB stage
+        out.pc = pc
+        out.inst_word = ex_mem.inst_word
+        out.ctrl = ctrl
+        out.mem_data = mem_data
+        out.alu_result = address
+        out.rd = ex_mem.rd
+        out.mnemonic = mnemonic
+
+    def write_back(self, mem_wb):
+        """
+        Write back result to register file.
+        Returns the value written (0 if none) for MEM/WB forwarding.
+        """
+        ctrl = mem_wb.ctrl
+        if not ctrl.regWrite: # includes NOPs
+            return 0
+
+        rd = mem_wb.rd
         if rd == 0:
-             print(f"WB: Attempted write to x0 ignored for {mnemonic}.")
-             return {'result': 0} # Return something for WB fwd consistency
-
-        result = mem_data if ctrl['memToReg'] else alu_result #
-
-        # Assuming integer registers based on RV64IMD focus
-        # If D extension is active, check ctrl['fpu'] etc. for fpr write
-        reg_file.write(rd, result) #
-        print(f"WB: Write x{rd} <- {result:#x} (from {mnemonic})")
-    else:
-        pass
+            if tracer.debug & WB:
+                tracer.emit(WB, 'x0_ignored', mnemonic=mem_wb.mnemonic)
+            return 0
 
-    # Return the final result written for potential forwarding
-    return {'result': result}
+        result = mem_wb.mem_data if ctrl.memToReg else mem_wb.alu_result #
 
-
-# --- Simulation ---
-
-def load_program(program_hex):
-    """Loads hex instructions into memory."""
-    global memory
-    address = 0
-    for inst_hex in program_hex:
-        try:
-            inst_word = int(inst_hex, 16)
-            memory[address] = inst_word
+        # rd is a register key: f-registers (fld, single-cycle FP ops) are offset by FREG_BASE
+        if rd < FREG_BASE:
+            self.register_file.write(rd, result) #
+            if tracer.mask & WB:
+                tracer.emit(WB, 'write', rd=rd, value=result, mnemonic=mem_wb.mnemonic)
+        else:
+            self.register_file.fwrite(rd - FREG_BASE, result)
+            if tracer.mask & WB:
+                tracer.emit(WB, 'fwrite', frd=rd - FREG_BASE, value=result, mnemonic=mem_wb.mnemonic)
+
+        return result
+
+    def fpu_write_back(self, now):
+        """
+        Write back the FPU op finishing in cycle 'now', if any, through the
+        FPU's own write port. The op retires here.
+        """
+        op = self.fpu.complete(now)
+        if op is None:
+            return
+        register_file = self.register_file
+        register_file.fwrite(op.key - FREG_BASE, op.bits)
+        if op.fflags:
+            register_file.set_fcsr(register_file.fcsr | op.fflags)
+        counters = self.counters
+        counters.instret += 1
+        counters.retired['fp'] += 1
+        if self.profile is not None:
+            self.profile.retired[op.pc] += 1
+        if tracer.mask & WB:
+            tracer.emit(WB, 'fwrite', frd=op.key - FREG_BASE, value=op.bits, mnemonic=op.mnemonic)
+
+    def muldiv_write_back(self, now):
+        """
+        Write back the multiply/divide finishing in cycle 'now', if any,
+        through the units' own write port. The op retires here.
+        """
+        op = self.muldiv.complete(now)
+        if op is None:
+            return
+        if op.key:
+            self.register_file.write(op.key, op.bits)
+        counters = self.counters
+        counters.instret += 1
+        counters.retired['mext'] += 1
+        if self.profile is not None:
+            self.profile.retired[op.pc] += 1
+        if tracer.mask & WB:
+            tracer.emit(WB, 'write', rd=op.key, value=op.bits, mnemonic=op.mnemonic)
+
+    # --- Loading ---
+
+    def load_program(self, program_hex):
+        """
+        Loads hex instructions into memory from address 0.
+        Returns the end address; raises ValueError on a malformed word.
+        """
+        address = 0
+        for inst_hex in program_hex:
+            self.memory.store(address, 4, int(inst_hex, 16))
             address += 4
-        except ValueError:
-            print(f"Error: Invalid hex instruction format: {inst_hex}")
-            sys.exit(1)
-    print(f"Program loaded. {len(program_hex)} instructions.")
-    return address
-
-def run_simulation(max_cycles):
-    global pc, if_id_reg, id_ex_reg, ex_mem_reg, mem_wb_reg
-
-    cycle = 0
-    instructions_retired = 0
-
-    ex_mem_fwd_data = {'alu_result': 0}
-    mem_wb_fwd_data = {'result': 0}
-
-    while cycle < max_cycles:
-        print(f"\n--- Cycle {cycle} --- PC: {pc:#x} ---")
-
-        # --- 1. Write Back Stage ---
-        wb_result_dict = write_back(mem_wb_reg, register_file)
-        if mem_wb_reg['inst_word'] != NOP_INSTRUCTION and mem_wb_reg['mnemonic'] != 'nop':
-             instructions_retired += 1
-
-        # --- 2. Memory Access Stage ---
-        mem_result = memory_access(ex_mem_reg, memory)
-
-        # --- 3. Execute Stage ---
-        # Capture data potentially forwarded from later stages (state BEFORE update this cycle)
-        ex_mem_fwd_data = {'alu_result': ex_mem_reg.get('alu_result', 0), 'rd': ex_mem_reg.get('rd',0), 'ctrl': ex_mem_reg.get('ctrl', {})}
-        mem_wb_fwd_data = {'result': wb_result_dict.get('result', 0) if wb_result_dict else 0, 'rd': mem_wb_reg.get('rd',0), 'ctrl': mem_wb_reg.get('ctrl', {})}
-
-        ex_result = execute(id_ex_reg,
-                             hazard_unit.forward_a_ex, hazard_unit.forward_b_ex,
-                             ex_mem_fwd_data, mem_wb_fwd_data)
-
-        # --- 4. Decode Stage ---
-        if not hazard_unit.stall_id:
-            if hazard_unit.flush_id_ex:
-                print("ID: Flushing ID/EX register")
-                id_result = {'pc': 0, 'inst_word': NOP_INSTRUCTION, 'ctrl': get_control_signals('nop'), 'rs1_val': 0, 'rs2_val': 0, 'imm': 0, 'rd': 0, 'rs1': 0, 'rs2': 0, 'mnemonic': 'nop'} #
-            else:
-                id_result = decode(if_id_reg)
+        self.mark_baseline()
+        return address
+
+    def load_executable(self, path, base=0):
+        """
+        Load an ELF or flat binary (see loader.py), or assemble a source
+        file (assembler.SOURCE_SUFFIXES, see assembler.py) at 'base'; set
+        the PC to its entry point and initialise sp/gp. Returns the
+        loader.LoadedProgram; raises OSError or loader.LoaderError.
+        """
+        if path.endswith(assembler.SOURCE_SUFFIXES):
+            program = assembler.load_source(path, self.memory, base)
         else:
-             print("ID: Stalled.")
-             id_result = id_ex_reg # Keep previous state
-
-        # --- 5. Fetch Stage ---
-        next_pc = pc # Default next PC
-        pc_updated_by_branch = False
-        if not hazard_unit.stall_if:
-            if hazard_unit.flush_if_id:
-                 print("IF: Flushing IF/ID register")
-                 if_result = {'pc': 0, 'inst_word': NOP_INSTRUCTION} # Flush with NOP
-            elif ex_result and ex_result.get('branch_taken'):
-                 # PC update handled later based on EX result this cycle
-                 next_pc = ex_result['branch_target']
-                 pc_updated_by_branch = True
-                 print(f"IF: PC will update to {next_pc:#x} due to EX branch/jump")
-                 if_result = fetch(pc) # Fetch current PC before update; will be flushed
-                 # Schedule flush for the instruction *currently* in IF/ID
-                 hazard_unit.flush_if_id = True
-            else:
-                 if_result = fetch(pc)
-                 next_pc = pc + 4 # Default PC increment
+            program = loader.load_file(path, self.memory, base)
+        loader.init_registers(self.register_file, program, self.memory)
+        self.pc = program.entry
+        self.symbols = program.symbols
+        self.mark_baseline()
+        return program
+
+    def save_checkpoint(self, path):
+        """
+        Write the complete simulator state to 'path' (see checkpoint.py).
+        Checkpoints hold the single-issue latches, so an N-wide pipeline or
+        the out-of-order core can only be saved while empty; raises OSError
+        or checkpoint.CheckpointError.
+        """
+        if (self.width > 1 or self.ooo is not None) and not self.pipeline_empty():
+            raise checkpoint.CheckpointError("an N-wide pipeline or out-of-order core can only be checkpointed while empty")
+        checkpoint.write(path, checkpoint.capture(self))
+
+    def restore_checkpoint(self, source):
+        """
+        Restore the state saved in 'source', a checkpoint file path or an
+        already parsed checkpoint.Checkpoint (to restore one file many times).
+        The out-of-order core needs a checkpoint of an empty pipeline.
+        Raises OSError or checkpoint.CheckpointError.
+        """
+        if not isinstance(source, checkpoint.Checkpoint):
+            source = checkpoint.read(source)
+        if self.ooo is not None and (source.fpu or source.muldiv
+                                     or any(latch[1] != NOP_INSTRUCTION for latch in
+                                            (source.if_id, source.id_ex, source.ex_mem, source.mem_wb))):
+            raise checkpoint.CheckpointError("the out-of-order core can only restore a checkpoint of an empty pipeline")
+        checkpoint.restore(self, source)
+        if self.width > 1:
+            # The restored single-issue latches become slot 0 of each group
+            if self.if_id_reg.inst_word != NOP_INSTRUCTION:
+                self.fetch_buffer.append(self.if_id_reg)
+                self.if_id_reg = IF_ID()
+            self.id_ex_group[0], self.id_ex_reg = self.id_ex_reg, self.id_ex_group[0]
+            self.ex_mem_group[0], self.ex_mem_reg = self.ex_mem_reg, self.ex_mem_group[0]
+            self.mem_wb_group[0], self.mem_wb_reg = self.mem_wb_reg, self.mem_wb_group[0]
+        self.mark_baseline()
+        if self.profile is not None:
+            self.profile.reset()
+
+    def mark_baseline(self):
+        """Start tracking register/memory changes from the current state (report() lists them)."""
+        if self.reg_epoch is None:
+            self.reg_epoch = self.register_file.track()
+            self.mem_epoch = self.memory.track()
         else:
-            print("IF: Stalled.")
-            if_result = None # No new fetch result
-
-        # --- Hazard Detection (Based on state *before* register update) ---
-        hazard_unit.detect_and_resolve(id_ex_reg, ex_mem_reg, mem_wb_reg)
-
-        # --- Update PC ---
-        if not hazard_unit.stall_if: # Only update PC if IF is not stalled
-             pc = next_pc
-
-        # --- Update Pipeline Registers ---
-        # Update happens *after* stages compute results and hazards are detected
-        mem_wb_reg = mem_result
-
-        if hazard_unit.stall_ex: # Handle load-use stall
-             # EX/MEM keeps its value, effectively inserting a bubble delay
-             print("EX/MEM: Holding due to EX stall.")
-             # No change to ex_mem_reg
-        elif hazard_unit.flush_id_ex: # Handle flush due to branch/load-use stall
-             ex_mem_reg = {'pc': 0, 'inst_word': NOP_INSTRUCTION, 'ctrl': get_control_signals('nop'), 'alu_result': 0, 'rs2_val': 0, 'rd': 0, 'branch_target': 0, 'branch_taken': False, 'mnemonic': 'nop'} #
-             print("EX/MEM: Receiving flushed NOP.")
+            self.reg_epoch.clear()
+            self.mem_epoch.clear()
+
+    # --- Simulation ---
+
+    def reset_pipeline(self):
+        """Fill all pipeline registers with bubbles and clear the hazard signals."""
+        for latch in (self.if_id_reg, self.if_id_next, self.id_ex_reg, self.id_ex_next,
+                      self.ex_mem_reg, self.ex_mem_next, self.mem_wb_reg, self.mem_wb_next):
+            latch.bubble()
+        self.hazard_unit = HazardUnit()
+        self.fpu.reset()
+        self.muldiv.reset()
+        self.fetch_buffer.clear()
+        for group in (self.id_ex_group, self.id_ex_group_next, self.ex_mem_group, self.ex_mem_group_next,
+                      self.mem_wb_group, self.mem_wb_group_next):
+            for latch in group:
+                latch.bubble()
+        if self.ooo is not None:
+            self.ooo.reset()
+
+    def fast_forward(self, max_instructions=None, until_pc=None, translate=True):
+        """
+        Run the functional core from the current PC (with an empty pipeline),
+        then hand its architectural state to the cycle-level pipeline.
+        PC, register file and memory are shared, so the handover is exact.
+        'translate' runs straight-line code as cached basic blocks.
+        Returns the number of instructions retired; on a MemoryFault the PC
+        is left at the faulting instruction.
+        """
+        core = FunctionalCore(self.memory, self.register_file, self.pc, translate)
+        try:
+            retired = core.run(max_instructions, until_pc)
+        finally:
+            self.pc = core.pc
+            self.reset_pipeline()
+        return retired
+
+    def pipeline_empty(self):
+        return (self.if_id_reg.inst_word == NOP_INSTRUCTION and self.id_ex_reg.mnemonic == 'nop'
+                and self.ex_mem_reg.mnemonic == 'nop' and self.mem_wb_reg.mnemonic == 'nop'
+                and not self.fpu.in_flight and not self.muldiv.in_flight and not self.fetch_buffer
+                and all(latch.mnemonic == 'nop' for group in (self.id_ex_group, self.ex_mem_group, self.mem_wb_group)
+                        for latch in group)
+                and (self.ooo is None or self.ooo.empty()))
+
+    def quiet_cycles(self, now, limit):
+        """
+        Cycles from 'now' on, at most 'limit', before an FPU or multiply/divide
+        op writes back. While the pipeline only waits (for a cache fill, or
+        on a stall that needs the write-back), all of them repeat the current
+        cycle, so run() counts them at once.
+        """
+        for unit in (self.fpu, self.muldiv):
+            if unit.in_flight:
+                limit = min(limit, unit.in_flight[0].done - now)
+        return limit
+
+    def run(self, max_cycles):
+        """
+        Clock the pipeline for at most 'max_cycles' cycles, stopping early once
+        fetch has run past the end of memory and the pipeline has drained.
+        Returns a SimResult for this call.
+        """
+        if self.ooo is not None:
+            return self.ooo.run(max_cycles)
+        if self.width > 1:
+            return self.run_wide(max_cycles)
+        # Hot state is kept in locals for the loop and stored back afterwards
+        pc = self.pc
+        if_id_reg, if_id_next = self.if_id_reg, self.if_id_next
+        id_ex_reg, id_ex_next = self.id_ex_reg, self.id_ex_next
+        ex_mem_reg, ex_mem_next = self.ex_mem_reg, self.ex_mem_next
+        mem_wb_reg, mem_wb_next = self.mem_wb_reg, self.mem_wb_next
+        hazard_unit = self.hazard_unit
+        fpu = self.fpu
+        muldiv = self.muldiv
+        mem_size = self.memory.size
+        icache = self.icache
+        dcache = self.dcache
+        profile = self.profile
+        # Counters are bumped in place (the CSRs read them mid-run)
+        counters = self.counters
+        stalls, flushes, forwards = counters.stalls, counters.flushes, counters.forwards
+        retired, branches = counters.retired, counters.branches
+        start = counters.snapshot()
+        if self.reg_epoch is None:
+            self.mark_baseline()
+        # Per-cycle deltas for the STATE trace category
+        register_file, memory = self.register_file, self.memory
+        if tracer.configured(STATE):
+            cycle_reg_epoch, cycle_mem_epoch = register_file.track(), memory.track()
         else:
-             ex_mem_reg = ex_result
-             # print(f"EX/MEM: Updated with {ex_result.get('mnemonic')}")
-
-
-        if hazard_unit.stall_id:
-            print("ID/EX: Holding due to ID stall.")
-            # No change to id_ex_reg
-        elif hazard_unit.flush_id_ex: # Check again (can be set by branch this cycle)
-             id_ex_reg = {'pc': 0, 'inst_word': NOP_INSTRUCTION, 'ctrl': get_control_signals('nop'), 'rs1_val': 0, 'rs2_val': 0, 'imm': 0, 'rd': 0, 'rs1': 0, 'rs2': 0, 'mnemonic': 'nop'} #
-             print("ID/EX: Receiving flushed NOP.")
+            cycle_reg_epoch = None
+        icache_misses = icache.misses if icache is not None else 0
+        dcache_misses = dcache.misses if dcache is not None else 0
+        skip_idle = self.skip_idle and tracer.sink is None
+
+        cycle = 0
+        halted = False
+
+        while cycle < max_cycles:
+            tracer.cycle = counters.cycles
+            if tracer.cycle >= tracer.next_toggle:
+                tracer.toggle(tracer.cycle)
+
+            # --- 0. D-cache: a miss in MEM freezes every stage until the line arrives ---
+            if dcache is not None and not hazard_unit.mem_probed:
+                ctrl = ex_mem_reg.ctrl
+                if ctrl.memRead or ctrl.memWrite:
+                    hazard_unit.mem_probed = True
+                    hazard_unit.mem_busy = dcache.access(ex_mem_reg.alu_result, ctrl.memWidth, ctrl.memWrite)
+                    if hazard_unit.mem_busy:
+                        if tracer.mask & MEM:
+                            tracer.emit(MEM, 'dcache_miss', pc=ex_mem_reg.pc, addr=ex_mem_reg.alu_result,
+                                        stall=hazard_unit.mem_busy)
+                        if profile is not None:
+                            profile.charge(ex_mem_reg.pc, 'dcache', hazard_unit.mem_busy)
+            if hazard_unit.mem_busy:
+                # Frozen cycles up to the next unit write-back are all alike
+                frozen = 1
+                if skip_idle and hazard_unit.mem_busy > 1:
+                    frozen = max(1, self.quiet_cycles(counters.cycles, min(hazard_unit.mem_busy, max_cycles - cycle)))
+                hazard_unit.mem_busy -= frozen
+                # an outstanding I-cache miss overlaps
+                hazard_unit.fetch_busy -= min(hazard_unit.fetch_busy, frozen)
+                stalls['dcache'] += frozen
+                if fpu.in_flight: # the FPU and multiply/divide units keep running
+                    self.fpu_write_back(counters.cycles)
+                if muldiv.in_flight:
+                    self.muldiv_write_back(counters.cycles)
+                if tracer.debug & PIPE:
+                    tracer.emit(PIPE, 'freeze', source='dcache')
+                cycle += frozen
+                counters.cycles += frozen
+                continue
+            hazard_unit.mem_probed = False # EX/MEM's access completes this cycle
+
+            # --- 1. Write Back Stage (first half of the cycle, before ID reads) ---
+            wb_result = self.write_back(mem_wb_reg)
+            if mem_wb_reg.mnemonic != 'nop':
+                 counters.instret += 1
+                 retired[INST_CLASS[mem_wb_reg.mnemonic]] += 1
+                 if profile is not None:
+                     profile.retired[mem_wb_reg.pc] += 1
+
+            # --- 2. Memory Access Stage ---
+            self.memory_access(ex_mem_reg, mem_wb_next)
+
+            # --- 3. Hazard Detection + Execute Stage ---
+            hazard_unit.detect_and_resolve(id_ex_reg, ex_mem_reg, mem_wb_reg, fpu, muldiv, counters.cycles)
+
+            if hazard_unit.stall_ex: # Load-use or FPU stall: EX/MEM receives a bubble
+                ex_mem_next.bubble()
+                # The held ID/EX re-reads its operands: MEM/WB's result was
+                # written back above and will not be forwarded next cycle
+                value = self.register_file.value
+                id_ex_reg.rs1_val = value(id_ex_reg.rs1)
+                id_ex_reg.rs2_val = value(id_ex_reg.rs2)
+                id_ex_reg.rs3_val = value(id_ex_reg.rs3)
+                stalls[hazard_unit.stall_cause] += 1
+                if profile is not None:
+                    profile.charge(hazard_unit.stall_pc, hazard_unit.stall_cause)
+                if tracer.debug & PIPE:
+                    tracer.emit(PIPE, 'bubble', latch='EX/MEM')
+            else:
+                forward_a, forward_b = hazard_unit.forward_a_ex, hazard_unit.forward_b_ex
+                if forward_a:
+                    forwards['ex_mem' if forward_a == 1 else 'mem_wb'] += 1
+                if forward_b:
+                    forwards['ex_mem' if forward_b == 1 else 'mem_wb'] += 1
+                self.execute(id_ex_reg, forward_a, forward_b, hazard_unit.forward_c_ex, ex_mem_reg.alu_result,
+                             wb_result, ex_mem_next)
+                if ex_mem_next.ctrl.branch:
+                    branches['taken' if ex_mem_next.branch_taken else 'not_taken'] += 1
+                if profile is not None and ex_mem_next.branch_taken:
+                    profile.transfer(ex_mem_next.pc, ex_mem_next.branch_target, decodeWord(ex_mem_next.inst_word))
+                hazard_unit.resolve_control(ex_mem_next)
+
+            # FPU and multiply/divide results are written at the end of EX, so this cycle's decode reads them
+            if fpu.in_flight:
+                self.fpu_write_back(counters.cycles)
+            if muldiv.in_flight:
+                self.muldiv_write_back(counters.cycles)
+
+            # --- 4. Decode Stage ---
+            if hazard_unit.stall_id:
+                if tracer.debug & PIPE:
+                    tracer.emit(PIPE, 'hold', latch='ID/EX')
+            elif hazard_unit.flush_id_ex:
+                id_ex_next.bubble()
+                if tracer.debug & PIPE:
+                    tracer.emit(PIPE, 'bubble', latch='ID/EX')
+            else:
+                cause = self.decode(if_id_reg, id_ex_next)
+                if cause is not None:
+                    # Waiting on an FPU or multiply/divide result: IF/ID holds, ID/EX receives a bubble
+                    hazard_unit.stall_if = True
+                    stalls[cause] += 1
+                    if profile is not None:
+                        profile.charge(self.wait_pc, cause)
+                    if tracer.debug & PIPE:
+                        tracer.emit(PIPE, 'bubble', latch='ID/EX', source=cause)
+
+            # --- 5. Fetch Stage ---
+            if hazard_unit.stall_if:
+                if tracer.debug & PIPE:
+                    tracer.emit(PIPE, 'hold', latch='IF/ID')
+                if hazard_unit.fetch_busy: # an outstanding I-cache miss still progresses
+                    hazard_unit.fetch_busy -= 1
+            elif hazard_unit.flush_if_id:
+                # Redirect: the wrong-path fetch becomes a bubble (and stops waiting on the I-cache)
+                if_id_next.bubble()
+                pc = ex_mem_next.branch_target
+                flushes['branch' if ex_mem_next.ctrl.branch else ex_mem_next.mnemonic] += 1
+                if profile is not None:
+                    profile.flush(ex_mem_next.pc)
+                hazard_unit.fetch_busy = 0
+                hazard_unit.fetch_probed = False
+                if tracer.debug & PIPE:
+                    tracer.emit(PIPE, 'redirect', target=pc)
+            else:
+                if icache is not None and not hazard_unit.fetch_probed and pc + 4 <= mem_size:
+                    hazard_unit.fetch_probed = True
+                    hazard_unit.fetch_busy = icache.access(pc, 4)
+                    if hazard_unit.fetch_busy and tracer.mask & MEM:
+                        tracer.emit(MEM, 'icache_miss', pc=pc, stall=hazard_unit.fetch_busy)
+                if hazard_unit.fetch_busy: # I-cache miss: IF/ID receives a bubble
+                    hazard_unit.fetch_busy -= 1
+                    if_id_next.bubble()
+                    stalls['icache'] += 1
+                    if profile is not None:
+                        profile.charge(pc, 'icache')
+                    if tracer.debug & PIPE:
+                        tracer.emit(PIPE, 'bubble', latch='IF/ID', source='icache')
+                else:
+                    self.fetch(pc, if_id_next)
+                    pc = if_id_next.predicted_pc # PC+4 unless the predictor redirects
+                    hazard_unit.fetch_probed = False
+
+            # --- Update Pipeline Registers ---
+            # Swap current/next; a held latch keeps its current contents
+            mem_wb_reg, mem_wb_next = mem_wb_next, mem_wb_reg
+            ex_mem_reg, ex_mem_next = ex_mem_next, ex_mem_reg
+            if not hazard_unit.stall_id:
+                id_ex_reg, id_ex_next = id_ex_next, id_ex_reg
+            if not hazard_unit.stall_if:
+                if_id_reg, if_id_next = if_id_next, if_id_reg
+
+            # Pipeline register contents for debugging
+            if tracer.debug & PIPE:
+                tracer.emit(PIPE, 'latches', pc=pc, if_id=if_id_reg.inst_word, id_ex=id_ex_reg.mnemonic, ex_mem=ex_mem_reg.mnemonic, mem_wb=mem_wb_reg.mnemonic)
+
+            cycle += 1
+            counters.cycles += 1
+
+            if cycle_reg_epoch is not None:
+                reg_delta = register_file.changes(cycle_reg_epoch, clear=True)
+                mem_delta = memory.changes(cycle_mem_epoch, clear=True)
+                if tracer.mask & STATE and (reg_delta or mem_delta):
+                    tracer.emit(STATE, 'delta', regs={name: new for name, (_, new) in reg_delta.items()},
+                                mem={f"{address:#x}": new for address, (_, new) in mem_delta.items()})
+
+            # Terminate once fetch has run past the end of memory and the pipeline has drained
+            if (pc >= mem_size and if_id_reg.inst_word == NOP_INSTRUCTION and id_ex_reg.mnemonic == 'nop'
+                    and ex_mem_reg.mnemonic == 'nop' and mem_wb_reg.mnemonic == 'nop' and not fpu.in_flight
+                    and not muldiv.in_flight):
+                halted = True
+                break
+
+            # Idle: behind an empty EX/MEM and MEM/WB, IF/ID and ID/EX wait for
+            # a unit result (a decode stall, or a lasting EX stall), or the
+            # pipeline is empty and fetch waits for the I-cache. The next cycles
+            # repeat this one until the write-back or the fill ends the wait.
+            if skip_idle and mem_wb_reg.mnemonic == 'nop' and ex_mem_reg.mnemonic == 'nop':
+                idle = 0
+                if hazard_unit.stall_if:
+                    if hazard_unit.stall_lasting if hazard_unit.stall_id else id_ex_reg.mnemonic == 'nop':
+                        idle = self.quiet_cycles(counters.cycles, max_cycles - cycle)
+                        if hazard_unit.stall_id:
+                            cause, stall_pc = hazard_unit.stall_cause, hazard_unit.stall_pc
+                        else:
+                            stall_pc = self.wait_pc # 'cause' is the decode stall's
+                elif hazard_unit.fetch_busy and id_ex_reg.mnemonic == 'nop' and if_id_reg.inst_word == NOP_INSTRUCTION:
+                    idle = self.quiet_cycles(counters.cycles, min(hazard_unit.fetch_busy, max_cycles - cycle))
+                    cause, stall_pc = 'icache', pc
+                if idle > 0:
+                    stalls[cause] += idle
+                    if profile is not None:
+                        profile.charge(stall_pc, cause, idle)
+                    hazard_unit.fetch_busy -= min(hazard_unit.fetch_busy, idle)
+                    cycle += idle
+                    counters.cycles += idle
+
+        self.pc = pc
+        self.if_id_reg, self.if_id_next = if_id_reg, if_id_next
+        self.id_ex_reg, self.id_ex_next = id_ex_reg, id_ex_next
+        self.ex_mem_reg, self.ex_mem_next = ex_mem_reg, ex_mem_next
+        self.mem_wb_reg, self.mem_wb_next = mem_wb_reg, mem_wb_next
+        if cycle_reg_epoch is not None:
+            register_file.untrack(cycle_reg_epoch)
+            memory.untrack(cycle_mem_epoch)
+        return self.run_result(cycle, start, icache_misses, dcache_misses, halted)
+
+    def run_wide(self, max_cycles):
+        """
+        run() for an issue width above 1: the same five stages, each working
+        on a group of up to 'width' instructions (see superscalar.py).
+        Returns a SimResult for this call.
+        """
+        pc = self.pc
+        width = self.width
+        fetch_buffer = self.fetch_buffer
+        id_ex_reg, id_ex_next = self.id_ex_group, self.id_ex_group_next
+        ex_mem_reg, ex_mem_next = self.ex_mem_group, self.ex_mem_group_next
+        mem_wb_reg, mem_wb_next = self.mem_wb_group, self.mem_wb_group_next
+        hazard_unit = self.hazard_unit
+        fpu = self.fpu
+        muldiv = self.muldiv
+        mem_size = self.memory.size
+        icache = self.icache
+        dcache = self.dcache
+        profile = self.profile
+        counters = self.counters
+        stalls, flushes, forwards = counters.stalls, counters.flushes, counters.forwards
+        retired, branches, splits = counters.retired, counters.branches, counters.splits
+        start = counters.snapshot()
+        if self.reg_epoch is None:
+            self.mark_baseline()
+        register_file, memory = self.register_file, self.memory
+        if tracer.configured(STATE):
+            cycle_reg_epoch, cycle_mem_epoch = register_file.track(), memory.track()
         else:
-            id_ex_reg = id_result
-            # print(f"ID/EX: Updated with {id_result.get('mnemonic')}")
-
-
-        if hazard_unit.stall_if:
-            print("IF/ID: Holding due to IF stall.")
-             # No change to if_id_reg
-        elif hazard_unit.flush_if_id:
-            if_id_reg = {'pc': 0, 'inst_word': NOP_INSTRUCTION}
-            print("IF/ID: Receiving flushed NOP.")
-        elif if_result:
-            if_id_reg = if_result
-            # print(f"IF/ID: Updated with {if_result.get('inst_word'):#010x}")
-
-
-        # Print pipeline register contents for debugging
-        print(f"Regs: IF/ID: {if_id_reg.get('inst_word',0):#010x} ID/EX: {id_ex_reg.get('mnemonic','-')}({id_ex_reg.get('inst_word',0):#010x}) EX/MEM: {ex_mem_reg.get('mnemonic','-')}({ex_mem_reg.get('inst_word',0):#010x}) MEM/WB: {mem_wb_reg.get('mnemonic','-')}({mem_wb_reg.get('inst_word',0):#010x})")
-
-
-        cycle += 1
-
-        if cycle > max_cycles - 1 :
-             print("\nMax cycles reached.")
-             break
-        # More robust termination: Check if pipeline is empty and no more instructions are fetched
-        if pc >= MEM_SIZE and if_id_reg['inst_word'] == NOP_INSTRUCTION and id_ex_reg['inst_word'] == NOP_INSTRUCTION and ex_mem_reg['inst_word'] == NOP_INSTRUCTION and mem_wb_reg['inst_word'] == NOP_INSTRUCTION:
-              print("\nPipeline empty. Halting.")
-              # Add a few extra cycles for last instruction to finish WB
-              if mem_wb_reg.get('inst_word', NOP_INSTRUCTION) != NOP_INSTRUCTION or \
-                 ex_mem_reg.get('inst_word', NOP_INSTRUCTION) != NOP_INSTRUCTION or \
-                 id_ex_reg.get('inst_word', NOP_INSTRUCTION) != NOP_INSTRUCTION:
-                  print("Waiting for pipeline drain...")
-                  continue # Allow final instructions to finish
-              else:
-                  break
-
-
-    print(f"\n--- Simulation Finished ---")
-    print(f"Cycles: {cycle}")
-    print(f"Instructions Retired: {instructions_retired}")
-    print(f"Final PC: {pc:#x}")
-    register_file.dump() #
-    print("\nMemory State (non-zero):")
-    for addr, value in sorted(memory.items()):
-        # Only print data memory changes, assuming program code doesn't change
-        # This requires knowing the program size or memory layout.
-        # Simple approach: print non-zero values at addresses < some threshold
-         if value != 0 and addr < 0x200: # Example threshold
-              print(f"  {addr:#06x}: {value:#018x}")
-
+            cycle_reg_epoch = None
+        icache_misses = icache.misses if icache is not None else 0
+        dcache_misses = dcache.misses if dcache is not None else 0
+        issue = IssueGroup(self.ports)
+        wb_results = [0] * width  # value each MEM/WB slot wrote back, for forwarding
+        skip_idle = self.skip_idle and tracer.sink is None
+
+        cycle = 0
+        halted = False
+
+        while cycle < max_cycles:
+            tracer.cycle = counters.cycles
+            if tracer.cycle >= tracer.next_toggle:
+                tracer.toggle(tracer.cycle)
+
+            # --- 0. D-cache: misses of the group's accesses are serviced one after another ---
+            if dcache is not None and not hazard_unit.mem_probed:
+                hazard_unit.mem_probed = True
+                for latch in ex_mem_reg:
+                    ctrl = latch.ctrl
+                    if ctrl.memRead or ctrl.memWrite:
+                        busy = dcache.access(latch.alu_result, ctrl.memWidth, ctrl.memWrite)
+                        hazard_unit.mem_busy += busy
+                        if busy:
+                            if tracer.mask & MEM:
+                                tracer.emit(MEM, 'dcache_miss', pc=latch.pc, addr=latch.alu_result, stall=busy)
+                            if profile is not None:
+                                profile.charge(latch.pc, 'dcache', busy)
+            if hazard_unit.mem_busy:
+                frozen = 1
+                if skip_idle and hazard_unit.mem_busy > 1:
+                    frozen = max(1, self.quiet_cycles(counters.cycles, min(hazard_unit.mem_busy, max_cycles - cycle)))
+                hazard_unit.mem_busy -= frozen
+                hazard_unit.fetch_busy -= min(hazard_unit.fetch_busy, frozen)
+                stalls['dcache'] += frozen
+                # The units keep running, but an op from a younger group must
+                # not write a register before an older latch held here does
+                if fpu.in_flight and not held_write(fpu.in_flight[0].key, ex_mem_reg, mem_wb_reg):
+                    self.fpu_write_back(counters.cycles)
+                if muldiv.in_flight and not held_write(muldiv.in_flight[0].key, ex_mem_reg, mem_wb_reg):
+                    self.muldiv_write_back(counters.cycles)
+                if tracer.debug & PIPE:
+                    tracer.emit(PIPE, 'freeze', source='dcache')
+                cycle += frozen
+                counters.cycles += frozen
+                continue
+            hazard_unit.mem_probed = False
+
+            # --- 1. Write Back Stage (oldest slot first, so the youngest write wins) ---
+            for slot in range(width):
+                latch = mem_wb_reg[slot]
+                wb_results[slot] = self.write_back(latch)
+                if latch.mnemonic != 'nop':
+                    counters.instret += 1
+                    retired[INST_CLASS[latch.mnemonic]] += 1
+                    if profile is not None:
+                        profile.retired[latch.pc] += 1
+
+            # --- 2. Memory Access Stage ---
+            for slot in range(width):
+                self.memory_access(ex_mem_reg[slot], mem_wb_next[slot])
+
+            # --- 3. Hazard Detection + Execute Stage ---
+            hazard_unit.detect_and_resolve_group(id_ex_reg, ex_mem_reg, mem_wb_reg, fpu, muldiv, counters.cycles)
+
+            redirect = None
+            if hazard_unit.stall_ex: # the whole group waits; EX/MEM receives bubbles
+                value = register_file.value
+                for slot in range(width):
+                    ex_mem_next[slot].bubble()
+                    latch = id_ex_reg[slot]
+                    latch.rs1_val = value(latch.rs1)
+                    latch.rs2_val = value(latch.rs2)
+                    latch.rs3_val = value(latch.rs3)
+                stalls[hazard_unit.stall_cause] += 1
+                if profile is not None:
+                    profile.charge(hazard_unit.stall_pc, hazard_unit.stall_cause)
+                if tracer.debug & PIPE:
+                    tracer.emit(PIPE, 'bubble', latch='EX/MEM')
+            else:
+                forward_group = hazard_unit.forward_group
+                for slot in range(width):
+                    latch = id_ex_reg[slot]
+                    # Forwarded operands are written into the latch, as each
+                    # may come from a different producer slot
+                    sources = forward_group[slot]
+                    if sources is not NO_FORWARD:
+                        a, b, c = sources
+                        if a is not None:
+                            latch.rs1_val = ex_mem_reg[a[1]].alu_result if a[0] == 1 else wb_results[a[1]]
+                            forwards['ex_mem' if a[0] == 1 else 'mem_wb'] += 1
+                        if b is not None:
+                            latch.rs2_val = ex_mem_reg[b[1]].alu_result if b[0] == 1 else wb_results[b[1]]
+                            forwards['ex_mem' if b[0] == 1 else 'mem_wb'] += 1
+                        if c is not None:
+                            latch.rs3_val = ex_mem_reg[c[1]].alu_result if c[0] == 1 else wb_results[c[1]]
+                    out = ex_mem_next[slot]
+                    self.execute(latch, 0, 0, 0, 0, 0, out)
+                    if out.ctrl.branch:
+                        branches['taken' if out.branch_taken else 'not_taken'] += 1
+                    if profile is not None and out.branch_taken:
+                        profile.transfer(out.pc, out.branch_target, decodeWord(out.inst_word))
+                    if out.mispredicted: # a branch/jump is the last of its group
+                        redirect = out
+                        hazard_unit.resolve_control(out)
+
+            if fpu.in_flight:
+                self.fpu_write_back(counters.cycles)
+            if muldiv.in_flight:
+                self.muldiv_write_back(counters.cycles)
+
+            # --- 4. Decode Stage: issue a group from the head of the fetch buffer ---
+            waiting = None # the decode stall of the group's first slot
+            if hazard_unit.stall_id:
+                if tracer.debug & PIPE:
+                    tracer.emit(PIPE, 'hold', latch='ID/EX')
+            elif hazard_unit.flush_id_ex:
+                for latch in id_ex_next:
+                    latch.bubble()
+                if tracer.debug & PIPE:
+                    tracer.emit(PIPE, 'bubble', latch='ID/EX')
+            else:
+                issue.start()
+                slot = 0
+                while slot < width and fetch_buffer:
+                    entry = fetch_buffer[0]
+                    inst = decodeWord(entry.inst_word)
+                    reason = issue.check(inst)
+                    if reason is not None:
+                        splits[reason] += 1
+                        if tracer.debug & PIPE:
+                            tracer.emit(PIPE, 'split', reason=reason, pc=entry.pc, slot=slot)
+                        break
+                    cause = self.decode(entry, id_ex_next[slot])
+                    if cause is not None:
+                        # Waiting on an FPU or multiply/divide result: the instruction stays in the fetch buffer
+                        if slot:
+                            splits[cause] += 1
+                        else:
+                            waiting = cause
+                            stalls[cause] += 1
+                            if profile is not None:
+                                profile.charge(self.wait_pc, cause)
+                            if tracer.debug & PIPE:
+                                tracer.emit(PIPE, 'bubble', latch='ID/EX', source=cause)
+                        break
+                    issue.add(inst)
+                    fetch_buffer.popleft()
+                    slot += 1
+                while slot < width:
+                    id_ex_next[slot].bubble()
+                    slot += 1
+
+            # --- 5. Fetch Stage: up to 'width' sequential instructions into the fetch buffer ---
+            if hazard_unit.stall_if:
+                if tracer.debug & PIPE:
+                    tracer.emit(PIPE, 'hold', latch='IF/ID')
+                if hazard_unit.fetch_busy:
+                    hazard_unit.fetch_busy -= 1
+            elif hazard_unit.flush_if_id:
+                # Redirect: every younger fetched instruction is squashed
+                fetch_buffer.clear()
+                pc = redirect.branch_target
+                flushes['branch' if redirect.ctrl.branch else redirect.mnemonic] += 1
+                if profile is not None:
+                    profile.flush(redirect.pc)
+                hazard_unit.fetch_busy = 0
+                hazard_unit.fetch_probed = False
+                if tracer.debug & PIPE:
+                    tracer.emit(PIPE, 'redirect', target=pc)
+            else:
+                fetched = 0
+                while len(fetch_buffer) < width and pc < mem_size:
+                    if icache is not None and pc + 4 <= mem_size:
+                        if not hazard_unit.fetch_probed:
+                            hazard_unit.fetch_probed = True
+                            hazard_unit.fetch_busy = icache.access(pc, 4)
+                            if hazard_unit.fetch_busy and tracer.mask & MEM:
+                                tracer.emit(MEM, 'icache_miss', pc=pc, stall=hazard_unit.fetch_busy)
+                        if hazard_unit.fetch_busy:
+                            break
+                    entry = IF_ID()
+                    self.fetch(pc, entry)
+                    fetch_buffer.append(entry)
+                    hazard_unit.fetch_probed = False
+                    fetched += 1
+                    if entry.predicted_pc != pc + 4: # a predicted-taken transfer ends the fetch group
+                        pc = entry.predicted_pc
+                        break
+                    pc += 4
+                if hazard_unit.fetch_busy: # I-cache miss
+                    hazard_unit.fetch_busy -= 1
+                    if not fetched:
+                        stalls['icache'] += 1
+                        if profile is not None:
+                            profile.charge(pc, 'icache')
+                        if tracer.debug & PIPE:
+                            tracer.emit(PIPE, 'bubble', latch='IF/ID', source='icache')
+
+            # --- Update Pipeline Registers (the fetch buffer is updated in place) ---
+            mem_wb_reg, mem_wb_next = mem_wb_next, mem_wb_reg
+            ex_mem_reg, ex_mem_next = ex_mem_next, ex_mem_reg
+            if not hazard_unit.stall_id:
+                id_ex_reg, id_ex_next = id_ex_next, id_ex_reg
+
+            if tracer.debug & PIPE:
+                tracer.emit(PIPE, 'latches', pc=pc, if_id=[entry.inst_word for entry in fetch_buffer],
+                            id_ex=[latch.mnemonic for latch in id_ex_reg], ex_mem=[latch.mnemonic for latch in ex_mem_reg],
+                            mem_wb=[latch.mnemonic for latch in mem_wb_reg])
+
+            cycle += 1
+            counters.cycles += 1
+
+            if cycle_reg_epoch is not None:
+                reg_delta = register_file.changes(cycle_reg_epoch, clear=True)
+                mem_delta = memory.changes(cycle_mem_epoch, clear=True)
+                if tracer.mask & STATE and (reg_delta or mem_delta):
+                    tracer.emit(STATE, 'delta', regs={name: new for name, (_, new) in reg_delta.items()},
+                                mem={f"{address:#x}": new for address, (_, new) in mem_delta.items()})
+
+            if (pc >= mem_size and not fetch_buffer and not fpu.in_flight and not muldiv.in_flight
+                    and all(latch.mnemonic == 'nop' for group in (id_ex_reg, ex_mem_reg, mem_wb_reg) for latch in group)):
+                halted = True
+                break
+
+            # Idle (see run()); after a decode stall, or with the pipeline empty,
+            # fetch must be still too: waiting on the I-cache, or the buffer full
+            if (skip_idle and (hazard_unit.stall_id and hazard_unit.stall_lasting or waiting is not None
+                               or hazard_unit.fetch_busy and not fetch_buffer)
+                    and all(latch.mnemonic == 'nop' for group in (ex_mem_reg, mem_wb_reg) for latch in group)):
+                idle = 0
+                if hazard_unit.stall_id:
+                    if hazard_unit.stall_lasting:
+                        idle = self.quiet_cycles(counters.cycles, max_cycles - cycle)
+                        cause, stall_pc = hazard_unit.stall_cause, hazard_unit.stall_pc
+                elif waiting is not None or all(latch.mnemonic == 'nop' for latch in id_ex_reg):
+                    if hazard_unit.fetch_busy:
+                        idle = self.quiet_cycles(counters.cycles, min(hazard_unit.fetch_busy, max_cycles - cycle))
+                        if idle > 0:
+                            stalls['icache'] += idle
+                            if profile is not None:
+                                profile.charge(pc, 'icache', idle)
+                    elif len(fetch_buffer) >= width or pc >= mem_size:
+                        idle = self.quiet_cycles(counters.cycles, max_cycles - cycle)
+                    cause, stall_pc = waiting, self.wait_pc
+                if idle > 0:
+                    if cause is not None:
+                        stalls[cause] += idle
+                        if profile is not None:
+                            profile.charge(stall_pc, cause, idle)
+                    hazard_unit.fetch_busy -= min(hazard_unit.fetch_busy, idle)
+                    cycle += idle
+                    counters.cycles += idle
+
+        self.pc = pc
+        self.id_ex_group, self.id_ex_group_next = id_ex_reg, id_ex_next
+        self.ex_mem_group, self.ex_mem_group_next = ex_mem_reg, ex_mem_next
+        self.mem_wb_group, self.mem_wb_group_next = mem_wb_reg, mem_wb_next
+        if cycle_reg_epoch is not None:
+            register_file.untrack(cycle_reg_epoch)
+            memory.untrack(cycle_mem_epoch)
+        return self.run_result(cycle, start, icache_misses, dcache_misses, halted)
+
+    def enable_guest_profile(self):
+        """
+        Attach a guest_profile.GuestProfiler that profiles the simulated
+        program from the next run() on, and return it (see guest_profile.py).
+        """
+        self.profile = GuestProfiler(self, FLUSH_PENALTY)
+        return self.profile
+
+    def run_stream(self, max_cycles, step=1, categories=0, level=INFO):
+        """
+        run() as a generator yielding a stream.CycleSnapshot every 'step'
+        cycles; the run pauses between snapshots (see stream.py).
+        """
+        return stream.stream(self, max_cycles, step, categories, level)
+
+    def run_stream_async(self, max_cycles, step=1, categories=0, level=INFO, resume=None):
+        """run_stream() as an async generator for asyncio consumers (see stream.astream())."""
+        return stream.astream(self, max_cycles, step, categories, level, resume)
+
+    def run_result(self, cycle, start, icache_misses, dcache_misses, halted):
+        """SimResult of a run() that took 'cycle' cycles from the counter snapshot 'start' and the given cache miss counts."""
+        if self.icache is not None:
+            icache_misses = self.icache.misses - icache_misses
+        if self.dcache is not None:
+            dcache_misses = self.dcache.misses - dcache_misses
+        # Only the counters a SimResult needs are diffed: run_stream() calls this every few cycles
+        counters = self.counters
+        stalls, start_stalls = counters.stalls, start['stalls']
+        instructions_retired = counters.instret - start['instret']
+        control_flushes = sum(counters.flushes.values()) - sum(start['flushes'].values())
+        cpi = cycle / instructions_retired if instructions_retired else 0.0
+        accuracy = self.predictor.stats()['all'][2]
+        return SimResult(cycle, instructions_retired, cpi, stalls['load_use'] - start_stalls['load_use'],
+                         control_flushes, control_flushes * FLUSH_PENALTY, accuracy, icache_misses, dcache_misses,
+                         stalls['icache'] - start_stalls['icache'] + stalls['dcache'] - start_stalls['dcache'],
+                         halted)
+
+    def stats(self):
+        """
+        Everything measured so far as a JSON-serialisable dict: the
+        performance counters, CPI/IPC, predictor and cache statistics.
+        """
+        counters = self.counters
+        out = counters.snapshot()
+        out['cpi'] = counters.cycles / counters.instret if counters.instret else 0.0
+        out['ipc'] = counters.instret / counters.cycles if counters.cycles else 0.0
+        out['flush_cycles'] = sum(counters.flushes.values()) * FLUSH_PENALTY
+        out['predictor'] = {'name': self.predictor.name}
+        for kind, (resolved, wrong, accuracy) in self.predictor.stats().items():
+            out['predictor'][kind] = {'resolved': resolved, 'mispredicted': wrong, 'accuracy': accuracy}
+        for cache in (self.icache, self.dcache):
+            if cache is not None:
+                out[cache.name] = cache.stats()
+        out['fpu'] = self.fpu.stats()
+        out['muldiv'] = self.muldiv.stats()
+        out['width'] = self.width
+        out['ports'] = dict(self.ports)
+        out['core'] = self.core
+        if self.ooo is not None:
+            out['ooo'] = self.ooo.stats()
+        return out
+
+    def report(self):
+        """Print the end-of-run summary: counts, registers and low memory."""
+        counters = self.counters
+        print(f"\n--- Simulation Finished ---")
+        print(f"Cycles: {counters.cycles}")
+        print(f"Instructions Retired: {counters.instret}")
+        if counters.instret:
+            print(f"CPI: {counters.cycles / counters.instret:.3f}")
+        print(f"Final PC: {self.pc:#x}")
+        print("Stall cycles: " + ", ".join(f"{cause} {n}" for cause, n in counters.stalls.items()))
+        print("Forwards: " + ", ".join(f"{source} {n}" for source, n in counters.forwards.items()))
+        print("Retired by class: " + ", ".join(f"{cls} {n}" for cls, n in counters.retired.items() if n))
+        print(f"Branches: {counters.branches['taken']} taken, {counters.branches['not_taken']} not taken")
+        print(f"Branch predictor: {self.predictor.name}"
+              f" (btb: {'none' if self.predictor.btb is None else len(self.predictor.btb.tags)},"
+              f" ras: {'none' if self.predictor.ras is None else self.predictor.ras.depth})")
+        for kind, (resolved, wrong, accuracy) in self.predictor.stats().items():
+            print(f"  {kind:<6} {resolved:8d} resolved {wrong:8d} mispredicted  accuracy {accuracy:7.2%}")
+        control_flushes = sum(counters.flushes.values())
+        print(f"Control flushes: {control_flushes} ({control_flushes * FLUSH_PENALTY} cycles: "
+              + ", ".join(f"{kind} {n}" for kind, n in counters.flushes.items()) + ")")
+        if self.ooo is not None:
+            print(f"Out-of-order core: width {self.width}, {self.ooo.describe()}; issued "
+                  + ", ".join(f"{station} {n}" for station, n in self.ooo.issued.items()))
+        elif self.width > 1:
+            print(f"Issue width: {self.width} (ports: " + ", ".join(f"{port} {n}" for port, n in self.ports.items())
+                  + "); groups split by " + ", ".join(f"{reason} {n}" for reason, n in counters.splits.items()))
+        print(f"FPU: {self.fpu.describe()}; issued "
+              + ", ".join(f"{unit} {n}" for unit, n in self.fpu.issued.items()))
+        print(f"Multiply/divide: {self.muldiv.describe()}; issued "
+              + ", ".join(f"{unit} {n}" for unit, n in self.muldiv.issued.items()))
+        for cache in (self.icache, self.dcache):
+            if cache is None:
+                continue
+            s = cache.stats()
+            print(f"{cache.name}: {cache.describe()}")
+            print(f"  {s['reads']} reads, {s['writes']} writes: {s['hits']} hits, {s['misses']} misses"
+                  f" ({s['miss_rate']:.2%}), {s['evictions']} evictions, {s['writebacks']} writebacks,"
+                  f" {s['write_throughs']} write-throughs; {counters.stalls[cache.name]} stall cycles")
+        # Only what the run changed since the program was loaded (see mark_baseline())
+        if self.reg_epoch is None:
+            self.register_file.dump()
+            return
+        self.register_file.dump(self.reg_epoch)
+        print("\nMemory changed (old -> new):")
+        changes = self.memory.changes(self.mem_epoch)
+        if not changes:
+            print("  (none)")
+        for address, (old, new) in list(changes.items())[:REPORT_MEMORY_LINES]:
+            print(f"  {address:#06x}: {old:#018x} -> {new:#018x}")
+        if len(changes) > REPORT_MEMORY_LINES:
+            print(f"  ... {len(changes) - REPORT_MEMORY_LINES} more doublewords")
+
+
+# Hot paths timed by the host profiler (see host_profile.py), as (owner, attribute)
+HOST_PROFILE_POINTS = [
+    (Simulator, 'fetch'), (Simulator, 'decode'), (Simulator, 'execute'), (Simulator, 'memory_access'),
+    (Simulator, 'write_back'), (Simulator, 'fpu_write_back'), (Simulator, 'muldiv_write_back'),
+    (HazardUnit, 'detect_and_resolve'), (HazardUnit, 'detect_and_resolve_group'),
+    (OutOfOrderCore, 'commit'), (OutOfOrderCore, 'issue'), (OutOfOrderCore, 'complete'),
+    (OutOfOrderCore, 'dispatch'), (OutOfOrderCore, 'fetch'),
+    (utils, 'decodeInstruction'),
+]
+
+
+# Example Program from previous response
+DEMO_PROGRAM = [
+    "0x00500093", # 00: addi x1, x0, 5
+    "0x00A00113", # 04: addi x2, x0, 10
+    "0x002081B3", # 08: add x3, x1, x2  (Data Hazard x1, x2 -> Forwarding)
+    "0x00303023", # 0C: sd x3, 0(x0)   (Data Hazard x3 -> Forwarding)
+    "0x00003203", # 10: ld x4, 0(x0)
+    "0x00120293", # 14: addi x5, x4, 1  (Load-Use Hazard x4 -> Stall + Forward)
+    "0x00129463", # 18: bne x5, x1, +8 (target=0x20) (Control Hazard -> Flush if taken)
+    "0x00100313", # 1C: addi x6, x0, 1 (skipped if branch taken)
+    "0x00200393", # 20: addi x7, x0, 2 (target label)
+    "0x00000013"  # 24: NOP
+]
 
 
 # --- Main Execution ---
 if __name__ == "__main__":
-    # Example Program from previous response
-    program = [
-        "0x00500093", # 00: addi x1, x0, 5
-        "0x00A00113", # 04: addi x2, x0, 10
-        "0x002081B3", # 08: add x3, x1, x2  (Data Hazard x1, x2 -> Forwarding)
-        "0x00302023", # 0C: sd x3, 0(x0)   (Data Hazard x3 -> Forwarding)
-        "0x00003203", # 10: ld x4, 0(x0)
-        "0x00120293", # 14: addi x5, x4, 1  (Load-Use Hazard x4 -> Stall + Forward)
-        "0x00129863", # 18: bne x5, x1, +8 (target=0x20) (Control Hazard -> Flush if taken)
-        "0x00100313", # 1C: addi x6, x0, 1 (skipped if branch taken)
-        "0x00200393", # 20: addi x7, x0, 2 (target label)
-        "0x00000013"  # 24: NOP
-    ]
-
-    program_end_addr = load_program(program)
-
-    run_simulation(max_cycles=50)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="RV64 5-stage pipeline simulator")
+    parser.add_argument("--max-cycles", type=int, default=50)
+    parser.add_argument("program_file", nargs="?", default=None,
+                        help="RV64 ELF executable, flat .bin image or assembly source (.s, .S, .asm;"
+                             " assembled results are cached, see assembler.py) (default: built-in demo)")
+    parser.add_argument("--load-base", type=lambda v: int(v, 0), default=0,
+                        help="load address for flat binaries and assembly sources")
+    parser.add_argument("--mem-size", type=lambda v: int(v, 0), default=MEM_SIZE,
+                        help="simulated memory size in bytes")
+    parser.add_argument("--restore", metavar="FILE", default=None,
+                        help="start from a checkpoint instead of loading a program")
+    parser.add_argument("--save-checkpoint", metavar="FILE", default=None,
+                        help="write the complete simulator state to FILE when the run ends")
+    parser.add_argument("--fast-forward", type=int, default=None, metavar="N",
+                        help="retire N instructions functionally before starting the pipeline")
+    parser.add_argument("--until-pc", type=lambda v: int(v, 0), default=None,
+                        help="fast-forward functionally until the PC reaches this address")
+    parser.add_argument("--no-translate", action="store_true",
+                        help="fast-forward one instruction at a time instead of by cached basic blocks")
+    parser.add_argument("--no-skip-idle", action="store_true",
+                        help="clock every cycle of a long stall instead of skipping to the fill or write-back that ends it")
+    parser.add_argument("--predictor", default="none",
+                        help="none, static[:not_taken|taken|btfn], bimodal[:ENTRIES], gshare[:ENTRIES[:HISTORY_BITS]]")
+    parser.add_argument("--btb", type=int, default=0, metavar="ENTRIES",
+                        help="branch target buffer entries (0: targets come from predecode)")
+    parser.add_argument("--ras", type=int, default=0, metavar="DEPTH",
+                        help="return-address stack depth (0: none)")
+    parser.add_argument("--icache", default=None, metavar="SPEC",
+                        help="L1 I-cache SIZE[:LINE[:WAYS[:lru|plru|random]]], e.g. 16k:64:2:lru (default: none)")
+    parser.add_argument("--dcache", default=None, metavar="SPEC",
+                        help="L1 D-cache SIZE[:LINE[:WAYS[:POLICY[:write_back|write_through]]]] (default: none)")
+    parser.add_argument("--miss-penalty", type=int, default=10, metavar="CYCLES",
+                        help="stall cycles for a cache miss")
+    parser.add_argument("--fpu", default=None, metavar="SPEC",
+                        help="FPU unit latencies UNIT=CYCLES[:pipelined|unpipelined],... for units add, mul, fma, div, sqrt"
+                             " (default: add=3,mul=4,fma=5,div=20:unpipelined,sqrt=25:unpipelined)")
+    parser.add_argument("--muldiv", default=None, metavar="SPEC",
+                        help="M-extension unit latencies UNIT=CYCLES[:pipelined|unpipelined],... for units mul, div;"
+                             " a divide takes fewer cycles the fewer quotient bits it has (default: mul=3,div=34:unpipelined)")
+    parser.add_argument("--width", type=int, default=1, metavar="N",
+                        help="issue width: fetch, issue and retire up to N instructions per cycle")
+    parser.add_argument("--ports", default=None, metavar="SPEC",
+                        help="issue ports per cycle PORT=COUNT,... for ports alu, mem, branch"
+                             " (default: alu=WIDTH,mem=1,branch=1)")
+    parser.add_argument("--core", choices=CORES, default="inorder",
+                        help="in-order pipeline or out-of-order core (fetching and committing --width per cycle)")
+    parser.add_argument("--ooo", default=None, metavar="SPEC",
+                        help="out-of-order core sizes rob=N,lsq=N,STATION=ENTRIES[:UNITS],... for stations"
+                             " alu, mul, mem, branch, fp (default: rob=64,lsq=16,alu=16:2,mul=4:1,mem=8:1,branch=8:1,fp=8:2)")
+    parser.add_argument("--host-profile", type=int, nargs="?", const=1, default=None, metavar="N",
+                        help="time the simulator's hot paths (every Nth call, default every call)"
+                             " and print a ranked host-time report")
+    parser.add_argument("--guest-profile", type=int, nargs="?", const=20, default=None, metavar="ROWS",
+                        help="profile the simulated program and print its hottest functions, instructions and"
+                             " basic blocks and its call graph (ROWS each, default 20)")
+    parser.add_argument("--collapsed", metavar="FILE", default=None,
+                        help="profile the simulated program and write its call stacks to FILE in the collapsed"
+                             " format of flamegraph tools, weighted by cycles ('-' for stdout)")
+    parser.add_argument("--stats-json", metavar="FILE", default=None,
+                        help="write the performance counters and cache/predictor statistics as JSON to FILE ('-' for stdout)")
+    parser.add_argument("--trace", metavar="FILE", default=None,
+                        help="write pipeline events as JSON lines to FILE ('-' for the console)")
+    parser.add_argument("--trace-categories", default="all",
+                        help="comma-separated: hazard,forward,branch,mem,wb,pipe,decode,state or all")
+    parser.add_argument("--trace-level", choices=["info", "debug"], default="info")
+    parser.add_argument("--trace-window", default=None, metavar="START:END",
+                        help="only trace cycles in [START, END)")
+    args = parser.parse_args()
+
+    if args.trace:
+        sink = ConsoleSink() if args.trace == '-' else JsonLinesSink(args.trace)
+        window = tuple(int(v) for v in args.trace_window.split(':')) if args.trace_window else None
+        tracer.enable(sink, parse_categories(args.trace_categories),
+                      DEBUG if args.trace_level == 'debug' else INFO, window)
+
+    try:
+        sim = Simulator(args.mem_size, args.predictor, args.btb, args.ras,
+                        args.icache, args.dcache, args.miss_penalty, args.fpu, args.width, args.ports,
+                        args.core, args.ooo, args.muldiv)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if args.restore:
+        if args.program_file:
+            print("Error: --restore and a program file are mutually exclusive")
+            sys.exit(1)
+        try:
+            sim.restore_checkpoint(args.restore)
+        except (OSError, checkpoint.CheckpointError) as e:
+            print(f"Error: Could not restore {args.restore}: {e}")
+            sys.exit(1)
+        print(f"Restored checkpoint {args.restore}: {sim.cycles} cycles, {sim.instructions_retired} retired, PC {sim.pc:#x}.")
+    elif args.program_file:
+        try:
+            program = sim.load_executable(args.program_file, args.load_base)
+        except (OSError, loader.LoaderError) as e:
+            print(f"Error: Could not load {args.program_file}: {e}")
+            sys.exit(1)
+        size = sum(memsz for _, memsz in program.segments)
+        print(f"Program loaded from {args.program_file}. {len(program.segments)} segment(s), {size} bytes, entry {sim.pc:#x}.")
+    else:
+        sim.load_program(DEMO_PROGRAM)
+        print(f"Program loaded. {len(DEMO_PROGRAM)} instructions.")
+
+    if args.fast_forward is not None or args.until_pc is not None:
+        try:
+            retired = sim.fast_forward(args.fast_forward, args.until_pc, not args.no_translate)
+        except MemoryFault as e:
+            print(f"Error: Guest fault at PC {e.pc:#x} while fast-forwarding: {e}")
+            tracer.disable()
+            sys.exit(1)
+        print(f"Fast-forwarded {retired} instructions. Pipeline resumes at PC {sim.pc:#x}.")
+    sim.skip_idle = not args.no_skip_idle
+
+    if args.guest_profile is not None or args.collapsed:
+        sim.enable_guest_profile()
+    if args.host_profile is not None:
+        try:
+            host_profiler.enable(HOST_PROFILE_POINTS, args.host_profile)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+    try:
+        result = sim.run(args.max_cycles)
+    except MemoryFault as e:
+        print(f"Error: Guest fault at PC {e.pc:#x} in cycle {sim.cycles}: {e}")
+        tracer.disable()
+        sys.exit(1)
+    host_profiler.disable()
+    print("\nPipeline empty. Halting." if result.halted else "\nMax cycles reached.")
+    sim.report()
+    if args.host_profile is not None:
+        host_profiler.report()
+    if args.guest_profile is not None:
+        sim.profile.report(rows=args.guest_profile)
+    if args.collapsed == '-':
+        print(sim.profile.collapsed(), end='')
+    elif args.collapsed:
+        with open(args.collapsed, 'w') as f:
+            f.write(sim.profile.collapsed())
+    if args.save_checkpoint:
+        try:
+            sim.save_checkpoint(args.save_checkpoint)
+        except (OSError, checkpoint.CheckpointError) as e:
+            print(f"Error: Could not write {args.save_checkpoint}: {e}")
+            sys.exit(1)
+        print(f"Checkpoint written to {args.save_checkpoint}.")
+    stats = sim.stats() if args.stats_json else None
+    if stats is not None and args.host_profile is not None:
+        stats['host_profile'] = host_profiler.stats()
+    if stats is not None and sim.profile is not None:
+        stats['guest_profile'] = sim.profile.stats()
+    if args.stats_json == '-':
+        print(json.dumps(stats, indent=2))
+    elif args.stats_json:
+        with open(args.stats_json, 'w') as f:
+            json.dump(stats, f, indent=2)
+    tracer.disable()
@@ -0,0 +1,181 @@
+# memory_unit.py
+# Byte-addressable, little-endian memory made of fixed-size pages.
+# Pages are bytearrays allocated on first write; reads of untouched pages
+# return zeros without allocating anything.
+#
+# Change tracking works in epochs (track()): every write records the old
+# contents of each aligned doubleword it touches the first time that
+# doubleword is written in the epoch, so listing the changes costs
+# O(doublewords written).
+
+import struct
+
+PAGE_BITS = 12
+PAGE_SIZE = 1 << PAGE_BITS    # 4 KiB
+PAGE_MASK = PAGE_SIZE - 1
+
+MASK64 = (1 << 64) - 1
+
+# (width, signed) -> precompiled little-endian struct
+_LOAD_FORMATS = {
+    (1, False): struct.Struct('<B'), (1, True): struct.Struct('<b'),
+    (2, False): struct.Struct('<H'), (2, True): struct.Struct('<h'),
+    (4, False): struct.Struct('<I'), (4, True): struct.Struct('<i'),
+    (8, False): struct.Struct('<Q'), (8, True): struct.Struct('<q'),
+}
+_STORE_FORMATS = {width: _LOAD_FORMATS[(width, False)] for width in (1, 2, 4, 8)}
+
+
+class MemoryFault(Exception):
+    """Access outside the configured memory size."""
+    def __init__(self, address, width):
+        super().__init__(f"Memory access out of bounds: {width} byte(s) at {address:#x}")
+        self.address = address
+        self.width = width
+        self.pc = None  # of the faulting instruction, set by the core that ran it
+
+
+class PagedMemory:
+    def __init__(self, size=1024 * 1024):
+        self.size = size
+        self.pages = {}  # page number -> bytearray(PAGE_SIZE)
+        # page number -> callback(address, length), run after any write that
+        # touches that page (used to invalidate translated code, see block_cache.py)
+        self.watched_pages = {}
+        # Open change-tracking epochs: doubleword index -> old 8 bytes
+        self.epochs = []
+
+    def _check(self, address, width):
+        if address < 0 or address + width > self.size:
+            raise MemoryFault(address, width)
+
+    def _dword(self, index):
+        """The 8 bytes of aligned doubleword 'index' (zero-padded past the end of memory)."""
+        page = self.pages.get(index >> (PAGE_BITS - 3))
+        if page is None:
+            return bytes(8)
+        offset = (index << 3) & PAGE_MASK
+        return bytes(page[offset:offset + 8]).ljust(8, b'\x00')
+
+    def note_range(self, address, length):
+        """Save the old contents of [address, address + length) in every open epoch (before writing it)."""
+        for index in range(address >> 3, ((address + length - 1) >> 3) + 1):
+            for epoch in self.epochs:
+                if index not in epoch:
+                    epoch[index] = self._dword(index)
+
+    def _page_for_write(self, number):
+        page = self.pages.get(number)
+        if page is None:
+            page = self.pages[number] = bytearray(PAGE_SIZE)
+        return page
+
+    # --- Scalar accesses ---
+    def load(self, address, width, signed=False):
+        """
+        Load 'width' (1/2/4/8) bytes at 'address'. Signed loads are
+        sign-extended; the result is returned as a 64-bit pattern.
+        """
+        self._check(address, width)
+        offset = address & PAGE_MASK
+        if offset + width <= PAGE_SIZE:
+            page = self.pages.get(address >> PAGE_BITS)
+            if page is None:
+                return 0
+            value = _LOAD_FORMATS[(width, signed)].unpack_from(page, offset)[0]
+        else:
+            value = int.from_bytes(self.read_range(address, width), 'little', signed=signed)
+        return value & MASK64
+
+    def store(self, address, width, value):
+        """Store the low 'width' bytes of 'value' at 'address'."""
+        self._check(address, width)
+        if self.epochs:
+            self.note_range(address, width)
+        value &= (1 << (width * 8)) - 1
+        offset = address & PAGE_MASK
+        if offset + width <= PAGE_SIZE:
+            number = address >> PAGE_BITS
+            _STORE_FORMATS[width].pack_into(self._page_for_write(number), offset, value)
+            if number in self.watched_pages:
+                self.watched_pages[number](address, width)
+        else:
+            self.load_image(address, value.to_bytes(width, 'little'))
+
+    # --- Bulk accesses ---
+    def load_image(self, address, data):
+        """Copy a bytes-like object into memory starting at 'address'."""
+        # Released on the way out, even on a fault, so a memory-mapped 'data' can be closed
+        with memoryview(data).cast('B') as view:
+            self._check(address, len(view))
+            if self.epochs and len(view):
+                self.note_range(address, len(view))
+            pos = 0
+            while pos < len(view):
+                offset = (address + pos) & PAGE_MASK
+                chunk = min(PAGE_SIZE - offset, len(view) - pos)
+                number = (address + pos) >> PAGE_BITS
+                self._page_for_write(number)[offset:offset + chunk] = view[pos:pos + chunk]
+                if number in self.watched_pages:
+                    self.watched_pages[number](address + pos, chunk)
+                pos += chunk
+
+    def read_range(self, address, length):
+        """Return 'length' bytes starting at 'address' as a bytes object."""
+        self._check(address, length)
+        out = bytearray(length)
+        pos = 0
+        while pos < length:
+            offset = (address + pos) & PAGE_MASK
+            chunk = min(PAGE_SIZE - offset, length - pos)
+            page = self.pages.get((address + pos) >> PAGE_BITS)
+            if page is not None:
+                out[pos:pos + chunk] = memoryview(page)[offset:offset + chunk]
+            pos += chunk
+        return bytes(out)
+
+    def clear_range(self, address, length):
+        """Zero 'length' bytes from 'address'; untouched pages are already zero."""
+        self._check(address, length)
+        if self.epochs and length:
+            self.note_range(address, length)
+        pos = 0
+        while pos < length:
+            offset = (address + pos) & PAGE_MASK
+            chunk = min(PAGE_SIZE - offset, length - pos)
+            number = (address + pos) >> PAGE_BITS
+            page = self.pages.get(number)
+            if page is not None:
+                page[offset:offset + chunk] = bytes(chunk)
+                if number in self.watched_pages:
+                    self.watched_pages[number](address + pos, chunk)
+            pos += chunk
+
+    def touched_pages(self):
+        """Base addresses of all allocated pages, in ascending order."""
+        return [number << PAGE_BITS for number in sorted(self.pages)]
+
+    # --- Change tracking ---
+    def track(self):
+        """Open a change-tracking epoch; returns its handle."""
+        epoch = {}
+        self.epochs.append(epoch)
+        return epoch
+
+    def untrack(self, epoch):
+        self.epochs.remove(epoch)
+
+    def changes(self, epoch, clear=False):
+        """
+        {address: (old, new)} for the aligned doublewords whose contents
+        differ from the start of 'epoch' (little-endian 64-bit values), in
+        address order. 'clear' starts a new epoch on the same handle.
+        """
+        out = {}
+        for index in sorted(epoch):
+            old, new = epoch[index], self._dword(index)
+            if old != new:
+                out[index << 3] = (int.from_bytes(old, 'little'), int.from_bytes(new, 'little'))
+        if clear:
+            epoch.clear()
+        return out
@@ -0,0 +1,92 @@
+# muldiv.py
+# M-extension functional units: a pipelined multiplier and an iterative
+# divider, tracked by a scoreboard (see scoreboard.py).
+#
+# alu.py still computes the result in EX; the op then issues into its unit
+# and its result is written to the integer register file through the
+# units' own write port, 'latency' cycles later. The multiplier takes a
+# fixed latency. The divider is unpipelined and develops its quotient a few
+# bits per step, skipping the leading quotient bits that are known to be
+# zero: it takes two cycles (operand setup, sign fixup) plus the steps for
+# the significant quotient bits, scaled so a full 64-bit quotient takes the
+# configured latency. Division by zero and a dividend smaller than the
+# divisor finish after the two cycles. When its result would collide with
+# a multiply on the write port, the divider holds it for a cycle.
+
+from scoreboard import Scoreboard, parse_units
+
+MASK64 = (1 << 64) - 1
+SIGN64 = 1 << 63
+
+# Unit of each M-extension op
+MULDIV_UNITS = {
+    'mul': 'mul', 'mulh': 'mul', 'mulhsu': 'mul', 'mulhu': 'mul',
+    'div': 'div', 'divu': 'div', 'rem': 'div', 'remu': 'div',
+}
+
+# unit -> (latency in cycles, pipelined); the divider's is that of a full 64-bit quotient
+DEFAULT_UNITS = {'mul': (3, True), 'div': (34, False)}
+
+# Cycles every divide takes besides its quotient steps
+DIV_SETUP = 2
+
+
+def _magnitude(value):
+    value &= MASK64
+    return (1 << 64) - value if value & SIGN64 else value
+
+
+def divide_cycles(latency, mnemonic, dividend, divisor):
+    """Cycles the divider takes for 'mnemonic' on these operands, 'latency' being the full 64-bit case."""
+    if mnemonic == 'div' or mnemonic == 'rem':
+        dividend, divisor = _magnitude(dividend), _magnitude(divisor)
+    else:
+        dividend, divisor = dividend & MASK64, divisor & MASK64
+    if not divisor:
+        return DIV_SETUP
+    bits = dividend.bit_length() - divisor.bit_length() + 1  # significant quotient bits
+    if bits <= 0:
+        return DIV_SETUP
+    return DIV_SETUP + -(-(latency - DIV_SETUP) * bits // 64)
+
+
+class MulDiv(Scoreboard):
+    def __init__(self, units=None):
+        super().__init__('M-extension', DEFAULT_UNITS, units)
+        if self.units['div'][0] <= DIV_SETUP:
+            raise ValueError(f"M-extension unit 'div': latency must be above {DIV_SETUP}")
+
+    def latency(self, unit, mnemonic, op1, op2):
+        latency = self.units[unit][0]
+        if unit == 'div':
+            return divide_cycles(latency, mnemonic, op1, op2)
+        return latency
+
+    def blocked(self, unit, now):
+        if unit == 'div':
+            # The divide's latency depends on its operands, so the write port is
+            # claimed at issue(); only another divide in flight blocks it here
+            if not self.units['div'][1]:
+                for op in self.in_flight:
+                    if op.unit == 'div':
+                        return 'busy'
+            return None
+        return super().blocked(unit, now)
+
+    def issue(self, unit, now, key, bits, fflags, pc, mnemonic, latency=None):
+        latency = latency or self.units[unit][0]
+        if unit == 'div':
+            # Hold the quotient while a multiply owns the write port
+            taken = {op.done for op in self.in_flight}
+            while now + latency - 1 in taken:
+                latency += 1
+        return super().issue(unit, now, key, bits, fflags, pc, mnemonic, latency)
+
+
+def make_muldiv(spec=None):
+    """
+    Build the M-extension units from 'UNIT=LATENCY[:pipelined|unpipelined],...'
+    overriding DEFAULT_UNITS (units mul and div), e.g. 'mul=4,div=66'.
+    An empty spec keeps the defaults.
+    """
+    return MulDiv(parse_units('M-extension', spec, DEFAULT_UNITS))
@@ -0,0 +1,562 @@
+# ooo.py
+# Out-of-order core: Tomasulo-style scheduling with register renaming,
+# reservation stations per functional unit type, a reorder buffer (ROB) with
+# in-order commit and a load/store queue (LSQ).
+#
+# Selected with Simulator(core='ooo'); it runs on the Simulator's memory,
+# RegisterFile (the architectural state, written at commit), branch
+# predictor, caches and FPU and multiply/divide latencies, so the in-order and out-of-order
+# cores can be compared on the same programs and configurations. Each cycle:
+#   commit   - up to 'width' finished instructions leave the ROB head in
+#              order: registers and fflags are written, stores go to memory
+#              (a D-cache miss blocks commit), the predictor is trained
+#   issue    - each station starts up to UNITS ready instructions, oldest
+#              first; the result is computed here and broadcast LATENCY
+#              cycles later (alu/branch 1, load 2 plus any D-cache miss,
+#              multiplies and divides their muldiv.py unit latency, FP ops
+#              the FPU unit latency; unpipelined units stay busy)
+#   complete - results are broadcast to the waiting instructions; a branch
+#              or jump found mispredicted squashes every younger instruction
+#              and redirects fetch
+#   dispatch - up to 'width' fetched instructions are renamed (the register
+#              alias table maps a register key to the ROB entry that will
+#              write it) and enter the ROB, their station and the LSQ
+#   fetch    - up to 'width' instructions along the predicted path
+# A load issues once every older store has its address: it takes the data
+# of the youngest older store covering it, waits while one only partly
+# overlaps, and reads memory otherwise. CSR instructions are serialising:
+# they dispatch into an empty ROB and execute at commit. A memory fault
+# on the wrong path is only raised if the load commits.
+
+from collections import deque
+
+from control_unit import CSR_OPS
+from fpu import rounding_mode
+from memory_unit import MemoryFault
+from perf_counters import INST_CLASS
+from pipeline import IF_ID, NOP_INSTRUCTION
+from tracing import tracer, BRANCH, MEM, WB, PIPE, DECODE, STATE
+from utils import decodeWord
+
+MASK64 = (1 << 64) - 1
+
+# Station per retirement class; CSR and system instructions have none
+STATION_OF_CLASS = {'alu': 'alu', 'mext': 'mul', 'load': 'mem', 'store': 'mem', 'branch': 'branch',
+                    'jump': 'branch', 'fp': 'fp'}
+STATION = {name: STATION_OF_CLASS.get(cls) for name, cls in INST_CLASS.items()}
+
+# station -> (entries, units issuing per cycle)
+DEFAULT_STATIONS = {'alu': (16, 2), 'mul': (4, 1), 'mem': (8, 1), 'branch': (8, 1), 'fp': (8, 2)}
+DEFAULT_ROB = 64
+DEFAULT_LSQ = 16
+
+
+class RobEntry:
+    __slots__ = ('seq', 'pc', 'inst', 'ctrl', 'station', 'dest', 'ops', 'pending', 'waiters', 'value', 'fflags',
+                 'done', 'squashed', 'predicted_pc', 'next_pc', 'taken', 'mispredicted', 'address', 'data', 'fault')
+
+    def __init__(self, seq, pc, inst, station, predicted_pc):
+        self.seq = seq
+        self.pc = pc
+        self.inst = inst
+        self.ctrl = inst.ctrl
+        self.station = station
+        self.dest = 0             # register key written at commit (0: none)
+        self.ops = [0, 0, 0]      # rs1, rs2, rs3 values once known
+        self.pending = 0          # operands still waiting for a broadcast
+        self.waiters = []         # (entry, operand index) to receive this result
+        self.value = 0
+        self.fflags = 0
+        self.done = False         # result broadcast; may commit
+        self.squashed = False
+        self.predicted_pc = predicted_pc
+        self.next_pc = pc + 4
+        self.taken = False
+        self.mispredicted = False
+        self.address = None       # loads/stores: effective address once issued
+        self.data = 0             # stores: the value to write
+        self.fault = None         # MemoryFault raised if the entry commits
+
+
+class OutOfOrderCore:
+    def __init__(self, sim, spec=None):
+        self.sim = sim
+        self.rob_size, self.lsq_size, self.stations = parse_spec(spec)
+        self.issued = dict.fromkeys(self.stations, 0)
+        self.reset()
+
+    def reset(self):
+        """Empty every structure (the architectural state is untouched)."""
+        self.rob = deque()
+        self.rat = {}                # register key -> youngest RobEntry writing it
+        self.waiting = {station: [] for station in self.stations}  # dispatched, not yet issued, oldest first
+        self.lsq = deque()           # loads and stores in program order
+        self.fetch_queue = deque()   # IF_ID entries
+        self.finishing = {}          # cycle -> entries whose result is broadcast that cycle
+        self.unit_free = {}          # (station, unpipelined unit) -> first cycle it can start again
+        self.seq = 0
+        self.serialising = False     # a CSR instruction is in the ROB
+        self.commit_busy = 0         # cycles commit still waits for a store's D-cache miss
+
+    def empty(self):
+        return not self.rob and not self.fetch_queue
+
+    def describe(self):
+        return (f"ROB {self.rob_size}, LSQ {self.lsq_size}, stations "
+                + ", ".join(f"{station} {entries}x{units}" for station, (entries, units) in self.stations.items()))
+
+    def stats(self):
+        return {'rob': self.rob_size, 'lsq': self.lsq_size,
+                'stations': {station: {'entries': entries, 'units': units, 'issued': self.issued[station]}
+                             for station, (entries, units) in self.stations.items()}}
+
+    # --- Stages ---
+
+    def commit(self, now):
+        """Retire up to 'width' finished instructions from the ROB head."""
+        sim = self.sim
+        counters = sim.counters
+        register_file = sim.register_file
+        profile = sim.profile
+        rob = self.rob
+        committed = 0
+        while committed < sim.width and rob:
+            entry = rob[0]
+            mnemonic = entry.inst.mnemonic
+            if not entry.done:
+                if entry.station is not None or mnemonic not in CSR_OPS:
+                    break
+                # Serialising: the ROB holds nothing older, so the CSR sees the committed state
+                entry.value = sim.csr_file.execute(mnemonic, entry.inst.imm & 0xFFF, entry.inst.rs1, entry.ops[0])
+                entry.done = True
+            if entry.fault is not None:
+                entry.fault.pc = entry.pc
+                raise entry.fault
+            ctrl = entry.ctrl
+            if ctrl.memWrite:
+                try:
+                    sim.memory.store(entry.address, ctrl.memWidth, entry.data)
+                except MemoryFault as e:
+                    e.pc = entry.pc
+                    raise
+                if tracer.mask & MEM:
+                    tracer.emit(MEM, 'store', pc=entry.pc, mnemonic=mnemonic, addr=entry.address, data=entry.data)
+                if sim.dcache is not None:
+                    self.commit_busy = sim.dcache.access(entry.address, ctrl.memWidth, True)
+                    if self.commit_busy and profile is not None:
+                        profile.charge(entry.pc, 'dcache', self.commit_busy)
+            rob.popleft()
+            if entry.station == 'mem':
+                self.lsq.popleft()
+            dest = entry.dest
+            if dest:
+                register_file.write_key(dest, entry.value)
+                if self.rat.get(dest) is entry:
+                    del self.rat[dest]
+                if tracer.mask & WB:
+                    tracer.emit(WB, 'write', rd=dest, value=entry.value, mnemonic=mnemonic)
+            if entry.fflags:
+                register_file.set_fcsr(register_file.fcsr | entry.fflags)
+            if entry.station == 'branch':
+                # Trained in program order; recovery already happened at completion
+                if sim.predictor.resolve(entry.pc, entry.inst, entry.taken, entry.next_pc, entry.predicted_pc):
+                    counters.flushes['branch' if ctrl.branch else mnemonic] += 1
+                    if profile is not None:
+                        profile.flush(entry.pc)
+                if ctrl.branch:
+                    counters.branches['taken' if entry.taken else 'not_taken'] += 1
+                if profile is not None and entry.taken:
+                    profile.transfer(entry.pc, entry.next_pc, entry.inst)
+            elif mnemonic in CSR_OPS:
+                self.serialising = False
+            counters.instret += 1
+            counters.retired[INST_CLASS[mnemonic]] += 1
+            if profile is not None:
+                profile.retired[entry.pc] += 1
+            committed += 1
+            if tracer.debug & PIPE:
+                tracer.emit(PIPE, 'commit', pc=entry.pc, mnemonic=mnemonic)
+            if self.commit_busy:
+                break
+
+    def issue(self, now):
+        """Start the oldest ready instructions of every station."""
+        for station, waiting in self.waiting.items():
+            if not waiting:
+                continue
+            units = self.stations[station][1]
+            started = 0
+            index = 0
+            while index < len(waiting) and started < units:
+                entry = waiting[index]
+                if entry.pending:
+                    index += 1
+                    continue
+                latency = self.execute(entry, now)
+                if latency is None:  # a load waiting on an older store, or a busy unit
+                    index += 1
+                    continue
+                del waiting[index]
+                self.finishing.setdefault(now + latency - 1, []).append(entry)
+                self.issued[station] += 1
+                started += 1
+                if tracer.debug & PIPE:
+                    tracer.emit(PIPE, 'issue', pc=entry.pc, mnemonic=entry.inst.mnemonic, station=station,
+                                latency=latency)
+
+    def execute(self, entry, now):
+        """Compute 'entry's result; returns its latency, or None if it cannot start this cycle."""
+        sim = self.sim
+        inst = entry.inst
+        ctrl = entry.ctrl
+        mnemonic = inst.mnemonic
+        op1, op2, op3 = entry.ops
+        station = entry.station
+
+        if station == 'mem':
+            address = ctrl.aluFn(op1, inst.imm)
+            if ctrl.memWrite:
+                entry.address = address
+                entry.data = op2
+                return 1
+            return self.load(entry, address, ctrl)
+
+        if station == 'fp':
+            unit = ctrl.fpUnit
+            latency = 1
+            if unit is not None:
+                latency, pipelined = sim.fpu.units[unit]
+                if not pipelined:
+                    if self.unit_free.get(('fp', unit), 0) > now:
+                        return None
+                    self.unit_free[('fp', unit)] = now + latency
+                sim.fpu.issued[unit] += 1
+            entry.value, entry.fflags = ctrl.fpuFn(op1, op2, op3, rounding_mode(inst.inst_word, sim.register_file.fcsr))
+            return latency
+
+        if station == 'mul':
+            muldiv = sim.muldiv
+            unit = ctrl.mulDivUnit
+            if self.unit_free.get(('mul', unit), 0) > now:
+                return None
+            latency = muldiv.latency(unit, mnemonic, op1, op2)
+            if not muldiv.units[unit][1]:
+                self.unit_free[('mul', unit)] = now + latency
+            muldiv.issued[unit] += 1
+            entry.value = ctrl.aluFn(op1, op2)
+            return latency
+
+        if station == 'branch':
+            pc = entry.pc
+            if ctrl.branch:
+                entry.taken = ctrl.aluFn(op1, op2) == 1
+                entry.next_pc = pc + inst.imm if entry.taken else pc + 4
+            else:
+                entry.taken = True
+                entry.next_pc = pc + inst.imm if mnemonic == 'jal' else (op1 + inst.imm) & ~1
+                entry.value = pc + 4
+            entry.mispredicted = entry.next_pc != entry.predicted_pc
+            return 1
+
+        entry.value = ctrl.aluFn(op1, inst.imm if ctrl.aluSrc else op2)
+        return 1
+
+    def load(self, entry, address, ctrl):
+        """Issue a load once memory ordering allows; returns its latency or None."""
+        width = ctrl.memWidth
+        end = address + width
+        source = None  # youngest older store overlapping the load
+        for other in self.lsq:
+            if other is entry:
+                break
+            if other.ctrl.memWrite:
+                if other.address is None:
+                    return None
+                if other.address < end and address < other.address + other.ctrl.memWidth:
+                    source = other
+        sim = self.sim
+        latency = 2
+        if source is None:
+            try:
+                entry.value = sim.memory.load(address, width, ctrl.memSigned)
+            except MemoryFault as e:
+                entry.address = address
+                entry.fault = e
+                return latency
+            if sim.dcache is not None:
+                latency += sim.dcache.access(address, width, False)
+        elif source.address <= address and end <= source.address + source.ctrl.memWidth:
+            bits = width * 8
+            value = ((source.data & ((1 << source.ctrl.memWidth * 8) - 1)) >> (address - source.address) * 8) \
+                & ((1 << bits) - 1)
+            if ctrl.memSigned and value >> (bits - 1):
+                value |= MASK64 ^ ((1 << bits) - 1)
+            entry.value = value
+        else:
+            return None  # partial overlap: wait until the store has committed
+        entry.address = address
+        if tracer.mask & MEM:
+            tracer.emit(MEM, 'load', pc=entry.pc, mnemonic=entry.inst.mnemonic, addr=address, data=entry.value,
+                        forwarded=source is not None)
+        return latency
+
+    def complete(self, now):
+        """
+        Broadcast the results finishing in cycle 'now'. Returns the
+        mispredicted control transfer to redirect fetch to, if any.
+        """
+        entries = self.finishing.pop(now, None)
+        if not entries:
+            return None
+        redirect = None
+        for entry in sorted(entries, key=lambda entry: entry.seq):
+            if entry.squashed:
+                continue
+            entry.done = True
+            value = entry.value
+            for consumer, index in entry.waiters:
+                consumer.ops[index] = value
+                consumer.pending -= 1
+            entry.waiters = None
+            if entry.mispredicted:
+                if tracer.mask & BRANCH:
+                    tracer.emit(BRANCH, 'mispredict', pc=entry.pc, predicted=entry.predicted_pc, target=entry.next_pc)
+                self.squash_younger(entry)
+                redirect = entry
+        return redirect
+
+    def squash_younger(self, entry):
+        """Drop every instruction younger than 'entry' and rebuild the alias table."""
+        rob = self.rob
+        while rob[-1] is not entry:
+            younger = rob.pop()
+            younger.squashed = True
+            if younger.inst.mnemonic in CSR_OPS:
+                self.serialising = False
+        lsq = self.lsq
+        while lsq and lsq[-1].squashed:
+            lsq.pop()
+        for station, waiting in self.waiting.items():
+            if waiting and waiting[-1].squashed:
+                self.waiting[station] = [other for other in waiting if not other.squashed]
+        for producer in rob:
+            if producer.waiters:
+                producer.waiters = [waiter for waiter in producer.waiters if not waiter[0].squashed]
+        self.rat = {producer.dest: producer for producer in rob if producer.dest}
+        self.fetch_queue.clear()
+
+    def dispatch(self):
+        """Rename up to 'width' fetched instructions into the ROB, stations and LSQ."""
+        sim = self.sim
+        stalls = sim.counters.stalls
+        fetch_queue = self.fetch_queue
+        rob = self.rob
+        rat = self.rat
+        value = sim.register_file.value
+        dispatched = 0
+        while dispatched < sim.width and fetch_queue:
+            if self.serialising:
+                break
+            fetched = fetch_queue[0]
+            inst_word = fetched.inst_word
+            if inst_word == NOP_INSTRUCTION:  # never enters the ROB, as in the in-order pipeline
+                fetch_queue.popleft()
+                dispatched += 1
+                continue
+            inst = decodeWord(inst_word)
+            mnemonic = inst.mnemonic
+            if mnemonic == 'UNKNOWN':
+                if tracer.mask & DECODE:
+                    tracer.emit(DECODE, 'unknown', pc=fetched.pc, inst_word=inst_word)
+                fetch_queue.popleft()
+                dispatched += 1
+                continue
+            station = STATION.get(mnemonic)
+            ctrl = inst.ctrl
+            if mnemonic in CSR_OPS and rob:
+                break  # serialising: wait for the ROB to drain
+            # A full structure is charged to its oldest entry, which holds it up
+            if len(rob) == self.rob_size:
+                stalls['rob'] += 1
+                if sim.profile is not None:
+                    sim.profile.charge(rob[0].pc, 'rob')
+                break
+            if station is not None and len(self.waiting[station]) == self.stations[station][0]:
+                stalls['rs'] += 1
+                if sim.profile is not None:
+                    sim.profile.charge(self.waiting[station][0].pc, 'rs')
+                break
+            if station == 'mem' and len(self.lsq) == self.lsq_size:
+                stalls['lsq'] += 1
+                if sim.profile is not None:
+                    sim.profile.charge(self.lsq[0].pc, 'lsq')
+                break
+
+            entry = RobEntry(self.seq, fetched.pc, inst, station, fetched.predicted_pc)
+            self.seq += 1
+            rd, rs1, rs2, rs3 = inst.keys
+            ops = entry.ops
+            for index, key in enumerate((rs1, rs2, rs3)):
+                if not key:
+                    continue
+                producer = rat.get(key)
+                if producer is None:
+                    ops[index] = value(key)
+                elif producer.done:
+                    ops[index] = producer.value
+                else:
+                    producer.waiters.append((entry, index))
+                    entry.pending += 1
+            if ctrl.regWrite and rd:
+                entry.dest = rd
+                rat[rd] = entry
+            rob.append(entry)
+            if station is None:
+                if mnemonic in CSR_OPS:
+                    self.serialising = True
+                else:
+                    entry.done = True  # ecall, ebreak, fence: no operation here
+            else:
+                self.waiting[station].append(entry)
+                if station == 'mem':
+                    self.lsq.append(entry)
+            fetch_queue.popleft()
+            dispatched += 1
+            if tracer.debug & PIPE:
+                tracer.emit(PIPE, 'dispatch', pc=entry.pc, mnemonic=mnemonic, station=station, rob=len(rob))
+
+    def fetch(self, pc):
+        """Fetch up to 'width' instructions along the predicted path; returns the next PC."""
+        sim = self.sim
+        hazard_unit = sim.hazard_unit
+        icache = sim.icache
+        mem_size = sim.memory.size
+        fetch_queue = self.fetch_queue
+        fetched = 0
+        while len(fetch_queue) < sim.width and pc < mem_size:
+            if icache is not None and pc + 4 <= mem_size:
+                if not hazard_unit.fetch_probed:
+                    hazard_unit.fetch_probed = True
+                    hazard_unit.fetch_busy = icache.access(pc, 4)
+                    if hazard_unit.fetch_busy and tracer.mask & MEM:
+                        tracer.emit(MEM, 'icache_miss', pc=pc, stall=hazard_unit.fetch_busy)
+                if hazard_unit.fetch_busy:
+                    break
+            entry = IF_ID()
+            sim.fetch(pc, entry)
+            fetch_queue.append(entry)
+            hazard_unit.fetch_probed = False
+            fetched += 1
+            if entry.predicted_pc != pc + 4:
+                pc = entry.predicted_pc
+                break
+            pc += 4
+        if hazard_unit.fetch_busy:
+            hazard_unit.fetch_busy -= 1
+            if not fetched:
+                sim.counters.stalls['icache'] += 1
+                if sim.profile is not None:
+                    sim.profile.charge(pc, 'icache')
+        return pc
+
+    # --- Simulation ---
+
+    def run(self, max_cycles):
+        """Simulator.run() for the out-of-order core. Returns a SimResult."""
+        sim = self.sim
+        counters = sim.counters
+        hazard_unit = sim.hazard_unit
+        start = counters.snapshot()
+        if sim.reg_epoch is None:
+            sim.mark_baseline()
+        register_file, memory = sim.register_file, sim.memory
+        if tracer.configured(STATE):
+            cycle_reg_epoch, cycle_mem_epoch = register_file.track(), memory.track()
+        else:
+            cycle_reg_epoch = None
+        icache_misses = sim.icache.misses if sim.icache is not None else 0
+        dcache_misses = sim.dcache.misses if sim.dcache is not None else 0
+        mem_size = memory.size
+        pc = sim.pc
+
+        cycle = 0
+        halted = False
+        while cycle < max_cycles:
+            now = counters.cycles
+            tracer.cycle = now
+            if tracer.cycle >= tracer.next_toggle:
+                tracer.toggle(tracer.cycle)
+
+            if self.commit_busy:
+                self.commit_busy -= 1
+                counters.stalls['dcache'] += 1
+            else:
+                self.commit(now)
+            self.issue(now)
+            redirect = self.complete(now)
+            if redirect is not None:
+                pc = redirect.next_pc
+                hazard_unit.fetch_busy = 0
+                hazard_unit.fetch_probed = False
+                if tracer.debug & PIPE:
+                    tracer.emit(PIPE, 'redirect', target=pc)
+            self.dispatch()
+            pc = self.fetch(pc)
+
+            cycle += 1
+            counters.cycles += 1
+
+            if cycle_reg_epoch is not None:
+                reg_delta = register_file.changes(cycle_reg_epoch, clear=True)
+                mem_delta = memory.changes(cycle_mem_epoch, clear=True)
+                if tracer.mask & STATE and (reg_delta or mem_delta):
+                    tracer.emit(STATE, 'delta', regs={name: new for name, (_, new) in reg_delta.items()},
+                                mem={f"{address:#x}": new for address, (_, new) in mem_delta.items()})
+
+            if pc >= mem_size and not self.rob and not self.fetch_queue:
+                halted = True
+                break
+
+        sim.pc = pc
+        if cycle_reg_epoch is not None:
+            register_file.untrack(cycle_reg_epoch)
+            memory.untrack(cycle_mem_epoch)
+        return sim.run_result(cycle, start, icache_misses, dcache_misses, halted)
+
+
+def parse_spec(spec):
+    """
+    (rob entries, LSQ entries, {station: (entries, units)}) from
+    'rob=N,lsq=N,STATION=ENTRIES[:UNITS],...' over the defaults, with
+    stations alu, mul, mem, branch and fp, e.g. 'rob=128,alu=32:4'.
+    """
+    rob, lsq = DEFAULT_ROB, DEFAULT_LSQ
+    stations = dict(DEFAULT_STATIONS)
+    for field in (spec or '').split(','):
+        if not field:
+            continue
+        name, _, setting = field.partition('=')
+        entries, _, units = setting.partition(':')
+        try:
+            entries = int(entries)
+            units = int(units) if units else None
+        except ValueError:
+            raise ValueError(f"bad number in out-of-order core spec '{spec}'")
+        if name in ('rob', 'lsq'):
+            if units is not None:
+                raise ValueError(f"'{name}' takes a single size in out-of-order core spec '{spec}'")
+            if entries < 1:
+                raise ValueError(f"'{name}' needs at least one entry")
+            if name == 'rob':
+                rob = entries
+            else:
+                lsq = entries
+        elif name in stations:
+            units = stations[name][1] if units is None else units
+            if entries < 1 or units < 1:
+                raise ValueError(f"station '{name}' needs at least one entry and one unit")
+            stations[name] = (entries, units)
+        else:
+            raise ValueError(f"unknown out-of-order core setting '{name}' in spec '{spec}'"
+                             f" (expected rob, lsq or one of {', '.join(DEFAULT_STATIONS)})")
+    return rob, lsq, stations
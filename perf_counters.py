@@ -0,0 +1,82 @@
+# perf_counters.py
+# Hardware performance counters for the pipeline.
+#
+# The simulator bumps these as events happen; snapshots are plain dicts, so
+# they can be diffed between two points of a run or dumped as JSON. Guest
+# code sees cycle and instret through the CSRs in csr.py.
+
+import json
+
+from control_unit import CONTROL_TABLE, CSR_OPS
+
+M_EXT = {'mul', 'mulh', 'mulhsu', 'mulhu', 'div', 'divu', 'rem', 'remu'}
+INST_CLASSES = ('alu', 'mext', 'load', 'store', 'branch', 'jump', 'fp', 'system')
+# Why a superscalar issue group ended before the issue width (see superscalar.py)
+ISSUE_SPLITS = ('dependency', 'alu', 'mem', 'branch', 'serial', 'fpu', 'mext', 'control')
+
+
+def classify(mnemonic, ctrl):
+    """Retirement class of an instruction (one of INST_CLASSES)."""
+    if ctrl.memRead:
+        return 'load'
+    if ctrl.memWrite:
+        return 'store'
+    if ctrl.fpu:
+        return 'fp'
+    if ctrl.branch:
+        return 'branch'
+    if mnemonic == 'jal' or mnemonic == 'jalr':
+        return 'jump'
+    if mnemonic in M_EXT:
+        return 'mext'
+    if mnemonic in CSR_OPS or mnemonic in ('ecall', 'ebreak', 'fence', 'fence.i'):
+        return 'system'
+    return 'alu'
+
+
+# mnemonic -> class, for the retire stage
+INST_CLASS = {name: classify(name, ctrl) for name, ctrl in CONTROL_TABLE.items()}
+
+
+class PerfCounters:
+    def __init__(self):
+        self.cycles = 0
+        self.instret = 0
+        # Cycles lost, by cause ('structural': an FPU, multiplier or divider
+        # unit or its write port is busy; 'fpu' / 'mext': waiting for an FPU /
+        # multiply-divide result still in flight; 'rob', 'rs', 'lsq':
+        # out-of-order dispatch blocked by a full structure, see ooo.py)
+        self.stalls = {'load_use': 0, 'structural': 0, 'fpu': 0, 'mext': 0, 'icache': 0, 'dcache': 0, 'rob': 0,
+                       'rs': 0, 'lsq': 0}
+        # Pipeline flushes (mispredicted control transfers), by instruction kind
+        self.flushes = {'branch': 0, 'jal': 0, 'jalr': 0}
+        # Operands forwarded into EX, by source latch
+        self.forwards = {'ex_mem': 0, 'mem_wb': 0}
+        # Retired instructions by class
+        self.retired = dict.fromkeys(INST_CLASSES, 0)
+        # Resolved conditional branches
+        self.branches = {'taken': 0, 'not_taken': 0}
+        # Issue groups cut short before the issue width, by reason (superscalar.py)
+        self.splits = dict.fromkeys(ISSUE_SPLITS, 0)
+
+    def snapshot(self):
+        """All counters as a nested dict of ints (a copy)."""
+        return {
+            'cycles': self.cycles,
+            'instret': self.instret,
+            'stalls': dict(self.stalls),
+            'flushes': dict(self.flushes),
+            'forwards': dict(self.forwards),
+            'retired': dict(self.retired),
+            'branches': dict(self.branches),
+            'splits': dict(self.splits),
+        }
+
+    def to_json(self, indent=2):
+        return json.dumps(self.snapshot(), indent=indent)
+
+
+def diff(after, before):
+    """Counter-wise difference of two snapshots (after - before)."""
+    return {key: diff(value, before[key]) if isinstance(value, dict) else value - before[key]
+            for key, value in after.items()}
@@ -1,50 +1,116 @@
-#AKSHAT BKL WRITE UR CODE FOR PHASE 5 HERE 
+# pipeline.py
+# Pipeline registers (latches) between the five stages.
+#
+# Each latch is a fixed-slot object that a stage overwrites in place. The
+# simulator keeps two of each (current / next): stages read 'current' and
+# fill 'next', and the pair is swapped at the end of the cycle. Holding a
+# latch during a stall is simply not swapping it, and a flush is bubble().
+# Register fields (rd, rs1, rs2, rs3) hold register keys: f-registers are
+# offset by register_file.FREG_BASE, so hazard checks cover both files.
 
+from control_unit import NOP_SIGNALS
+
+NOP_INSTRUCTION = 0x00000013  # addi x0, x0, 0
+
+
+class IF_ID:
+    __slots__ = ('pc', 'inst_word', 'predicted_pc')
+
+    def __init__(self):
+        self.bubble()
+
+    def bubble(self):
+        self.pc = 0
+        self.inst_word = NOP_INSTRUCTION
+        self.predicted_pc = 0  # where fetch went next (see branch_predictor.py)
+
+
+class ID_EX:
+    __slots__ = ('pc', 'inst_word', 'ctrl', 'rs1_val', 'rs2_val', 'rs3_val', 'imm', 'rd', 'rs1', 'rs2', 'rs3', 'mnemonic',
+                 'predicted_pc')
+
+    def __init__(self):
+        self.bubble()
+
+    def bubble(self):
+        self.pc = 0
+        self.inst_word = NOP_INSTRUCTION
+        self.ctrl = NOP_SIGNALS
+        self.rs1_val = 0
+        self.rs2_val = 0
+        self.rs3_val = 0  # FMA addend
+        self.imm = 0
+        self.rd = 0
+        self.rs1 = 0
+        self.rs2 = 0
+        self.rs3 = 0
+        self.mnemonic = 'nop'
+        self.predicted_pc = 0
+
+
+class EX_MEM:
+    __slots__ = ('pc', 'inst_word', 'ctrl', 'alu_result', 'rs2_val', 'rd', 'branch_target', 'branch_taken', 'mispredicted', 'mnemonic')
+
+    def __init__(self):
+        self.bubble()
+
+    def bubble(self):
+        self.pc = 0
+        self.inst_word = NOP_INSTRUCTION
+        self.ctrl = NOP_SIGNALS
+        self.alu_result = 0
+        self.rs2_val = 0
+        self.rd = 0
+        self.branch_target = 0
+        self.branch_taken = False
+        self.mispredicted = False  # fetch went the wrong way; branch_target is the correct PC
+        self.mnemonic = 'nop'
+
+
+class MEM_WB:
+    __slots__ = ('pc', 'inst_word', 'ctrl', 'mem_data', 'alu_result', 'rd', 'mnemonic')
+
+    def __init__(self):
+        self.bubble()
+
+    def bubble(self):
+        self.pc = 0
+        self.inst_word = NOP_INSTRUCTION
+        self.ctrl = NOP_SIGNALS
+        self.mem_data = 0
+        self.alu_result = 0
+        self.rd = 0
+        self.mnemonic = 'nop'
 
 
 # Memory Stage
 def mem_stage(ex_mem, mem_wb, memory):
-    mem_wb.clear()
-    
-    mem_wb["rd"] = ex_mem.get("rd")
-    mem_wb["reg_write"] = ex_mem.get("reg_write")
-    mem_wb["mem_to_reg"] = ex_mem.get("mem_to_reg")
-    mem_wb["alu_result"] = ex_mem.get("alu_result")
-    mem_wb["fp_op"] = ex_mem.get("fp_op", False)  # for WB to know if float
-    mem_wb["float_write"] = ex_mem.get("float_write", False)
-
-    addr = ex_mem.get("alu_result")
-    rs2_val = ex_mem.get("rs2_val")
-    opcode = ex_mem.get("opcode")
-
-    if opcode in ["lw", "ld", "flw", "fld"]:
-        # Load from memory
-        val = memory.get(addr, 0)
-        mem_wb["mem_data"] = val
-
-    elif opcode in ["sw", "sd", "fsw", "fsd"]:
-        # Store to memory
-        memory[addr] = rs2_val
-        mem_wb["mem_data"] = None  # nothing to write back
+    mem_wb.pc = ex_mem.pc
+    mem_wb.inst_word = ex_mem.inst_word
+    mem_wb.ctrl = ex_mem.ctrl
+    mem_wb.alu_result = ex_mem.alu_result
+    mem_wb.rd = ex_mem.rd
+    mem_wb.mnemonic = ex_mem.mnemonic
 
+    addr = ex_mem.alu_result
+    ctrl = ex_mem.ctrl
+    if ctrl.memRead:
+        # Load from memory
+        mem_wb.mem_data = memory.load(addr, ctrl.memWidth, ctrl.memSigned)
     else:
-        mem_wb["mem_data"] = None  # ALU result only
+        if ctrl.memWrite:
+            # Store to memory
+            memory.store(addr, ctrl.memWidth, ex_mem.rs2_val)
+        mem_wb.mem_data = 0  # ALU result only
 
 
 # Write Back Stage
-def wb_stage(mem_wb, reg_file, fp_reg_file):
-    rd = mem_wb.get("rd")
-    reg_write = mem_wb.get("reg_write", False)
-    mem_to_reg = mem_wb.get("mem_to_reg", False)
-    alu_result = mem_wb.get("alu_result")
-    mem_data = mem_wb.get("mem_data")
-    fp_op = mem_wb.get("fp_op", False)
-    float_write = mem_wb.get("float_write", False)
-
-    if reg_write and rd is not None:
-        write_data = mem_data if mem_to_reg else alu_result
-
-        if float_write:
-            fp_reg_file.write(rd, write_data)
+def wb_stage(mem_wb, reg_file):
+    ctrl = mem_wb.ctrl
+    if ctrl.regWrite:
+        write_data = mem_wb.mem_data if ctrl.memToReg else mem_wb.alu_result
+
+        if ctrl.regFiles[0] == 'f':
+            reg_file.fwrite(mem_wb.rd, write_data)
         else:
-            reg_file.write(rd, write_data)
+            reg_file.write(mem_wb.rd, write_data)
@@ -1,10 +1,8 @@
-from register_file import RegisterFile, FloatRegisterFile
-from pipeline import IF_ID, ID_EX, EX_MEM, MEM_WB
-from control_unit import decode_instruction
-from execute_stage import execute_stage
-from alu import alu_operation
-from utils import get_bits, sign_extend
-from hazard_unit import HazardUnit
+from register_file import RegisterFile
+from pipeline import IF_ID, ID_EX, EX_MEM, MEM_WB, mem_stage, wb_stage
+from utils import decodeWord
+from HazardUnit import HazardUnit
+from memory_unit import PagedMemory
 
 # Instruction memory (hardcoded)
 instruction_memory = {
@@ -15,17 +13,16 @@ instruction_memory = {
     16: 0x00000000
 }
 
-data_memory = {}
+data_memory = PagedMemory()
 
-# Pipeline registers
-if_id = IF_ID()
-id_ex = ID_EX()
-ex_mem = EX_MEM()
-mem_wb = MEM_WB()
+# Pipeline registers: current and next copy of each, swapped every cycle
+if_id, if_id_next = IF_ID(), IF_ID()
+id_ex, id_ex_next = ID_EX(), ID_EX()
+ex_mem, ex_mem_next = EX_MEM(), EX_MEM()
+mem_wb, mem_wb_next = MEM_WB(), MEM_WB()
 
-# Register files
+# Register file (integer + floating point)
 reg_file = RegisterFile()
-fp_reg_file = FloatRegisterFile()
 
 # PC and cycle
 pc = 0
@@ -33,8 +30,6 @@ cycle = 0
 
 done = False
 hazard_unit = HazardUnit()
-stall = False
-flush = False
 
 print("Cycle-by-cycle simulation\n")
 
@@ -42,81 +37,74 @@ while not done and cycle < 20:
     print(f"Cycle {cycle}:")
 
     # WB stage
-    rd = mem_wb.get("rd")
-    if mem_wb.get("reg_write") and rd is not None:
-        val = mem_wb["mem_data"] if mem_wb.get("mem_to_reg") else mem_wb["alu_result"]
-        if mem_wb.get("float_write"):
-            fp_reg_file.write(rd, val)
-        else:
-            reg_file.write(rd, val)
+    wb_stage(mem_wb, reg_file)
 
     # MEM stage
-    mem_wb.clear()
-    mem_wb.update({
-        "rd": ex_mem.get("rd"),
-        "reg_write": ex_mem.get("reg_write"),
-        "mem_to_reg": ex_mem.get("mem_to_reg"),
-        "alu_result": ex_mem.get("alu_result"),
-        "fp_op": ex_mem.get("fp_op", False),
-        "float_write": ex_mem.get("float_write", False),
-    })
-
-    addr = ex_mem.get("alu_result")
-    rs2_val = ex_mem.get("rs2_val")
-    opcode = ex_mem.get("opcode")
-
-    if opcode in ["lw", "ld", "flw", "fld"]:
-        mem_wb["mem_data"] = data_memory.get(addr, 0)
-    elif opcode in ["sw", "sd", "fsw", "fsd"]:
-        data_memory[addr] = rs2_val
-        mem_wb["mem_data"] = None
-    else:
-        mem_wb["mem_data"] = None
+    mem_stage(ex_mem, mem_wb_next, data_memory)
+
+    # Detect load-use hazard between the instruction in ID/EX and the load in EX/MEM
+    stall = hazard_unit.detect_load_use_hazard(id_ex, ex_mem)
+    flush = False
 
-    # EX stage
-    execute_stage(id_ex, ex_mem, reg_file, fp_reg_file)
+    # EX stage (no forwarding in this simple driver)
+    if stall:
+        ex_mem_next.bubble()
+    else:
+        ctrl = id_ex.ctrl
+        op2 = id_ex.imm if ctrl.aluSrc else id_ex.rs2_val
+        ex_mem_next.pc = id_ex.pc
+        ex_mem_next.inst_word = id_ex.inst_word
+        ex_mem_next.ctrl = ctrl
+        ex_mem_next.alu_result = ctrl.aluFn(id_ex.rs1_val, op2)
+        ex_mem_next.rs2_val = id_ex.rs2_val
+        ex_mem_next.rd = id_ex.rd
+        ex_mem_next.mnemonic = id_ex.mnemonic
+        ex_mem_next.branch_taken = False
+        if id_ex.mnemonic in ('jal', 'jalr'):
+            ex_mem_next.alu_result = id_ex.pc + 4
+            ex_mem_next.branch_taken = True
+            ex_mem_next.branch_target = id_ex.pc + id_ex.imm if id_ex.mnemonic == 'jal' else (id_ex.rs1_val + id_ex.imm) & ~1
+        elif ctrl.branch and ex_mem_next.alu_result:
+            ex_mem_next.branch_taken = True
+            ex_mem_next.branch_target = id_ex.pc + id_ex.imm
+        # Check for control hazard
+        flush = ex_mem_next.branch_taken
 
     # ID stage
     if not stall:
-        id_ex.clear()
-        instr = if_id.get("instr")
-        if instr is not None:
-            decoded = decode_instruction(instr)
-            id_ex.update(decoded)
-            id_ex["rs1_val"], id_ex["rs2_val"] = reg_file.read(decoded["rs1"], decoded["rs2"])
-
-            # Check for control hazard
-            if decoded["opcode"] in ["jal", "jalr", "beq", "bne", "blt", "bge"]:
-                flush = True
-
-            # Detect load-use hazard
-            if hazard_unit.detect_load_use_hazard(id_ex, ex_mem):
-                stall = True
-
-    else:
-        # Insert bubble
-        id_ex.clear()
-        stall = False
+        decoded = decodeWord(if_id.inst_word)
+        id_ex_next.pc = if_id.pc
+        id_ex_next.inst_word = if_id.inst_word
+        id_ex_next.ctrl = decoded.ctrl
+        id_ex_next.rs1_val, id_ex_next.rs2_val = reg_file.read(decoded.rs1, decoded.rs2)
+        id_ex_next.imm = decoded.imm
+        id_ex_next.rd = decoded.rd
+        id_ex_next.rs1 = decoded.rs1
+        id_ex_next.rs2 = decoded.rs2
+        id_ex_next.mnemonic = decoded.mnemonic
 
     # IF stage
     if not stall:
-        instr = instruction_memory.get(pc, 0)
-        if_id.clear()
-        if_id.update({"instr": instr, "pc": pc})
+        if_id_next.pc = pc
+        if_id_next.inst_word = instruction_memory.get(pc, 0)
         pc += 4
-    else:
-        # Hold IF/ID during stall
-        pass
 
     if flush:
-        if_id.clear()
-        id_ex.clear()
-        flush = False
-
-    print(f"\tIF: PC={if_id.get('pc')}, Instr={hex(if_id.get('instr', 0))}")
-    print(f"\tID: {id_ex}")
-    print(f"\tEX: {ex_mem}")
-    print(f"\tMEM: {mem_wb}")
+        if_id_next.bubble()
+        id_ex_next.bubble()
+        pc = ex_mem_next.branch_target
+
+    # Latch update: hold IF/ID and ID/EX during a stall
+    mem_wb, mem_wb_next = mem_wb_next, mem_wb
+    ex_mem, ex_mem_next = ex_mem_next, ex_mem
+    if not stall:
+        id_ex, id_ex_next = id_ex_next, id_ex
+        if_id, if_id_next = if_id_next, if_id
+
+    print(f"\tIF: PC={if_id.pc}, Instr={hex(if_id.inst_word)}")
+    print(f"\tID: {id_ex.mnemonic}")
+    print(f"\tEX: {ex_mem.mnemonic} -> {ex_mem.alu_result:#x}")
+    print(f"\tMEM: {mem_wb.mnemonic}")
 
     if pc >= max(instruction_memory.keys()):
         done = True
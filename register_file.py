@@ -1,11 +1,30 @@
+from fpu import to_float
+
+# Register keys, used by the change tracking below and by the pipeline's
+# hazard checks: 0-31 are x0-x31, 32-63 are f0-f31 and FCSR_KEY is fcsr
+FREG_BASE = 32
+FCSR_KEY = 64
+
+
+def register_name(key):
+    if key < FREG_BASE:
+        return f"x{key}"
+    if key < FCSR_KEY:
+        return f"f{key - FREG_BASE}"
+    return "fcsr"
+
+
 class RegisterFile:
     def __init__(self):
         # Integer registers x0–x31 (64-bit)
         self.regs = [0] * 32
-        # Floating-point registers f0–f31 (64-bit)
-        self.fregs = [0.0] * 32
+        # Floating-point registers f0–f31: raw 64-bit IEEE-754 patterns (see fpu.py)
+        self.fregs = [0] * 32
         # Floating-Point Control and Status Register (32-bit)
         self.fcsr = 0
+        # Open change-tracking epochs: each maps register key -> value before
+        # its first write in the epoch (see track())
+        self.epochs = []
 
     # Integer register read
     def read(self, rs1, rs2):
@@ -17,6 +36,9 @@ class RegisterFile:
     # Integer register write
     def write(self, rd, value):
         if rd != 0:
+            for epoch in self.epochs:
+                if rd not in epoch:
+                    epoch[rd] = self.regs[rd]
             self.regs[rd] = value
 
     # Floating-point register read
@@ -26,26 +48,96 @@ class RegisterFile:
     def fread1(self, frs1):
         return self.fregs[frs1]
 
-    # Floating-point register write
+    # Floating-point register write (f0 is an ordinary register)
     def fwrite(self, frd, value):
-        if frd != 0:
-            self.fregs[frd] = value
+        for epoch in self.epochs:
+            if FREG_BASE + frd not in epoch:
+                epoch[FREG_BASE + frd] = self.fregs[frd]
+        self.fregs[frd] = value
+
+    # Write by register key (see register_name())
+    def write_key(self, key, value):
+        if key < FREG_BASE:
+            self.write(key, value)
+        else:
+            self.fwrite(key - FREG_BASE, value)
 
     # FCSR access
     def get_fcsr(self):
         return self.fcsr
 
     def set_fcsr(self, value):
+        for epoch in self.epochs:
+            if FCSR_KEY not in epoch:
+                epoch[FCSR_KEY] = self.fcsr
         self.fcsr = value & 0xFFFFFFFF  # mask to 32 bits
 
-    # Dump all registers
-    def dump(self):
+    # --- Change tracking ---
+    # An epoch records the old value of each register on its first write, so
+    # the changes since the epoch began cost O(registers written), not a
+    # copy and compare of the whole file. Code that assigns self.regs
+    # directly (the functional cores) calls note_all() first.
+
+    def track(self):
+        """Open a change-tracking epoch; returns its handle."""
+        epoch = {}
+        self.epochs.append(epoch)
+        return epoch
+
+    def untrack(self, epoch):
+        self.epochs.remove(epoch)
+
+    def note_all(self):
+        """Record every register as possibly written in all open epochs."""
+        for epoch in self.epochs:
+            for key, value in enumerate(self.regs):
+                epoch.setdefault(key, value)
+            for key, value in enumerate(self.fregs, FREG_BASE):
+                epoch.setdefault(key, value)
+            epoch.setdefault(FCSR_KEY, self.fcsr)
+
+    def value(self, key):
+        if key < FREG_BASE:
+            return self.regs[key]
+        if key < FCSR_KEY:
+            return self.fregs[key - FREG_BASE]
+        return self.fcsr
+
+    def changes(self, epoch, clear=False):
+        """
+        {register name: (old, new)} for the registers whose value differs
+        from the start of 'epoch', in key order. 'clear' starts a new epoch
+        on the same handle.
+        """
+        out = {}
+        for key in sorted(epoch):
+            old, new = epoch[key], self.value(key)
+            if old != new:
+                out[register_name(key)] = (old, new)
+        if clear:
+            epoch.clear()
+        return out
+
+    # Dump all registers, or only those changed in 'epoch'
+    def dump(self, epoch=None):
+        if epoch is not None:
+            changes = self.changes(epoch)
+            print("Registers changed (old -> new):")
+            if not changes:
+                print("  (none)")
+            for name, (old, new) in changes.items():
+                if name.startswith('f') and name != 'fcsr':
+                    print(f"  {name}: {old:#x} -> {new:#x} ({to_float(new):g})")
+                else:
+                    print(f"  {name}: {old:#x} -> {new:#x}")
+            return
+
         print("Integer Registers:")
         for i in range(0, 32, 4):
             print(f"x{i}: {self.regs[i]:#x}\tx{i+1}: {self.regs[i+1]:#x}\tx{i+2}: {self.regs[i+2]:#x}\tx{i+3}: {self.regs[i+3]:#x}")
         
         print("\nFloating-Point Registers:")
         for i in range(0, 32, 4):
-            print(f"f{i}: {self.fregs[i]:.6f}\tf{i+1}: {self.fregs[i+1]:.6f}\tf{i+2}: {self.fregs[i+2]:.6f}\tf{i+3}: {self.fregs[i+3]:.6f}")
+            print(f"f{i}: {to_float(self.fregs[i]):.6f}\tf{i+1}: {to_float(self.fregs[i+1]):.6f}\tf{i+2}: {to_float(self.fregs[i+2]):.6f}\tf{i+3}: {to_float(self.fregs[i+3]):.6f}")
 
         print(f"\nFCSR: 0x{self.fcsr:08x}")
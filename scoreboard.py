@@ -0,0 +1,118 @@
+# scoreboard.py
+# Scoreboard of the multi-cycle functional units beside the pipeline (the
+# FPU units in fpu.py, the multiplier and divider in muldiv.py).
+#
+# An op computes its result in EX, issues into its unit and leaves the
+# pipeline; the result is written to register 'key' at the end of cycle
+# 'done' (issue cycle + latency - 1) through the units' shared write port,
+# and the op retires there. 'pending' maps each register an op in flight
+# will write to that op, so its ready cycle is known: decode holds an
+# instruction that reads such a register (RAW) or writes it (WAW: writes
+# stay in order) until it has been written, while independent
+# instructions keep flowing past the long op. A pipelined unit accepts an
+# op every cycle, an unpipelined one only once its current op is done; an
+# op whose result would collide with another's on the port waits in EX.
+
+import bisect
+from collections import namedtuple
+
+# An op in flight: 'bits' goes to register 'key' (register_file keys) at the end of cycle 'done'
+UnitOp = namedtuple("UnitOp", ["done", "unit", "key", "bits", "fflags", "pc", "mnemonic"])
+
+
+class Scoreboard:
+    """
+    Units 'defaults' (unit -> (latency in cycles, pipelined)) with the
+    overrides in 'units'; 'name' labels error messages ('FPU', ...).
+    """
+
+    def __init__(self, name, defaults, units=None):
+        self.name = name
+        self.units = dict(defaults)
+        if units:
+            self.units.update(units)
+        for unit, (latency, pipelined) in self.units.items():
+            if unit not in defaults:
+                raise ValueError(f"unknown {name} unit '{unit}' (expected one of {', '.join(defaults)})")
+            if latency < 2:
+                raise ValueError(f"{name} unit '{unit}': latency must be at least 2 (single-cycle ops run in EX)")
+        self.in_flight = []  # UnitOps ordered by completion cycle
+        self.pending = {}    # register key -> the UnitOp that will write it
+        self.issued = dict.fromkeys(self.units, 0)
+
+    def latency(self, unit, mnemonic, op1, op2):
+        """Cycles 'mnemonic' takes in 'unit' on operands op1, op2 (the unit's latency here)."""
+        return self.units[unit][0]
+
+    def blocked(self, unit, now):
+        """
+        Why an op cannot issue to 'unit' at cycle 'now': 'busy' (unpipelined
+        unit occupied), 'port' (its result slot is taken) or None.
+        """
+        latency, pipelined = self.units[unit]
+        done = now + latency - 1
+        for op in self.in_flight:
+            if op.done == done:
+                return 'port'
+            if not pipelined and op.unit == unit:
+                return 'busy'
+        return None
+
+    def issue(self, unit, now, key, bits, fflags, pc, mnemonic, latency=None):
+        """
+        Start an op (blocked() must have returned None) taking 'latency'
+        cycles, the unit's by default; returns its UnitOp. Results for x0
+        (key 0) are dropped at write-back and block no register.
+        """
+        op = UnitOp(now + (latency or self.units[unit][0]) - 1, unit, key, bits, fflags, pc, mnemonic)
+        bisect.insort(self.in_flight, op)
+        if key:
+            self.pending[key] = op
+        self.issued[unit] += 1
+        return op
+
+    def complete(self, now):
+        """Remove and return the op whose result is written in cycle 'now', or None."""
+        in_flight = self.in_flight
+        if in_flight and in_flight[0].done <= now:
+            op = in_flight.pop(0)
+            if op.key:
+                del self.pending[op.key]
+            return op
+        return None
+
+    def reset(self, ops=()):
+        """Drop every op in flight, or replace them with 'ops' (checkpoint restore)."""
+        self.in_flight = sorted(UnitOp(*op) for op in ops)
+        self.pending = {op.key: op for op in self.in_flight if op.key}
+
+    def describe(self):
+        return ", ".join(f"{unit} {latency}" + ("" if pipelined else " (unpipelined)")
+                         for unit, (latency, pipelined) in self.units.items())
+
+    def stats(self):
+        return {unit: {'latency': latency, 'pipelined': pipelined, 'issued': self.issued[unit]}
+                for unit, (latency, pipelined) in self.units.items()}
+
+
+def parse_units(name, spec, defaults):
+    """
+    Unit overrides {unit: (latency, pipelined)} from
+    'UNIT=LATENCY[:pipelined|unpipelined],...'; 'name' labels errors.
+    """
+    units = {}
+    for field in (spec or '').split(','):
+        if not field:
+            continue
+        unit, _, setting = field.partition('=')
+        latency, _, kind = setting.partition(':')
+        if unit not in defaults:
+            raise ValueError(f"unknown {name} unit '{unit}' in spec '{spec}' (expected one of {', '.join(defaults)})")
+        if kind not in ('', 'pipelined', 'unpipelined'):
+            raise ValueError(f"bad {name} unit kind '{kind}' in spec '{spec}' (expected pipelined or unpipelined)")
+        try:
+            latency = int(latency)
+        except ValueError:
+            raise ValueError(f"bad latency in {name} spec '{spec}'")
+        units[unit] = (latency, kind == 'pipelined' if kind else defaults[unit][1])
+    return units
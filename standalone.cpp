@@ -101,6 +101,8 @@ public:
     bool stall = false, flush = false;
     int branch_target_pc = -1;
     int instructions_executed = 0;
+    // Registers written with a new value since the last print_pipeline_state()
+    vector<int> dirty_regs, dirty_fpregs;
 
     Processor(const vector<string>& ins_in) {
         // same init logic...
@@ -252,10 +254,15 @@ private:
         if (MEM_WB.pc==-1) return;
 
         if (MEM_WB.reg_write && MEM_WB.write_reg>0) {
-            regs[MEM_WB.write_reg] = MEM_WB.mem_read_wb ? MEM_WB.mem_data : MEM_WB.alu_result_wb;
+            int64_t value = MEM_WB.mem_read_wb ? MEM_WB.mem_data : MEM_WB.alu_result_wb;
+            if (regs[MEM_WB.write_reg] != value) dirty_regs.push_back(MEM_WB.write_reg);
+            regs[MEM_WB.write_reg] = value;
         }
         else if (MEM_WB.fp_reg_write && MEM_WB.write_fp_reg>=0) {
-            fpregs[MEM_WB.write_fp_reg] = MEM_WB.fp_mem_read_wb ? MEM_WB.fp_mem_data : MEM_WB.fpu_result_wb;
+            double value = MEM_WB.fp_mem_read_wb ? MEM_WB.fp_mem_data : MEM_WB.fpu_result_wb;
+            if (double_to_int64(fpregs[MEM_WB.write_fp_reg]) != double_to_int64(value))
+                dirty_fpregs.push_back(MEM_WB.write_fp_reg);
+            fpregs[MEM_WB.write_fp_reg] = value;
         }
 
         if (MEM_WB.op!="NOP")
@@ -436,9 +443,6 @@ private:
 
 
     void print_pipeline_state() {
-        static vector<int64_t> prev_regs(32, 0);
-        static vector<double> prev_fpregs(32, 0.0);
-
         cout << "[Cycle " << setw(2) << clock << "] "
              << "PC=0x" << hex << pc << dec;
         if (stall) cout << " (Stall)";
@@ -480,27 +484,16 @@ private:
         dump_stage("EX/MEM", EX_MEM);
         dump_stage("MEM/WB", MEM_WB);
 
-        // Show registers that changed
+        // Show registers that changed (recorded by wb_stage; no snapshot copies)
         cout << "  Register Changes: ";
-        bool changed = false;
-        for (int i = 0; i < 32; ++i) {
-            if (regs[i] != prev_regs[i]) {
-                cout << "x" << i << "=" << regs[i] << " ";
-                changed = true;
-            }
-        }
-        for (int i = 0; i < 32; ++i) {
-            if (abs(fpregs[i] - prev_fpregs[i]) > 1e-9) {
-                cout << "f" << i << "=" << fixed << setprecision(2) << fpregs[i] << " ";
-                changed = true;
-            }
-        }
-        if (!changed) cout << "(none)";
+        for (int i : dirty_regs)
+            cout << "x" << i << "=" << regs[i] << " ";
+        for (int i : dirty_fpregs)
+            cout << "f" << i << "=" << fixed << setprecision(2) << fpregs[i] << " ";
+        if (dirty_regs.empty() && dirty_fpregs.empty()) cout << "(none)";
         cout << "\n------------------------------\n";
-
-        // Save snapshot
-        prev_regs = regs;
-        prev_fpregs = fpregs;
+        dirty_regs.clear();
+        dirty_fpregs.clear();
     }
 };
 
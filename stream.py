@@ -0,0 +1,138 @@
+# stream.py
+# Live, pull-based observation of a running Simulator.
+#
+# stream(sim, max_cycles) is a generator that clocks the simulator 'step'
+# cycles at a time and yields a CycleSnapshot after each step: what
+# occupies every stage, the ops in flight in the FPU and multiply/divide
+# units, and the counter deltas of the step (stalls, flushes, forwards,
+# retirements). Nothing runs while the consumer does not ask for the next
+# snapshot, so the simulation is paused between snapshots (its state can
+# be inspected, checkpointed or changed there) and resumes on next(); a
+# slow consumer is never flooded. Every step is one run() call, so a step
+# of one cycle runs several times slower than a plain run(); a larger
+# 'step' trades detail for speed. astream() is the same for asyncio:
+#
+#     async for snapshot in astream(sim, 10000, resume=dashboard.running):
+#         await dashboard.update(snapshot)
+#
+# 'categories' additionally collects the tracer events (tracing.py) of each
+# step into CycleSnapshot.events. The tracer is process-wide: only one
+# stream should collect events at a time, and no other Simulator should run
+# while it is suspended.
+
+import asyncio
+from collections import namedtuple
+
+from pipeline import NOP_INSTRUCTION
+from tracing import tracer, CATEGORY_NAMES, INFO
+from utils import decodeWord
+
+# One step of the run. 'cycle' counts the cycles so far; 'stages' maps each
+# stage to the (pc, mnemonic) of its instructions, oldest first; 'units'
+# maps 'fpu' and 'muldiv' to (pc, mnemonic, done cycle) of their ops in flight;
+# 'retired' is the instruction count of the step; 'retired_by_class',
+# 'stalls', 'flushes', 'forwards', 'branches' and 'splits' hold the
+# step's non-zero counter deltas; 'events' the tracer events as
+# (cycle, category, event, fields); 'halted' is True on the last snapshot
+# of a run that drained
+CycleSnapshot = namedtuple("CycleSnapshot", ["cycle", "pc", "stages", "units", "retired", "retired_by_class",
+                                             "stalls", "flushes", "forwards", "branches", "splits", "events",
+                                             "halted"])
+
+
+class ListSink:
+    """Tracer sink collecting events in memory until drained."""
+    def __init__(self):
+        self.events = []
+
+    def write(self, cycle, category, event, fields):
+        self.events.append((cycle, CATEGORY_NAMES[category], event, fields))
+
+    def drain(self):
+        events, self.events = self.events, []
+        return events
+
+    def close(self):
+        pass
+
+
+def _fetched(entries):
+    return [(entry.pc, decodeWord(entry.inst_word).mnemonic) for entry in entries
+            if entry.inst_word != NOP_INSTRUCTION]
+
+
+def _occupied(latches):
+    return [(latch.pc, latch.mnemonic) for latch in latches if latch.mnemonic != 'nop']
+
+
+def stage_occupancy(sim):
+    """What occupies each stage of 'sim': stage -> [(pc, mnemonic), ...], oldest first."""
+    if sim.ooo is not None:
+        return {'fetch': _fetched(sim.ooo.fetch_queue),
+                'rob': [(entry.pc, entry.inst.mnemonic) for entry in sim.ooo.rob if not entry.squashed]}
+    if sim.width > 1:
+        return {'IF/ID': _fetched(sim.fetch_buffer), 'ID/EX': _occupied(sim.id_ex_group),
+                'EX/MEM': _occupied(sim.ex_mem_group), 'MEM/WB': _occupied(sim.mem_wb_group)}
+    return {'IF/ID': _fetched((sim.if_id_reg,)), 'ID/EX': _occupied((sim.id_ex_reg,)),
+            'EX/MEM': _occupied((sim.ex_mem_reg,)), 'MEM/WB': _occupied((sim.mem_wb_reg,))}
+
+
+def _changes(after, before):
+    """Non-zero differences of two counter dicts (after - before)."""
+    return {name: n - before[name] for name, n in after.items() if n != before[name]}
+
+
+def stream(sim, max_cycles, step=1, categories=0, level=INFO):
+    """
+    Run 'sim' for at most 'max_cycles' cycles, yielding a CycleSnapshot
+    every 'step' cycles (and after the last one). 'categories' is a
+    tracing category mask whose events are collected at 'level'; it
+    cannot be combined with a tracer that is already enabled.
+    """
+    if step < 1:
+        raise ValueError(f"step must be at least 1, got {step}")
+    sink = None
+    if categories:
+        if tracer.sink is not None:
+            raise ValueError("the tracer is already enabled")
+        sink = ListSink()
+        tracer.enable(sink, categories, level)
+    try:
+        counters = sim.counters
+        before = counters.snapshot()
+        remaining = max_cycles
+        while remaining > 0:
+            result = sim.run(min(step, remaining))
+            remaining -= result.cycles
+            after = counters.snapshot()
+            units = {'fpu': [(op.pc, op.mnemonic, op.done) for op in sim.fpu.in_flight],
+                     'muldiv': [(op.pc, op.mnemonic, op.done) for op in sim.muldiv.in_flight]}
+            yield CycleSnapshot(counters.cycles, sim.pc, stage_occupancy(sim), units,
+                                after['instret'] - before['instret'], _changes(after['retired'], before['retired']),
+                                _changes(after['stalls'], before['stalls']),
+                                _changes(after['flushes'], before['flushes']),
+                                _changes(after['forwards'], before['forwards']),
+                                _changes(after['branches'], before['branches']),
+                                _changes(after['splits'], before['splits']),
+                                sink.drain() if sink is not None else [], result.halted)
+            before = after
+            if result.halted or not result.cycles:
+                break
+    finally:
+        if sink is not None:
+            tracer.disable()
+
+
+async def astream(sim, max_cycles, step=1, categories=0, level=INFO, resume=None):
+    """
+    stream() as an async generator. After each snapshot it yields to the
+    event loop; with an asyncio.Event 'resume' it also waits, before the
+    next step, until the event is set, so another task can pause and
+    resume the run by clearing and setting it.
+    """
+    for snapshot in stream(sim, max_cycles, step, categories, level):
+        yield snapshot
+        if resume is not None:
+            await resume.wait()
+        else:
+            await asyncio.sleep(0)
@@ -0,0 +1,121 @@
+# superscalar.py
+# Issue rules for the N-wide in-order pipeline (Simulator width > 1).
+#
+# Fetch delivers up to N sequential instructions a cycle into a fetch buffer;
+# decode takes an issue group of up to N from its head, in program order, and
+# the group then moves through EX, MEM and WB in lock-step (a stall holds
+# the whole group). An instruction ends the group before it when it
+#   - reads or writes a register an older one in the group writes
+#     ('dependency': there is no forwarding within a group),
+#   - needs an issue port the group has used up ('alu', 'mem', 'branch'),
+#   - is a CSR/system instruction, which issues alone ('serial'),
+#   - is a second multi-cycle FP op (one FPU issue per cycle, 'fpu'),
+#   - is a second multiply/divide (one issue into muldiv.py's units, 'mext').
+# A branch or jump is always the last instruction of its group ('control'),
+# so a misprediction only flushes younger groups. Groups cut short are
+# counted by reason in PerfCounters.splits.
+# While a D-cache miss freezes the groups, the FPU and multiply/divide units
+# keep running; an op that would write a register an older frozen latch
+# still writes waits until that latch has written back (held_write).
+
+from control_unit import CSR_OPS
+from perf_counters import INST_CLASS
+
+PORTS = ('alu', 'mem', 'branch')
+
+# Issue port per mnemonic: loads/stores use 'mem', branches/jumps 'branch',
+# everything else (integer, M-extension and FP ops) 'alu'
+PORT = {name: {'load': 'mem', 'store': 'mem', 'branch': 'branch', 'jump': 'branch'}.get(cls, 'alu')
+        for name, cls in INST_CLASS.items()}
+
+# Issue alone: they read or change state the other instructions in flight depend on
+SERIAL = {name for name, cls in INST_CLASS.items() if cls == 'system'} | CSR_OPS
+
+
+class IssueGroup:
+    """Builds one cycle's issue group under the port limits 'ports' (port -> count)."""
+
+    def __init__(self, ports):
+        self.ports = ports
+        self.start()
+
+    def start(self):
+        self.size = 0
+        self.used = dict.fromkeys(self.ports, 0)
+        self.written = set()  # register keys written by the group
+        self.serial = False
+        self.fpu = False
+        self.muldiv = False
+        self.closed = False   # a branch/jump joined: nothing may follow it
+
+    def check(self, inst):
+        """Why DecodedInst 'inst' cannot join the group ('control', 'dependency', ...), or None."""
+        if self.closed:
+            return 'control'
+        if not self.size:
+            return None
+        mnemonic = inst.mnemonic
+        if self.serial or mnemonic in SERIAL:
+            return 'serial'
+        port = PORT.get(mnemonic, 'alu')
+        if self.used[port] == self.ports[port]:
+            return port
+        written = self.written
+        if written:
+            rd, rs1, rs2, rs3 = inst.keys
+            if rs1 in written or rs2 in written or rs3 in written or (inst.ctrl.regWrite and rd in written):
+                return 'dependency'
+        if self.fpu and inst.ctrl.fpUnit is not None:
+            return 'fpu'
+        if self.muldiv and inst.ctrl.mulDivUnit is not None:
+            return 'mext'
+        return None
+
+    def add(self, inst):
+        """Add 'inst' to the group (check() must have returned None)."""
+        mnemonic = inst.mnemonic
+        ctrl = inst.ctrl
+        self.size += 1
+        self.used[PORT.get(mnemonic, 'alu')] += 1
+        if ctrl.regWrite and inst.keys[0] != 0:
+            self.written.add(inst.keys[0])
+        self.serial = mnemonic in SERIAL
+        self.fpu = self.fpu or ctrl.fpUnit is not None
+        self.muldiv = self.muldiv or ctrl.mulDivUnit is not None
+        self.closed = bool(ctrl.branch) or mnemonic == 'jal' or mnemonic == 'jalr'
+
+
+def held_write(key, *groups):
+    """True if a latch in one of the latch 'groups' has yet to write register 'key' (0: never)."""
+    if not key:
+        return False
+    for group in groups:
+        for latch in group:
+            if latch.rd == key and latch.ctrl.regWrite:
+                return True
+    return False
+
+
+def make_ports(spec, width):
+    """
+    Issue port counts from 'PORT=COUNT,...' (ports alu, mem, branch), e.g.
+    'alu=2,mem=1'. Unlisted ports default to 'width' ALU ports and one
+    memory and one branch port; each count must lie between 1 and 'width'.
+    """
+    if width < 1:
+        raise ValueError(f"issue width must be at least 1, got {width}")
+    ports = {'alu': width, 'mem': 1, 'branch': 1}
+    for field in (spec or '').split(','):
+        if not field:
+            continue
+        port, _, count = field.partition('=')
+        if port not in ports:
+            raise ValueError(f"unknown issue port '{port}' in spec '{spec}' (expected one of {', '.join(PORTS)})")
+        try:
+            ports[port] = int(count)
+        except ValueError:
+            raise ValueError(f"bad count in issue port spec '{spec}'")
+    for port, count in ports.items():
+        if not 1 <= count <= width:
+            raise ValueError(f"issue port '{port}': count must be between 1 and the issue width ({width})")
+    return ports
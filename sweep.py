@@ -0,0 +1,218 @@
+# sweep.py
+# Design-space sweeps: run every (program x configuration) job on a process
+# pool and keep the results in a content-addressed on-disk cache, so a
+# repeated sweep only simulates the jobs whose inputs changed.
+#
+# A cache key is the SHA-256 of the program image, the configuration and the
+# simulator sources themselves (editing the simulator invalidates old results).
+#
+# A program may also be a checkpoint (main.py --save-checkpoint): jobs then
+# start from the saved state instead of PC 0.
+#
+#   python sweep.py demo prog.elf --param max_cycles=1000,10000 --param mem_size=0x100000 -j 8
+
+import argparse
+import ast
+import hashlib
+import itertools
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import checkpoint
+from main import Simulator, DEMO_PROGRAM
+
+DEMO = 'demo'  # program name for main.DEMO_PROGRAM
+DEFAULT_CACHE_DIR = '.sweep_cache'
+DEFAULT_CONFIG = {'max_cycles': 10000}
+
+# Config keys consumed by run_job itself; every other key is passed to Simulator()
+RUN_OPTIONS = ('max_cycles', 'fast_forward', 'until_pc', 'translate', 'load_base')
+
+_SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Parsed checkpoints in this (worker) process: one file usually seeds many jobs
+_checkpoints = {}
+
+
+def simulator_hash():
+    """Hash of every simulator source file, so cached results go stale with the code."""
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(_SOURCE_DIR)):
+        if name.endswith('.py'):
+            digest.update(name.encode())
+            with open(os.path.join(_SOURCE_DIR, name), 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def program_hash(program):
+    if program == DEMO:
+        data = "\n".join(DEMO_PROGRAM).encode()
+    else:
+        with open(program, 'rb') as f:
+            data = f.read()
+    return hashlib.sha256(data).hexdigest()
+
+
+def job_key(program_digest, config, sim_digest):
+    blob = json.dumps({'program': program_digest, 'config': config, 'simulator': sim_digest},
+                      sort_keys=True)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def run_job(program, config):
+    """
+    Simulate one job (runs in a worker process). Returns SimResult as a dict,
+    with the full Simulator.stats() under 'stats'.
+    """
+    options = {k: v for k, v in config.items() if k not in RUN_OPTIONS}
+    sim = Simulator(**options)
+    if program == DEMO:
+        sim.load_program(DEMO_PROGRAM)
+    elif checkpoint.is_checkpoint(program):
+        if program not in _checkpoints:
+            _checkpoints[program] = checkpoint.read(program)
+        sim.restore_checkpoint(_checkpoints[program])
+    else:
+        sim.load_executable(program, config.get('load_base', 0))
+    if config.get('fast_forward') is not None or config.get('until_pc') is not None:
+        sim.fast_forward(config.get('fast_forward'), config.get('until_pc'), config.get('translate', True))
+    record = sim.run(config['max_cycles'])._asdict()
+    record['stats'] = sim.stats()
+    return record
+
+
+class ResultCache:
+    """One JSON file per job under 'root', fanned out by the first two hex digits."""
+    def __init__(self, root=DEFAULT_CACHE_DIR):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key + '.json')
+
+    def get(self, key):
+        try:
+            with open(self._path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, record):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename, so an interrupted sweep never leaves a torn entry
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(record, f, sort_keys=True)
+        os.replace(tmp, path)
+
+
+def expand_grid(params):
+    """{'a': [1, 2], 'b': [3]} -> [{'a': 1, 'b': 3}, {'a': 2, 'b': 3}] on top of DEFAULT_CONFIG."""
+    names = sorted(params)
+    configs = []
+    for values in itertools.product(*(params[name] for name in names)):
+        config = dict(DEFAULT_CONFIG)
+        config.update(zip(names, values))
+        configs.append(config)
+    return configs
+
+
+def sweep(programs, configs, jobs=None, cache=None, progress=None):
+    """
+    Run every (program, config) pair, reusing cached results.
+    Returns a list of records {'program', 'config', 'result', 'cached'} in job
+    order; a failed job has 'error' instead of 'result' and is not cached.
+    """
+    cache = cache if cache is not None else ResultCache()
+    sim_digest = simulator_hash()
+    records = []
+    pending = {}  # index into records -> cache key
+    for program in programs:
+        digest = program_hash(program)
+        for config in configs:
+            key = job_key(digest, config, sim_digest)
+            hit = cache.get(key)
+            record = {'program': program, 'config': config, 'cached': hit is not None}
+            if hit is not None:
+                record['result'] = hit['result']
+            else:
+                pending[len(records)] = key
+            records.append(record)
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {pool.submit(run_job, records[i]['program'], records[i]['config']): i
+                       for i in pending}
+            for future in as_completed(futures):
+                i = futures[future]
+                record = records[i]
+                try:
+                    record['result'] = future.result()
+                except Exception as e:  # loader errors, memory faults, bad config keys
+                    record['error'] = f"{type(e).__name__}: {e}"
+                else:
+                    cache.put(pending[i], {'program': record['program'], 'config': record['config'],
+                                           'result': record['result']})
+                if progress:
+                    progress(record)
+    return records
+
+
+def _parse_value(text):
+    try:
+        return ast.literal_eval(text)  # ints (incl. 0x...), floats, True/False/None
+    except (ValueError, SyntaxError):
+        return text
+
+
+def _parse_param(text):
+    name, sep, values = text.partition('=')
+    if not sep or not name:
+        raise argparse.ArgumentTypeError(f"expected NAME=V1,V2,... but got '{text}'")
+    return name.replace('-', '_'), [_parse_value(v) for v in values.split(',')]
+
+
+def print_table(records):
+    print(f"{'program':<20} {'cycles':>10} {'retired':>10} {'CPI':>7} {'stalls':>8} {'flushes':>8} {'bp acc':>7}  config")
+    for record in records:
+        config = " ".join(f"{k}={v}" for k, v in sorted(record['config'].items()))
+        name = os.path.basename(record['program'])
+        if 'error' in record:
+            print(f"{name:<20} {'error: ' + record['error']}  {config}")
+            continue
+        r = record['result']
+        mark = ' (cached)' if record['cached'] else ''
+        print(f"{name:<20} {r['cycles']:>10} {r['retired']:>10} {r['cpi']:>7.3f} "
+              f"{r['load_use_stalls']:>8} {r['control_flushes']:>8} {r['predictor_accuracy']:>7.2%}  {config}{mark}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel (program x config) sweeps with a result cache")
+    parser.add_argument("programs", nargs="+",
+                        help=f"ELF or flat binaries, checkpoints, or '{DEMO}' for the built-in demo program")
+    parser.add_argument("-p", "--param", action="append", type=_parse_param, default=[],
+                        metavar="NAME=V1,V2", help="sweep a config key over values (repeatable)")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--json", metavar="FILE", default=None, help="also write all records to FILE")
+    args = parser.parse_args()
+
+    configs = expand_grid(dict(args.param))
+    total = len(args.programs) * len(configs)
+
+    def progress(record):
+        status = 'failed' if 'error' in record else 'done'
+        print(f"{os.path.basename(record['program'])} {record['config']} {status}", file=sys.stderr)
+
+    records = sweep(args.programs, configs, args.jobs, ResultCache(args.cache_dir), progress)
+    cached = sum(record['cached'] for record in records)
+    print(f"{total} job(s): {cached} cached, {total - cached} simulated.")
+    print_table(records)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(records, f, indent=2)
@@ -0,0 +1,143 @@
+# tracing.py
+# Structured event tracing for the pipeline simulator.
+#
+# Call sites guard every event with a bit test on the tracer's masks, e.g.
+#     if tracer.mask & HAZARD:
+#         tracer.emit(HAZARD, 'load_use', rd=ex_rd)
+# so a disabled tracer costs one attribute load and an AND per site, and no
+# event arguments are formatted. Enabled events go to a buffered sink.
+
+import json
+import sys
+
+# --- Categories (bit flags) ---
+HAZARD = 1 << 0
+FORWARD = 1 << 1
+BRANCH = 1 << 2
+MEM = 1 << 3
+WB = 1 << 4
+PIPE = 1 << 5     # stalls, flushes and latch contents
+DECODE = 1 << 6
+STATE = 1 << 7    # per-cycle register and memory changes
+ALL = (1 << 8) - 1
+
+CATEGORY_NAMES = {HAZARD: 'hazard', FORWARD: 'forward', BRANCH: 'branch', MEM: 'mem',
+                  WB: 'wb', PIPE: 'pipe', DECODE: 'decode', STATE: 'state'}
+
+# --- Levels ---
+INFO = 1    # architecturally visible events: hazards, branches, loads/stores, writebacks
+DEBUG = 2   # per-cycle detail: forwarded values, latch holds/flushes, latch snapshots
+
+# next_toggle of a window that will not open or close again: past any cycle count
+NEVER = 1 << 64
+
+
+def parse_categories(text):
+    """Turn 'hazard,branch' (or 'all') into a category mask."""
+    mask = 0
+    by_name = {name: bit for bit, name in CATEGORY_NAMES.items()}
+    for name in text.split(','):
+        name = name.strip().lower()
+        if name == 'all':
+            mask |= ALL
+        elif name:
+            if name not in by_name:
+                raise ValueError(f"Unknown trace category: {name}")
+            mask |= by_name[name]
+    return mask
+
+
+class JsonLinesSink:
+    """Buffered JSON-lines file sink: one object per event."""
+    def __init__(self, path, buffer_size=1 << 20):
+        self.file = open(path, 'w', buffering=buffer_size)
+
+    def write(self, cycle, category, event, fields):
+        record = {'cycle': cycle, 'cat': CATEGORY_NAMES[category], 'ev': event}
+        record.update(fields)
+        self.file.write(json.dumps(record, separators=(',', ':')))
+        self.file.write('\n')
+
+    def close(self):
+        self.file.close()
+
+
+class ConsoleSink:
+    """Human-readable sink for interactive debugging."""
+    def __init__(self, stream=None):
+        self.stream = stream if stream is not None else sys.stdout
+
+    def write(self, cycle, category, event, fields):
+        args = ' '.join(f"{k}={v:#x}" if isinstance(v, int) and not isinstance(v, bool) else f"{k}={v}"
+                        for k, v in fields.items())
+        self.stream.write(f"[{cycle:>6}] {CATEGORY_NAMES[category]:<7} {event} {args}\n")
+
+    def close(self):
+        self.stream.flush()
+
+
+class Tracer:
+    def __init__(self):
+        # Categories currently emitting at INFO / DEBUG level (0 = off)
+        self.mask = 0
+        self.debug = 0
+        self.cycle = 0
+        # Cycle at which the window next opens or closes
+        self.next_toggle = NEVER
+        self.sink = None
+        self._categories = 0
+        self._level = INFO
+        self._window = None
+
+    def enable(self, sink, categories=ALL, level=INFO, window=None):
+        """
+        Start tracing 'categories' at 'level' into 'sink'.
+        'window' is an optional (start_cycle, end_cycle) half-open range;
+        outside it the masks stay zero.
+        """
+        self.sink = sink
+        self._categories = categories
+        self._level = level
+        self._window = window
+        if window is None:
+            self._activate(True)
+            self.next_toggle = NEVER
+        else:
+            self._activate(False)
+            self.next_toggle = window[0]
+
+    def disable(self):
+        self._activate(False)
+        self.next_toggle = NEVER
+        if self.sink is not None:
+            self.sink.close()
+            self.sink = None
+
+    def configured(self, category):
+        """True if 'category' is being traced, or will be once the window opens."""
+        return self.sink is not None and bool(self._categories & category)
+
+    def toggle(self, cycle):
+        """
+        Open or close the trace window; called once cycle >= next_toggle.
+        A run can start past the window's start (from a restored checkpoint):
+        the window opens on its first cycle, or is skipped when it is over.
+        """
+        start, end = self._window
+        if start <= cycle < end:
+            self._activate(True)
+            self.next_toggle = end
+        else:
+            self._activate(False)
+            self.next_toggle = NEVER
+
+    def _activate(self, on):
+        self.mask = self._categories if on else 0
+        self.debug = self._categories if on and self._level >= DEBUG else 0
+
+    def emit(self, category, event, **fields):
+        self.sink.write(self.cycle, category, event, fields)
+
+
+# Process-wide tracer used by the pipeline stages
+tracer = Tracer()
@@ -1,7 +1,20 @@
 #utils.py
 #This file is for keeping binary number manipulation functions and all the decoding functions
 
-from isa import OPCODES, FUNCT3, FUNCT7
+from collections import namedtuple
+from functools import lru_cache
+
+from isa import OPCODES, FUNCT3, FUNCT7, RS2, FP_RM
+from control_unit import get_control_signals
+from register_file import FREG_BASE
+
+# Number of distinct instruction words kept by the decode memo
+DECODE_CACHE_SIZE = 1 << 16
+
+# Immutable result of decoding one instruction word
+# 'keys' are (rd, rs1, rs2, rs3) as register keys (f-registers offset by
+# register_file.FREG_BASE, unused operands 0), for hazard checks across both files
+DecodedInst = namedtuple("DecodedInst", ["inst_word", "mnemonic", "rd", "rs1", "rs2", "rs3", "imm", "ctrl", "keys"])
 
 def getBits(value : int, hi : int, lo : int) -> int:
     """
@@ -95,21 +108,85 @@ def imm_j(instWord: int) -> int:
     raw = (bit20 << 20) | (bits19_12 << 12) | (bit11 << 11) | (bits10_1 << 1)
     return signExtend(raw, 21)
 
+# Immediate format selected by the opcode field
+IMM_TYPES = {
+    0b0000011: 'i', 0b0000111: 'i', 0b0001111: 'i', 0b0010011: 'i',
+    0b1100111: 'i', 0b1110011: 'i',
+    0b0100011: 's', 0b0100111: 's',
+    0b1100011: 'b',
+    0b0010111: 'u', 0b0110111: 'u',
+    0b1101111: 'j',
+}
+
+# Bits of funct7 that select the instruction (the rest are operand bits)
+FUNCT7_MASKS = {
+    0b0010011: 0b1111110,  # RV64 immediate shifts: bit 25 is shamt[5]
+    0b1000011: 0b0000011,  # R4-type: only fmt, bits [31:27] are rs3
+    0b1000111: 0b0000011,
+    0b1001011: 0b0000011,
+    0b1001111: 0b0000011,
+}
+
+def buildDecodeIndex() -> dict:
+    """
+    Build the decode index from the isa.py tables.
+    Maps opcode -> (shapes, table). 'table' is keyed on (funct3, funct7, rs2)
+    with None for fields the instruction does not use, and 'shapes' lists
+    which of those fields to compare, most specific first.
+    """
+    index = {}
+    for name, opc in OPCODES.items():
+        key = name.upper()
+        f3 = None if key in FP_RM else FUNCT3.get(key)
+        index.setdefault(opc, {})[(f3, FUNCT7.get(key), RS2.get(key))] = name.lower()
+    for opc, table in index.items():
+        shapes = {tuple(field is not None for field in k) for k in table}
+        index[opc] = (sorted(shapes, key=sum, reverse=True), table)
+    return index
+
+DECODE_INDEX = buildDecodeIndex()
+
 def decodeInstruction(instWord: int) -> str:
     """
-    Decode the instruction word into its assembly mnemonic.
-    Looks up OPCODES, then FUNCT3, then FUNCT7 (and for R4,
-    checks the upper bits of funct7 as needed).
-    """
-    fields = fieldsGen(instWord)
-    opc = fields['opcode']
-    # Find candidates by opcode
-    candidates = [name for name,code in OPCODES.items() if code == opc]
-    # Further filter by funct3
-    f3 = fields['funct3']
-    candidates = [name for name in candidates if FUNCT3.get(name) == f3]
-    # Filter by funct7 if needed
-    if len(candidates) > 1 and any(name in FUNCT7 for name in candidates):
-        f7 = fields['funct7']
-        candidates = [name for name in candidates if FUNCT7.get(name) == f7]
-    return candidates[0] if candidates else 'UNKNOWN'
+    Decode the instruction word into its (lower-case) assembly mnemonic.
+    Looks the opcode up in DECODE_INDEX, then matches funct3/funct7/rs2
+    against each key shape used under that opcode.
+    """
+    opc = instWord & 0x7F
+    entry = DECODE_INDEX.get(opc)
+    if entry is None:
+        return 'UNKNOWN'
+    shapes, table = entry
+    f3 = (instWord >> 12) & 0x7
+    f7 = (instWord >> 25) & FUNCT7_MASKS.get(opc, 0x7F)
+    rs2 = (instWord >> 20) & 0x1F
+    for use_f3, use_f7, use_rs2 in shapes:
+        name = table.get((f3 if use_f3 else None, f7 if use_f7 else None, rs2 if use_rs2 else None))
+        if name is not None:
+            return name
+    return 'UNKNOWN'
+
+@lru_cache(maxsize=DECODE_CACHE_SIZE)
+def decodeWord(instWord: int) -> DecodedInst:
+    """
+    Fully decode 'instWord' into a DecodedInst record.
+    Results are memoized, so the record (including its control signals)
+    is shared and must not be modified.
+    """
+    mnemonic = decodeInstruction(instWord)
+    imm_type = IMM_TYPES.get(instWord & 0x7F)
+    ctrl = get_control_signals(mnemonic)
+    fields = ((instWord >> 7) & 0x1F, (instWord >> 15) & 0x1F, (instWord >> 20) & 0x1F, (instWord >> 27) & 0x1F)
+    keys = tuple(0 if kind is None else field + FREG_BASE if kind == 'f' else field
+                 for field, kind in zip(fields, ctrl.regFiles))
+    return DecodedInst(
+        inst_word=instWord,
+        mnemonic=mnemonic,
+        rd=fields[0],
+        rs1=fields[1],
+        rs2=fields[2],
+        rs3=fields[3],
+        imm=imm(instWord, imm_type) if imm_type else 0,
+        ctrl=ctrl,
+        keys=keys,
+    )